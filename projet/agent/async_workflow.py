@@ -0,0 +1,239 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from .selenium_util import scrape_worker_threaded
+from .google_search import fetch_search_results_with_googlesearch
+from .config import max_thread, max_doc_analysis_workers, async_queue_size
+from .relevance import prefilter_documents
+from .document_processing import validate_and_summarize_document_async
+from .main_workflow import ALL_STEPS, _relevant_entry, _finalize_research, _replacement_search_size, _warm_start
+
+
+class _SubqueryState:
+    """Progress of one sub-question through the pipeline."""
+
+    def __init__(self, subquery: str, n_results: int):
+        self.subquery = subquery
+        self.n_results = n_results
+        self.relevant_docs = []
+        self.in_flight = 0
+        self.urls_enqueued = 0
+        self.changed = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        return len(self.relevant_docs) >= self.n_results
+
+    def add_relevant(self, entry: dict) -> bool:
+        """Keeps `entry` unless the sub-question already has enough documents."""
+        if self.done:
+            return False
+        self.relevant_docs.append(entry)
+        self.changed.set()
+        return True
+
+    def finish_item(self):
+        self.in_flight -= 1
+        self.changed.set()
+
+    async def wait_idle(self):
+        """Waits until the sub-question is satisfied or has no URL left in the pipeline."""
+        while not self.done and self.in_flight > 0:
+            self.changed.clear()
+            await self.changed.wait()
+
+
+class _ResearchPipeline:
+    """
+    Streams search results, scraped pages and LLM validations through bounded queues.
+
+    Each sub-question is driven by its own coroutine: its URLs are scraped and validated
+    as soon as they are found, independently of the other sub-questions, and it stops
+    feeding the pipeline once `n_results` relevant documents are collected.
+    """
+
+    def __init__(self, query: str, subqueries: list[str], n_results: int, progress_callback,
+                 max_new_url_attempts: int = 5, prior_docs_by_subq: dict | None = None,
+                 visited_urls: set | None = None):
+        self.query = query
+        self.subqueries = subqueries
+        self.n_results = n_results
+        self.progress_callback = progress_callback
+        self.max_new_url_attempts = max_new_url_attempts
+
+        self.visited_urls = visited_urls if visited_urls is not None else set()
+        self.states = {sq: _SubqueryState(sq, n_results) for sq in subqueries}
+        for sq, docs in (prior_docs_by_subq or {}).items():
+            if sq in self.states:
+                self.states[sq].relevant_docs.extend(docs)
+        self.scrape_queue = asyncio.Queue(maxsize=async_queue_size)
+        self.validate_queue = asyncio.Queue(maxsize=async_queue_size)
+        self.scrape_executor = ThreadPoolExecutor(max_workers=max_thread)
+        self.subqueries_done = 0
+        self.scraping_started = False
+
+    async def _search(self, subq: str, n: int) -> list:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, fetch_search_results_with_googlesearch, subq, n)
+
+    async def _enqueue_urls(self, state: _SubqueryState, results: list, limit: int) -> int:
+        """Pushes up to `limit` unvisited URLs of `results` to the scrape queue."""
+        enqueued = 0
+        for title, url in results:
+            if state.done or enqueued >= limit:
+                break
+            if url in self.visited_urls:
+                print(f"ℹ️ URL {url} déjà visitée ou en cours de traitement. Passons à la suivante.")
+                continue
+            self.visited_urls.add(url)
+            state.in_flight += 1
+            enqueued += 1
+            await self.scrape_queue.put((state, {"url": url, "subquestion": state.subquery}))
+        state.urls_enqueued += enqueued
+        return enqueued
+
+    async def _run_subquery(self, state: _SubqueryState):
+        subq = state.subquery
+        if state.done:
+            print(f"♻️ Documents de la recherche précédente réutilisés pour '{subq}'.")
+        else:
+            results = await self._search(subq, max(self.n_results + 3, _replacement_search_size(self.max_new_url_attempts)))
+            print(f"URLs récupérées pour la sous-question '{subq}' : {len(results)}")
+            await self._enqueue_urls(state, results, self.n_results - len(state.relevant_docs))
+            await state.wait_idle()
+
+        if not state.done:
+            print(f"♻️ Nombre de documents pertinents insuffisant pour '{subq}'. Recherche d'URLs de remplacement.")
+            current_step_idx = 6
+            self.progress_callback(self._progress(),
+                                   f"{ALL_STEPS[current_step_idx]} : {subq} (recherche de remplacement)",
+                                   current_step_idx)
+            new_results = await self._search(subq, _replacement_search_size(self.max_new_url_attempts))
+            await self._enqueue_urls(state, new_results, self.max_new_url_attempts)
+            await state.wait_idle()
+            if not state.done:
+                print(f"❌ Impossible d'atteindre le nombre requis de documents pour '{subq}'.")
+
+        self.subqueries_done += 1
+        current_step_idx = 5
+        self.progress_callback(self._progress(), f"{ALL_STEPS[current_step_idx]} : {subq}", current_step_idx)
+
+    def _progress(self) -> int:
+        return 40 + int(40 * self.subqueries_done / len(self.subqueries))
+
+    async def _scrape_worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            state, task = await self.scrape_queue.get()
+            handed_over = False
+            try:
+                if state.done:
+                    continue
+                if not self.scraping_started:
+                    self.scraping_started = True
+                    current_step_idx = 3
+                    self.progress_callback(40, ALL_STEPS[current_step_idx], current_step_idx)
+
+                doc = await loop.run_in_executor(self.scrape_executor, scrape_worker_threaded, task)
+                if not doc or state.done:
+                    continue
+                paragraphs = doc.get("paragraphs", "")
+                if len(paragraphs) > 100:
+                    if not prefilter_documents([doc], state.subquery, self.query):
+                        continue
+                    await self.validate_queue.put((state, doc))
+                    handed_over = True
+                elif paragraphs.strip():
+                    if state.add_relevant(_relevant_entry(doc, paragraphs)):
+                        print(f"✅ Document court mais pertinent trouvé : {doc.get('url')}")
+                else:
+                    print(f"⚠️ Document de {doc.get('url')} est vide. Ignoré.")
+            except Exception as exc:
+                print(f"❌ Erreur lors du scraping de {task['url']} : {exc}")
+            finally:
+                if not handed_over:
+                    state.finish_item()
+                self.scrape_queue.task_done()
+
+    async def _validate_worker(self):
+        while True:
+            state, doc = await self.validate_queue.get()
+            try:
+                if state.done:
+                    continue
+                response_data = await validate_and_summarize_document_async(
+                    self.query, state.subquery, doc.get("paragraphs")
+                )
+                if response_data.get("is_relevant", False):
+                    if state.add_relevant(_relevant_entry(doc, response_data.get("summary"))):
+                        print(f"✅ Document pertinent trouvé : {doc.get('url')}")
+                else:
+                    print(f"⚠️ Document de {doc.get('url')} jugé non pertinent.")
+            except Exception as exc:
+                print(f"❌ Erreur lors de l'analyse du document {doc.get('url')}: {exc}")
+            finally:
+                state.finish_item()
+                self.validate_queue.task_done()
+
+    async def run(self) -> list[dict]:
+        """
+        Runs every sub-question through the pipeline.
+
+        Returns:
+            The validated summaries, grouped by sub-question in the original order.
+        """
+        current_step_idx = 2
+        self.progress_callback(20, ALL_STEPS[current_step_idx], current_step_idx)
+
+        workers = [asyncio.create_task(self._scrape_worker()) for _ in range(max_thread)]
+        workers += [asyncio.create_task(self._validate_worker()) for _ in range(max_doc_analysis_workers)]
+        try:
+            await asyncio.gather(*(self._run_subquery(state) for state in self.states.values()))
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self.scrape_executor.shutdown(wait=False, cancel_futures=True)
+
+        if not any(state.urls_enqueued or state.relevant_docs for state in self.states.values()):
+            raise Exception("❌ Aucune URL valide à scraper.")
+
+        validated_summaries = []
+        for subq in self.subqueries:
+            validated_summaries.extend(self.states[subq].relevant_docs)
+        return validated_summaries
+
+
+async def perform_full_research_async(
+        query: str,
+        subqueries: list[str],
+        n_results: int,
+        progress_callback,
+        token_callback=None,
+        prior_result: dict | None = None
+) -> dict:
+    """
+    Asyncio variant of `perform_full_research`.
+
+    Search, scraping and LLM validation overlap across sub-questions: a sub-question can be
+    validated while another one is still being scraped, and each one stops as soon as it
+    has `n_results` relevant documents. `progress_callback` is always called from the
+    event loop thread, i.e. the thread that called `perform_full_research`.
+
+    Args:
+        query: The main research query.
+        subqueries: A list of pre-generated sub-questions.
+        n_results: The desired number of relevant results per subquery.
+        progress_callback: A function to update the UI's progress.
+        token_callback: Optional function receiving the streamed synthesis fragments.
+        prior_result: Optional result of a previous research used as a warm start.
+
+    Returns:
+        A dictionary containing the final synthesis, subquestions, sources, validated documents and metrics.
+    """
+    unique_subqueries = list(dict.fromkeys(subqueries))
+    prior_docs_by_subq, visited_urls = _warm_start(unique_subqueries, n_results, prior_result)
+    pipeline = _ResearchPipeline(query, unique_subqueries, n_results, progress_callback,
+                                 prior_docs_by_subq=prior_docs_by_subq, visited_urls=visited_urls)
+    validated_summaries = await pipeline.run()
+    return _finalize_research(query, subqueries, validated_summaries, progress_callback, token_callback)
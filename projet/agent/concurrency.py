@@ -0,0 +1,236 @@
+import os
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from .config import (adaptive_concurrency, concurrency_min_drivers, concurrency_max_drivers,
+                     concurrency_initial_drivers, concurrency_adjust_interval, concurrency_memory_threshold,
+                     concurrency_cpu_threshold, concurrency_max_rss_mb, concurrency_latency_factor,
+                     concurrency_failure_threshold)
+from .tracing import span
+
+
+class ResourceMonitor:
+    """
+    Samples the memory and CPU pressure of the machine.
+
+    Uses psutil when it is installed, otherwise /proc and the load average (Linux).
+    Values that cannot be measured are None.
+    """
+
+    def __init__(self):
+        self._process = psutil.Process() if psutil else None
+        if psutil:
+            psutil.cpu_percent(None)  # The first call only sets the reference point
+        elif not os.path.exists("/proc/meminfo"):
+            print("⚠️ psutil n'est pas installé et /proc est absent : la mémoire et le CPU ne sont pas mesurés, "
+                  "la concurrence Chrome ne s'adapte qu'aux latences et aux échecs (pip install psutil).")
+
+    def sample(self) -> dict:
+        """
+        Returns:
+            A dictionary with 'memory_used' (share of the RAM in use), 'cpu_load' (load per
+            core, between 0 and 1 or more) and 'rss_mb' (memory of this process and its
+            children, i.e. the Chrome instances, in MB).
+        """
+        if psutil:
+            rss = 0
+            for process in [self._process] + self._process.children(recursive=True):
+                try:
+                    rss += process.memory_info().rss
+                except psutil.Error:
+                    pass
+            return {
+                "memory_used": psutil.virtual_memory().percent / 100,
+                "cpu_load": psutil.cpu_percent(None) / 100,
+                "rss_mb": round(rss / 2**20, 1),
+            }
+        return {"memory_used": self._proc_memory_used(), "cpu_load": self._load_per_core(), "rss_mb": self._proc_rss_mb()}
+
+    @staticmethod
+    def _proc_memory_used() -> float | None:
+        try:
+            with open("/proc/meminfo") as f:
+                values = {line.split(":")[0]: int(line.split()[1]) for line in f if line.split()[1:]}
+            return 1 - values["MemAvailable"] / values["MemTotal"]
+        except (OSError, KeyError, ValueError, ZeroDivisionError):
+            return None
+
+    @staticmethod
+    def _load_per_core() -> float | None:
+        try:
+            return os.getloadavg()[0] / (os.cpu_count() or 1)
+        except (AttributeError, OSError):
+            return None
+
+    @staticmethod
+    def _proc_rss_mb() -> float | None:
+        """Sums the resident memory of this process and of all its descendants, read from /proc."""
+        try:
+            pids = [name for name in os.listdir("/proc") if name.isdigit()]
+        except OSError:
+            return None
+        children = {}
+        for pid in pids:
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    # The parent pid follows the command name, which may contain spaces
+                    ppid = f.read().rsplit(")", 1)[1].split()[1]
+            except (OSError, IndexError):
+                continue
+            children.setdefault(ppid, []).append(pid)
+        total_kb = 0
+        stack = [str(os.getpid())]
+        while stack:
+            pid = stack.pop()
+            stack.extend(children.get(pid, []))
+            try:
+                with open(f"/proc/{pid}/status") as f:
+                    for line in f:
+                        if line.startswith("VmRSS:"):
+                            total_kb += int(line.split()[1])
+                            break
+            except (OSError, ValueError):
+                continue
+        return round(total_kb / 1024, 1)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD controller of the number of pages loaded in Chrome at the same time.
+
+    Every `adjust_interval` seconds, the limit is halved (down to `min_limit`) when the
+    machine runs short of memory or CPU, when this process and its Chrome instances use more
+    than `concurrency_max_rss_mb`, when pages load `latency_factor` times slower than usual
+    for their domain, or when too many loads fail. Otherwise it grows by one (up to
+    `max_limit`) if the limit was reached during the interval and the RSS is below 80 % of
+    its cap. Each change is recorded as a 'concurrency.adjust' span of the current trace.
+
+    Args:
+        min_limit, max_limit: Bounds of the limit.
+        initial_limit: The starting limit.
+        adjust_interval: Minimum number of seconds between two adjustments.
+        monitor: The ResourceMonitor to sample.
+        on_change: Optional callable receiving the new limit, e.g. to close surplus idle drivers.
+    """
+
+    def __init__(self, min_limit: int = concurrency_min_drivers, max_limit: int = concurrency_max_drivers,
+                 initial_limit: int = concurrency_initial_drivers, adjust_interval: float = concurrency_adjust_interval,
+                 monitor: ResourceMonitor | None = None, on_change=None):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self._limit = min(self.max_limit, max(self.min_limit, initial_limit))
+        self.adjust_interval = adjust_interval
+        self.monitor = monitor or ResourceMonitor()
+        self.on_change = on_change
+
+        self._cond = threading.Condition()
+        self._active = 0
+        self._peak = 0
+        self._latency_ratios = []
+        self._outcomes = []
+        self._domain_latency = {}  # host -> moving average of its page load time
+        self._last_adjust = time.monotonic()
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @contextmanager
+    def track(self, url: str):
+        """Waits for a free slot, then times the page load of `url` run in the enclosed block."""
+        with self._cond:
+            while self._active >= self._limit:
+                self._cond.wait()
+            self._active += 1
+            self._peak = max(self._peak, self._active)
+        start = time.monotonic()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            seconds = time.monotonic() - start
+            with self._cond:
+                self._active -= 1
+                self._cond.notify()
+            self.record(url, seconds, ok)
+
+    def record(self, url: str, seconds: float, ok: bool):
+        """Records one page load and adjusts the limit if the interval has elapsed."""
+        host = urlparse(url).hostname or ""
+        with self._cond:
+            baseline = self._domain_latency.get(host)
+            if ok:
+                if baseline:
+                    self._latency_ratios.append(seconds / baseline)
+                self._domain_latency[host] = seconds if baseline is None else 0.8 * baseline + 0.2 * seconds
+            self._outcomes.append(ok)
+            if time.monotonic() - self._last_adjust < self.adjust_interval:
+                return
+            ratios, outcomes, peak = self._latency_ratios, self._outcomes, self._peak
+            self._latency_ratios, self._outcomes, self._peak = [], [], self._active
+            self._last_adjust = time.monotonic()
+        self._adjust(ratios, outcomes, peak)
+
+    def _adjust(self, ratios: list[float], outcomes: list[bool], peak: int):
+        resources = self.monitor.sample()
+        latency_ratio = statistics.median(ratios) if ratios else None
+        failure_rate = outcomes.count(False) / len(outcomes) if outcomes else 0.0
+
+        rss_mb = resources["rss_mb"]
+        reason = None
+        if resources["memory_used"] is not None and resources["memory_used"] >= concurrency_memory_threshold:
+            reason = "mémoire"
+        elif rss_mb is not None and rss_mb >= concurrency_max_rss_mb:
+            reason = "rss"
+        elif resources["cpu_load"] is not None and resources["cpu_load"] >= concurrency_cpu_threshold:
+            reason = "cpu"
+        elif latency_ratio is not None and latency_ratio >= concurrency_latency_factor:
+            reason = "latence"
+        elif failure_rate >= concurrency_failure_threshold:
+            reason = "échecs"
+
+        with self._cond:
+            old_limit = self._limit
+            if reason:
+                new_limit = max(self.min_limit, old_limit // 2)
+            elif peak >= old_limit and (rss_mb is None or rss_mb < 0.8 * concurrency_max_rss_mb):
+                new_limit, reason = min(self.max_limit, old_limit + 1), "saturé"
+            else:
+                new_limit = old_limit
+            self._limit = new_limit
+            self._cond.notify_all()
+        if new_limit == old_limit:
+            return
+
+        with span("concurrency.adjust", old=old_limit, new=new_limit, reason=reason, latency_ratio=latency_ratio,
+                  failure_rate=round(failure_rate, 3), **resources):
+            pass
+        print(f"🎚️ Limite de pages Chrome simultanées : {old_limit} → {new_limit} ({reason})")
+        if self.on_change and new_limit < old_limit:
+            self.on_change(new_limit)
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_concurrency_controller() -> AdaptiveConcurrency | None:
+    """Returns the process-wide controller of the Selenium concurrency, or None if disabled."""
+    if not adaptive_concurrency:
+        return None
+    from .driver_pool import get_driver_pool
+
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = AdaptiveConcurrency(on_change=lambda limit: get_driver_pool().trim_idle(limit))
+        return _controller
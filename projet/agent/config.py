@@ -1,3 +1,4 @@
+import os
 certify =  r"C:\Users\bertr\AppData\Local\Programs\Python\Python39\Lib\site-packages\pip\_vendor\certifi\cacert.pem"
 model = "mistral-small-latest"
 # model = "codestral-latest"
@@ -5,6 +6,87 @@ model = "mistral-small-latest"
 max_thread=10
 max_synth_retries=3
 max_retry_document=3
+synthesis_repair=True
+synthesis_repair_max_issues=5
+max_doc_analysis_workers=16
+batch_validation=True
+batch_validation_token_budget=12000
+batch_validation_max_docs=6
+document_token_budget=2500
+document_chunk_tokens=400
+boilerplate_max_length=300
+relevance_prefilter=False
+relevance_threshold=0.2
+relevance_subquery_weight=0.7
+search_max_workers=4
+search_cache_ttl=3600
+search_backoff_base=2.0
+replacement_overscrape=2
+batch_max_concurrent_queries=2
+server_max_concurrent_jobs=2
+server_max_queued_jobs=50
+server_db_path=os.path.join("cache","jobs.sqlite3")
+history_duplicate_threshold=0.8
+history_embeddings_enabled=False
+history_semantic_threshold=0.92
+warm_start_similarity=0.6
+embedding_model="mistral-embed"
+research_mode="sync"
+async_queue_size=max_thread*2
+driver_pool_size=max_thread
+driver_max_pages=25
+driver_borrow_timeout=120
+page_load_deadline=15
+lean_browser_profile=True
+browser_profile_template=os.path.join("cache", "chrome-profile")
+# Stylesheets stay allowed: without them, text hidden by CSS (cookie banners, menus) would be extracted.
+# Each extension is also blocked with a query string, e.g. font.woff2?v=3.
+blocked_url_patterns=[
+    pattern for extension in ("woff", "woff2", "ttf", "otf", "eot", "mp4", "webm", "mp3", "ogg", "wav", "m3u8")
+    for pattern in (f"*.{extension}", f"*.{extension}?*")
+]+[
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*googlesyndication.com*",
+    "*adservice.google.*", "*facebook.net*", "*connect.facebook.com*", "*hotjar.com*", "*scorecardresearch.com*",
+    "*criteo.com*", "*taboola.com*", "*outbrain.com*", "*amazon-adsystem.com*", "*quantserve.com*",
+]
+adaptive_concurrency=True
+concurrency_min_drivers=2
+concurrency_max_drivers=driver_pool_size
+concurrency_initial_drivers=min(driver_pool_size, max(concurrency_min_drivers, (os.cpu_count() or 4) // 2))
+concurrency_adjust_interval=5.0
+concurrency_memory_threshold=0.85
+concurrency_cpu_threshold=0.9
+concurrency_max_rss_mb=4096
+concurrency_latency_factor=2.0
+concurrency_failure_threshold=0.5
+host_scheduler_enabled=True
+host_max_concurrency=2
+host_min_interval=1.0
+host_backoff_base=2.0
+host_backoff_max=60.0
+http_fetch_enabled=True
+http_fetch_timeout=8
+http_fetch_max_bytes=3_000_000
+http_min_text_length=300
+page_cache_enabled=True
+page_cache_dir=os.path.join("cache", "pages")
+page_cache_ttl=24*3600
+page_cache_stale_ttl=7*24*3600
+page_cache_max_bytes=200*1024*1024
+llm_cache_enabled=True
+llm_cache_path=os.path.join("cache", "llm_cache.sqlite3")
+llm_cache_max_entries=5000
+llm_cache_ttl=7*24*3600
+trace_enabled=True
+trace_dir=os.path.join("traces")
+mistral_rpm=60
+mistral_tpm=500_000
+mistral_max_connections=32
+mistral_timeout=120
+mistral_max_retries=5
+mistral_backoff_base=1.0
+mistral_backoff_max=30.0
+mistral_expected_output_tokens=400
 HEADERS = [
     {
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.9",
@@ -1,40 +1,319 @@
 import json
-from .mistral_client import request_mistral_model
+import re
+import threading
+from .mistral_client import request_mistral_model, request_mistral_model_async
+from .text_utils import tokenize, estimate_tokens
+from .config import (batch_validation_token_budget, batch_validation_max_docs, document_token_budget,
+                     document_chunk_tokens, boilerplate_max_length)
 
-def validate_and_summarize_document(query: str, subquery: str, document_content: str) -> dict:
-    """
-    Validates a document's relevance to a query/subquery and summarizes it using the Mistral model.
+# Short paragraphs matching these patterns are site furniture (cookies, newsletters, legal notices...).
+BOILERPLATE_PATTERNS = re.compile(
+    r"cookie|newsletter|abonnez[- ]vous|inscrivez[- ]vous|tous droits r[ée]serv[ée]s|all rights reserved|"
+    r"politique de confidentialit[ée]|privacy policy|mentions l[ée]gales|terms of (use|service)|"
+    r"conditions g[ée]n[ée]rales|javascript|partager sur|share on|suivez[- ]nous|follow us|"
+    r"publicit[ée]|advertisement|lire aussi|read more|en savoir plus|accepter et fermer|sign up|log in",
+    re.IGNORECASE
+)
 
-    Args:
-        query: The initial broad research query.
-        subquery: The specific sub-question the document is being evaluated against.
-        document_content: The text content of the document to be analyzed.
 
-    Returns:
-        A dictionary with 'summary' (str or None) and 'is_relevant' (bool).
-        Returns {"summary": None, "is_relevant": false} on error or if not relevant.
-    """
-    system_prompt = """Tu es un assistant de synthèse expert. Pour le texte que je te donne, tu dois effectuer deux tâches :
+class TokenSavingsStats:
+    """Thread-safe counters of the tokens removed from documents before they reach the model."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def record(self, tokens_before: int, tokens_after: int, chunked: bool):
+        with self._lock:
+            self._stats["documents"] += 1
+            self._stats["tokens_before"] += tokens_before
+            self._stats["tokens_after"] += tokens_after
+            self._stats["chunked_documents"] += int(chunked)
+
+    def summary(self) -> dict:
+        """
+        Returns the counters.
+
+        Returns:
+            A dictionary with 'documents', 'tokens_before', 'tokens_after', 'tokens_saved'
+            and 'chunked_documents'.
+        """
+        with self._lock:
+            return {**self._stats, "tokens_saved": self._stats["tokens_before"] - self._stats["tokens_after"]}
+
+    def reset(self):
+        self._stats = {"documents": 0, "tokens_before": 0, "tokens_after": 0, "chunked_documents": 0}
+
+
+token_savings = TokenSavingsStats()
+
+VALIDATION_SYSTEM_PROMPT = """Tu es un assistant de synthèse expert. Pour le texte que je te donne, tu dois effectuer deux tâches :
 1.  Générer un résumé pertinent d'environ 150 mots.
 2.  Évaluer sa pertinence par rapport à la question initiale ( est ce que le document repond a la question initiale ou peut aider a répondre a lquestion initiale avec l'aide d'autre document ).
 Réponds uniquement avec un objet JSON strict.
 Si le texte est pertinent, retourne : {"summary": "ton résumé ici", "is_relevant": true}.
 Si le texte est hors sujet ou trop court, retourne : {"summary": null, "is_relevant": false}.
 """
-    messages = [
-        {"role": "system", "content": system_prompt},
+
+
+BATCH_VALIDATION_SYSTEM_PROMPT = """Tu es un assistant de synthèse expert. Je te donne plusieurs textes numérotés. Pour CHAQUE texte, tu dois effectuer deux tâches :
+1.  Générer un résumé pertinent d'environ 150 mots.
+2.  Évaluer sa pertinence par rapport à la question initiale ( est ce que le document repond a la question initiale ou peut aider a répondre a lquestion initiale avec l'aide d'autre document ).
+Réponds uniquement avec un tableau JSON strict contenant exactement un objet par texte, dans l'ordre des textes.
+Pour un texte pertinent, l'objet est : {"summary": "ton résumé ici", "is_relevant": true}.
+Pour un texte hors sujet ou trop court, l'objet est : {"summary": null, "is_relevant": false}.
+"""
+
+
+def _clean_paragraphs(document_content: str) -> list[str]:
+    """Splits a document into paragraphs, dropping duplicates and short boilerplate paragraphs."""
+    seen = set()
+    paragraphs = []
+    for paragraph in document_content.split("\n\n"):
+        paragraph = paragraph.strip()
+        key = " ".join(paragraph.lower().split())
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        if len(paragraph) <= boilerplate_max_length and BOILERPLATE_PATTERNS.search(paragraph):
+            continue
+        paragraphs.append(paragraph)
+    return paragraphs
+
+
+def _split_chunks(paragraphs: list[str], chunk_tokens: int) -> list[list[str]]:
+    """Groups consecutive paragraphs into chunks of about `chunk_tokens` tokens."""
+    chunks, current, current_tokens = [], [], 0
+    for paragraph in paragraphs:
+        tokens = estimate_tokens(paragraph)
+        if current and current_tokens + tokens > chunk_tokens:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(paragraph)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def prepare_document_content(document_content: str, query: str, subquery: str,
+                             token_budget: int = document_token_budget,
+                             chunk_tokens: int = document_chunk_tokens) -> str:
+    """
+    Shrinks a scraped document to what is worth sending to the model.
+
+    Duplicate and boilerplate paragraphs are removed. If the document still exceeds
+    `token_budget`, it is split into chunks that are scored by keyword overlap with the
+    query and sub-question; chunks without any overlap are dropped and the best ones are
+    kept, in their original order, up to the budget.
+
+    Args:
+        document_content: The scraped paragraphs, separated by blank lines.
+        query: The initial broad research query.
+        subquery: The sub-question the document is evaluated against.
+        token_budget: The maximum estimated number of tokens to keep.
+        chunk_tokens: The approximate size of a chunk in tokens.
+
+    Returns:
+        The reduced document text. Skipped parts are marked with "[...]".
+    """
+    tokens_before = estimate_tokens(document_content)
+    paragraphs = _clean_paragraphs(document_content)
+    cleaned = "\n\n".join(paragraphs)
+    if estimate_tokens(cleaned) <= token_budget:
+        token_savings.record(tokens_before, estimate_tokens(cleaned), chunked=False)
+        return cleaned
+
+    chunks = _split_chunks(paragraphs, chunk_tokens)
+    subquery_terms = set(tokenize(subquery))
+    query_terms = set(tokenize(query)) - subquery_terms
+
+    def score(index):
+        words = tokenize(" ".join(chunks[index]))
+        if not words:
+            return 0.0
+        hits = sum(2.0 for w in words if w in subquery_terms) + sum(1.0 for w in words if w in query_terms)
+        return hits / len(words) ** 0.5
+
+    scores = {i: score(i) for i in range(len(chunks))}
+    candidates = [i for i in scores if scores[i] > 0] or list(range(len(chunks)))
+    kept, used = set(), 0
+    for i in sorted(candidates, key=lambda i: (-scores[i], i)):
+        tokens = estimate_tokens("\n\n".join(chunks[i]))
+        if used + tokens > token_budget:
+            if kept:
+                continue
+            chunks[i] = [" ".join(chunks[i])[:token_budget * 4]]
+            tokens = token_budget
+        kept.add(i)
+        used += tokens
+
+    parts = []
+    previous = -1
+    for i in sorted(kept):
+        if i != previous + 1:
+            parts.append("[...]")
+        parts.append("\n\n".join(chunks[i]))
+        previous = i
+    if previous != len(chunks) - 1:
+        parts.append("[...]")
+    reduced = "\n\n".join(parts)
+    token_savings.record(tokens_before, estimate_tokens(reduced), chunked=True)
+    return reduced
+
+
+def _build_validation_messages(query: str, subquery: str, document_content: str) -> list[dict]:
+    document_content = prepare_document_content(document_content, query, subquery)
+    return [
+        {"role": "system", "content": VALIDATION_SYSTEM_PROMPT},
         {"role": "user",
          "content": f"""Question initiale : {query}\nSous-question : {subquery}\n\nTexte à analyser :\n{document_content}"""}
     ]
 
+
+def _parse_validation_response(response_json_str: str) -> dict:
     try:
-        response_json_str = request_mistral_model(messages)
         response_json_str = response_json_str.strip().strip('`').strip('json').strip()
         response_data = json.loads(response_json_str)
+        if not isinstance(response_data, dict):
+            raise ValueError(f"objet JSON attendu, {type(response_data).__name__} reçu")
         return response_data
     except (json.JSONDecodeError, Exception) as e:
         print(f"❌ Erreur de format JSON ou de traitement lors de la validation du document : {e}")
         print("--- Réponse brute du modèle ---")
         print(response_json_str)
         print("------------------------------")
-        return {"summary": None, "is_relevant": False}
\ No newline at end of file
+        return {"summary": None, "is_relevant": False}
+
+
+def _is_validation_response(response_json_str: str) -> bool:
+    """Tells whether a model answer is the JSON object read by `_parse_validation_response`."""
+    try:
+        return isinstance(json.loads(response_json_str.strip().strip('`').strip('json').strip()), dict)
+    except json.JSONDecodeError:
+        return False
+
+
+def _build_batch_validation_messages(query: str, subquery: str, document_contents: list[str]) -> list[dict]:
+    texts = "\n\n".join(
+        f"=== Texte {i} ===\n{prepare_document_content(content, query, subquery)}"
+        for i, content in enumerate(document_contents, 1)
+    )
+    return [
+        {"role": "system", "content": BATCH_VALIDATION_SYSTEM_PROMPT},
+        {"role": "user",
+         "content": f"""Question initiale : {query}\nSous-question : {subquery}\n\nNombre de textes : {len(document_contents)}\n\n{texts}"""}
+    ]
+
+
+def _parse_batch_validation_response(response_json_str: str, expected: int) -> list[dict] | None:
+    """Parses a JSON array of validation results, or returns None if it is malformed."""
+    cleaned = response_json_str.strip().strip('`').strip()
+    if cleaned.startswith("json"):
+        cleaned = cleaned[4:].strip()
+    try:
+        results = json.loads(cleaned)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(results, list) or len(results) != expected:
+        return None
+    if not all(isinstance(r, dict) and "is_relevant" in r for r in results):
+        return None
+    return results
+
+
+def pack_document_batches(document_contents: list[str], token_budget: int = batch_validation_token_budget,
+                          max_docs: int = batch_validation_max_docs) -> list[list[int]]:
+    """
+    Groups documents into batches that fit a prompt token budget.
+
+    Args:
+        document_contents: The texts to validate, in priority order.
+        token_budget: The maximum estimated number of document tokens per batch.
+        max_docs: The maximum number of documents per batch.
+
+    Returns:
+        A list of batches, each one a list of indices into `document_contents`.
+        A document larger than the budget gets a batch of its own.
+    """
+    batches = []
+    current, current_tokens = [], 0
+    for i, content in enumerate(document_contents):
+        tokens = min(estimate_tokens(content), document_token_budget)
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_docs):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def validate_and_summarize_document(query: str, subquery: str, document_content: str) -> dict:
+    """
+    Validates a document's relevance to a query/subquery and summarizes it using the Mistral model.
+
+    Args:
+        query: The initial broad research query.
+        subquery: The specific sub-question the document is being evaluated against.
+        document_content: The text content of the document to be analyzed.
+
+    Returns:
+        A dictionary with 'summary' (str or None) and 'is_relevant' (bool).
+        Returns {"summary": None, "is_relevant": false} on error or if not relevant.
+    """
+    messages = _build_validation_messages(query, subquery, document_content)
+    try:
+        response_json_str = request_mistral_model(messages, cache_if=_is_validation_response)
+    except Exception as e:
+        print(f"❌ Erreur lors de l'appel au modèle pour la validation du document : {e}")
+        return {"summary": None, "is_relevant": False}
+    return _parse_validation_response(response_json_str)
+
+
+async def validate_and_summarize_document_async(query: str, subquery: str, document_content: str) -> dict:
+    """
+    Async variant of `validate_and_summarize_document`.
+    """
+    messages = _build_validation_messages(query, subquery, document_content)
+    try:
+        response_json_str = await request_mistral_model_async(messages, cache_if=_is_validation_response)
+    except Exception as e:
+        print(f"❌ Erreur lors de l'appel au modèle pour la validation du document : {e}")
+        return {"summary": None, "is_relevant": False}
+    return _parse_validation_response(response_json_str)
+
+
+def validate_and_summarize_documents(query: str, subquery: str, document_contents: list[str]) -> list[dict]:
+    """
+    Validates and summarizes several documents for the same sub-question in a single model call.
+
+    The system prompt is sent once and the model answers with a JSON array. If the answer is
+    malformed (invalid JSON, wrong length), every document is validated individually instead.
+
+    Args:
+        query: The initial broad research query.
+        subquery: The specific sub-question the documents are being evaluated against.
+        document_contents: The text contents of the documents to be analyzed.
+
+    Returns:
+        A list of {'summary', 'is_relevant'} dictionaries, in the order of `document_contents`.
+    """
+    if len(document_contents) == 1:
+        return [validate_and_summarize_document(query, subquery, document_contents[0])]
+
+    messages = _build_batch_validation_messages(query, subquery, document_contents)
+    try:
+        expected = len(document_contents)
+        response_json_str = request_mistral_model(
+            messages, cache_if=lambda response: _parse_batch_validation_response(response, expected) is not None)
+        results = _parse_batch_validation_response(response_json_str, expected)
+    except Exception as e:
+        print(f"❌ Erreur lors de l'appel au modèle pour la validation groupée : {e}")
+        results = None
+
+    if results is None:
+        print(f"⚠️ Réponse groupée invalide pour {len(document_contents)} documents. Validation document par document.")
+        return [validate_and_summarize_document(query, subquery, content) for content in document_contents]
+    return results
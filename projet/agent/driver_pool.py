@@ -0,0 +1,275 @@
+import atexit
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from .config import HEADERS, PROXIES, driver_pool_size, driver_max_pages, driver_borrow_timeout
+
+
+class _PooledDriver:
+    """A live Chrome driver with the key it was launched with and its usage count."""
+
+    def __init__(self, driver, key):
+        self.driver = driver
+        self.key = key
+        self.pages = 0
+
+
+class DriverPool:
+    """
+    Bounded pool of warm headless Chrome drivers, keyed by (user-agent, proxy).
+
+    Drivers are launched lazily, handed out with `borrow`/`release` (or the `driver`
+    context manager), health-checked before reuse and recycled after `max_pages` pages.
+
+    Args:
+        launch_driver: Callable(user_agent, proxy) returning a new Selenium driver.
+        close_driver: Callable(driver) quitting a Selenium driver.
+        headers_list: Header sets to pick user-agents from.
+        proxy_list: Proxies to pick from (False for no proxy).
+    """
+
+    def __init__(self, launch_driver, close_driver, headers_list, proxy_list, max_size=driver_pool_size,
+                 max_pages=driver_max_pages, borrow_timeout=driver_borrow_timeout):
+        self._launch_driver = launch_driver
+        self._close_driver = close_driver
+        self.headers_list = headers_list
+        self.proxy_list = proxy_list
+        self.max_size = max_size
+        self.max_pages = max_pages
+        self.borrow_timeout = borrow_timeout
+
+        self._idle = {}
+        self._live = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        self._borrows = 0
+        self._hits = 0
+        self._launches = 0
+        self._recycled = 0
+        self._unhealthy = 0
+        self._total_wait = 0.0
+
+    def _pick_key(self):
+        user_agent = random.choice(self.headers_list)['User-Agent']
+        proxy = random.choice(self.proxy_list)
+        return user_agent, proxy
+
+    @staticmethod
+    def _is_healthy(pooled):
+        try:
+            pooled.driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def _take_idle(self, key):
+        """Pops an idle driver launched with `key`, if any. Caller holds the lock."""
+        if self._idle.get(key):
+            return self._idle[key].pop()
+        return None
+
+    def _take_any_idle(self):
+        """Pops an idle driver of any key, if any. Caller holds the lock."""
+        for drivers in self._idle.values():
+            if drivers:
+                return drivers.pop()
+        return None
+
+    def _evict_idle_other_key(self):
+        """Detaches one idle driver of another key to free a slot. Caller holds the lock."""
+        for drivers in self._idle.values():
+            if drivers:
+                pooled = drivers.pop()
+                self._live -= 1
+                return pooled
+        return None
+
+    def borrow(self, key=None):
+        """
+        Borrows a driver from the pool, launching one if a slot is free.
+
+        Args:
+            key: An optional (user_agent, proxy) tuple. If omitted, any idle driver is handed
+                 out, and a random key is only picked when a new driver has to be launched.
+
+        Returns:
+            A _PooledDriver that must be handed back with `release`.
+        """
+        start = time.monotonic()
+        deadline = start + self.borrow_timeout
+
+        while True:
+            to_close = None
+            launch = False
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("Le pool de drivers est fermé.")
+                pooled = self._take_idle(key) if key else self._take_any_idle()
+                if pooled is None:
+                    if self._live < self.max_size:
+                        self._live += 1
+                        launch = True
+                    elif key:
+                        to_close = self._evict_idle_other_key()
+                        if to_close is not None:
+                            self._live += 1
+                            launch = True
+                    if not launch:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise TimeoutError("Aucun driver disponible dans le pool.")
+                        self._cond.wait(remaining)
+                        continue
+
+            if to_close is not None:
+                self._close_driver(to_close.driver)
+
+            if launch:
+                launch_key = key or self._pick_key()
+                try:
+                    driver = self._launch_driver(launch_key[0], launch_key[1])
+                except Exception:
+                    with self._cond:
+                        self._live -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._borrows += 1
+                    self._launches += 1
+                    self._total_wait += time.monotonic() - start
+                return _PooledDriver(driver, launch_key)
+
+            if not self._is_healthy(pooled):
+                self._close_driver(pooled.driver)
+                with self._cond:
+                    self._live -= 1
+                    self._unhealthy += 1
+                    self._cond.notify()
+                continue
+
+            with self._cond:
+                self._borrows += 1
+                self._hits += 1
+                self._total_wait += time.monotonic() - start
+            return pooled
+
+    def release(self, pooled, broken=False):
+        """
+        Returns a borrowed driver to the pool, or closes it if broken or worn out.
+
+        Args:
+            pooled: The _PooledDriver obtained from `borrow`.
+            broken: True if the driver failed and must not be reused.
+        """
+        pooled.pages += 1
+        retire = broken or pooled.pages >= self.max_pages
+        with self._cond:
+            if self._closed:
+                retire = True
+            if retire:
+                self._live -= 1
+                if not broken and pooled.pages >= self.max_pages:
+                    self._recycled += 1
+            else:
+                self._idle.setdefault(pooled.key, []).append(pooled)
+            self._cond.notify()
+        if retire:
+            self._close_driver(pooled.driver)
+
+    @contextmanager
+    def driver(self, key=None):
+        """
+        Context manager yielding a borrowed Selenium driver. If the block raises, the driver is
+        only discarded when it no longer answers (a page error does not break the browser).
+        """
+        pooled = self.borrow(key)
+        broken = False
+        try:
+            yield pooled.driver
+        except Exception:
+            broken = not self._is_healthy(pooled)
+            raise
+        finally:
+            self.release(pooled, broken=broken)
+
+    def metrics(self) -> dict:
+        """
+        Returns the pool usage metrics.
+
+        Returns:
+            A dictionary with borrow count, hit rate, launch count, recycled and unhealthy
+            driver counts and the average time spent waiting for a driver (seconds).
+        """
+        with self._cond:
+            borrows = self._borrows
+            return {
+                "borrows": borrows,
+                "hit_rate": (self._hits / borrows) if borrows else 0.0,
+                "launches": self._launches,
+                "recycled": self._recycled,
+                "unhealthy": self._unhealthy,
+                "avg_borrow_wait": (self._total_wait / borrows) if borrows else 0.0,
+                "live": self._live,
+            }
+
+    def trim_idle(self, max_live: int) -> int:
+        """
+        Closes idle drivers until at most `max_live` drivers are alive (or none is idle).
+
+        Returns:
+            The number of drivers closed.
+        """
+        to_close = []
+        with self._cond:
+            while self._live > max_live:
+                pooled = self._evict_idle_other_key()
+                if pooled is None:
+                    break
+                to_close.append(pooled)
+        for pooled in to_close:
+            self._close_driver(pooled.driver)
+        return len(to_close)
+
+    def close(self):
+        """Closes every idle driver and refuses further borrows."""
+        with self._cond:
+            self._closed = True
+            to_close = [pooled for drivers in self._idle.values() for pooled in drivers]
+            self._idle = {}
+            self._live -= len(to_close)
+            self._cond.notify_all()
+        for pooled in to_close:
+            self._close_driver(pooled.driver)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_driver_pool() -> DriverPool:
+    """Returns the process-wide driver pool, creating it on first use."""
+    from .selenium_util import initialize_driver, close_driver
+
+    def launch_driver(user_agent, proxy):
+        return initialize_driver(HEADERS, PROXIES, user_agent=user_agent, proxy=proxy)
+
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool._closed:
+            _pool = DriverPool(launch_driver, close_driver, HEADERS, PROXIES)
+        return _pool
+
+
+def shutdown_driver_pool():
+    """Closes the process-wide driver pool if it was created."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+atexit.register(shutdown_driver_pool)
@@ -0,0 +1,65 @@
+import re
+from functools import lru_cache
+
+_CITATION = re.compile(r"\[(\d+(?:\s*,\s*\d+)*)\](?!\()")
+
+
+def _freeze(documents: list[dict]) -> tuple:
+    return tuple((doc.get("url") or "", doc.get("subquestion") or "", (doc.get("summary") or "").strip())
+                 for doc in documents)
+
+
+@lru_cache(maxsize=32)
+def _build(frozen_documents: tuple) -> tuple[str, tuple]:
+    urls = []
+    summaries_by_url = {}
+    subquestions_by_url = {}
+    for url, subquestion, summary in frozen_documents:
+        if url not in summaries_by_url:
+            urls.append(url)
+            summaries_by_url[url] = []
+            subquestions_by_url[url] = subquestion
+        if summary and summary not in summaries_by_url[url]:
+            summaries_by_url[url].append(summary)
+
+    sections = []
+    current_subquestion = None
+    for number, url in enumerate(urls, start=1):
+        if subquestions_by_url[url] != current_subquestion:
+            current_subquestion = subquestions_by_url[url]
+            sections.append(f"## {current_subquestion}")
+        sections.append(f"[{number}] " + " ".join(summaries_by_url[url]))
+    return "\n".join(sections), tuple(urls)
+
+
+def build_evidence_pack(documents: list[dict]) -> tuple[str, list[str]]:
+    """
+    Renders validated documents as a compact, numbered evidence pack shared by the
+    synthesis and validation prompts, so both see the same source numbers.
+
+    Documents are deduplicated by URL and grouped under their sub-question; only the
+    summaries are kept. The result is memoized, so retries reuse the exact same text.
+
+    Args:
+        documents: Validated documents with 'url', 'subquestion' and 'summary' fields.
+
+    Returns:
+        A tuple (pack_text, urls) where urls[i] is the URL of source [i + 1].
+    """
+    text, urls = _build(_freeze(documents))
+    return text, list(urls)
+
+
+def link_citations(text: str, urls: list[str]) -> str:
+    """
+    Turns the numbered citations of the model ("[2]" or "[1, 3]") into markdown links to the sources.
+    Numbers outside the evidence pack are left untouched.
+    """
+    def _link(match):
+        numbers = [int(n) for n in re.split(r"\s*,\s*", match.group(1))]
+        if not all(1 <= n <= len(urls) for n in numbers):
+            return match.group(0)
+        return ", ".join(f"[{n}]({urls[n - 1]})" for n in numbers)
+
+    return _CITATION.sub(_link, text)
+
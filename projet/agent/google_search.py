@@ -1,17 +1,132 @@
 from googlesearch import search
+import random
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
-def fetch_search_results_with_googlesearch(query, n=5, retries=3):
-    results = []
+from .config import search_cache_ttl, search_max_workers, search_backoff_base
+from .tracing import span, current_span
+
+
+def googlesearch_backend(query: str, n: int) -> list[str]:
+    """Default search backend: live Google results through googlesearch-python."""
+    return list(search(query, num_results=n))
+
+
+class StaticSearchBackend:
+    """
+    Search backend answering from a local index, for tests and offline benchmarks.
+
+    Args:
+        index: Maps a query to its ordered list of result URLs.
+        default: Callable(query, n) used for queries missing from the index. Returns no result if omitted.
+    """
+
+    def __init__(self, index: dict[str, list[str]], default=None):
+        self.index = index
+        self.default = default
+
+    def __call__(self, query: str, n: int) -> list[str]:
+        if query in self.index:
+            return self.index[query][:n]
+        return list(self.default(query, n))[:n] if self.default else []
+
+
+class SearchResultCache:
+    """
+    Thread-safe in-memory cache of search results per query.
+
+    A query is fetched at most once at a time: concurrent callers wait for the running
+    fetch. A request for fewer results than cached is served from the cached list.
+    """
+
+    def __init__(self, ttl: float = search_cache_ttl):
+        self.ttl = ttl
+        self._entries = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def _key_lock(self, query: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(query, threading.Lock())
+
+    def get_or_fetch(self, query: str, n: int, fetch) -> list:
+        with self._key_lock(query):
+            entry = self._entries.get(query)
+            if entry and time.monotonic() - entry["at"] <= self.ttl and (entry["n"] >= n or entry["exhausted"]):
+                return entry["results"][:n]
+            results = fetch(query, n)
+            if results:
+                self._entries[query] = {
+                    "results": results, "n": n, "exhausted": len(results) < n, "at": time.monotonic()
+                }
+            return results[:n]
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._key_locks = {}
+
+
+_backend = googlesearch_backend
+search_cache = SearchResultCache()
+
+
+def set_search_backend(backend):
+    """
+    Replaces the search backend (e.g. with a StaticSearchBackend) and clears the result cache.
+
+    Args:
+        backend: Callable(query, n) returning a list of result URLs.
+    """
+    global _backend
+    _backend = backend
+    search_cache.clear()
+
+
+def _fetch_with_retries(query: str, n: int, retries: int = 3) -> list:
     for attempt in range(retries):
         try:
-            for url in search(query, num_results=n):
-                results.append(("", url))
-            return results
+            return [("", url) for url in _backend(query, n)]
         except Exception as e:
             print(f"Erreur durant la recherche avec googlesearch (tentative {attempt+1}/{retries}): {e}")
             if attempt < retries - 1:
-                time.sleep(2)
-            else:
-                return []
-    return []
\ No newline at end of file
+                current_span().incr("retries")
+                time.sleep(random.uniform(0.5, 1.5) * search_backoff_base * 2 ** attempt)
+    return []
+
+
+def fetch_search_results_with_googlesearch(query, n=5, retries=3):
+    """
+    Returns up to `n` search results for `query` as ("", url) tuples.
+    Results are cached, so the initial scrape and the replacement search share one request.
+    """
+    with span("search", query=query, n=n) as search_span:
+        fetched = []
+
+        def fetch(q, size):
+            fetched.append(q)
+            return _fetch_with_retries(q, size, retries)
+
+        results = search_cache.get_or_fetch(query, n, fetch)
+        search_span.set(results=len(results), cache_hits=0 if fetched else 1)
+        return results
+
+
+def fetch_search_results_parallel(queries: list[str], n: int) -> dict:
+    """
+    Runs the searches of several queries concurrently.
+
+    Args:
+        queries: The queries to search.
+        n: The number of results to fetch for each query.
+
+    Returns:
+        A dictionary mapping each query to its list of ("", url) tuples.
+    """
+    unique_queries = list(dict.fromkeys(queries))
+    if not unique_queries:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(len(unique_queries), search_max_workers)) as executor:
+        results = executor.map(lambda q: fetch_search_results_with_googlesearch(q, n), unique_queries)
+        return dict(zip(unique_queries, results))
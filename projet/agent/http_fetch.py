@@ -0,0 +1,253 @@
+import codecs
+import random
+import re
+import threading
+from html.parser import HTMLParser
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .config import HEADERS, http_fetch_timeout, http_fetch_max_bytes, http_min_text_length, max_thread
+
+# HTTP statuses meaning the site is throttling us: retrying it in a browser right away would not help
+THROTTLING_STATUSES = (429, 503)
+
+
+class ThrottledError(Exception):
+    """Raised when a site answers with a throttling status (429 or 503)."""
+
+    def __init__(self, url: str, status: int, retry_after: float | None = None):
+        super().__init__(f"HTTP {status} sur {url}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    """Reads a Retry-After header given in seconds (the HTTP-date form is ignored)."""
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
+
+
+# Markers of pages whose content is built client-side (SPA shells, "enable JavaScript" notices).
+JS_RENDERED_MARKERS = (
+    'id="root"></div>',
+    'id="app"></div>',
+    'id="__next"',
+    "__NEXT_DATA__",
+    "__NUXT__",
+    "ng-version=",
+    "data-reactroot",
+    "enable javascript",
+    "activer javascript",
+    "activez javascript",
+)
+
+_BLOCK_TAGS = {"script", "style", "noscript", "template", "svg"}
+_WHITESPACE = re.compile(r"\s+")
+_CHARSET = re.compile(rb"""charset=["']?([\w.:-]+)""", re.IGNORECASE)
+
+
+class _TitleParagraphParser(HTMLParser):
+    """Streaming HTML parser collecting the first h1, the <title> and the text of every <p>."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.h1 = None
+        self.page_title = ""
+        self.paragraphs = []
+        self.script_count = 0
+        self._current = None
+        self._buffer = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _BLOCK_TAGS:
+            self._skip_depth += 1
+            if tag == "script":
+                self.script_count += 1
+            return
+        if tag in ("p", "title") or (tag == "h1" and self.h1 is None):
+            self._flush()
+            self._current = tag
+        elif tag == "br" and self._current:
+            self._buffer.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag in _BLOCK_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+            return
+        if tag == self._current:
+            self._flush()
+
+    def handle_data(self, data):
+        if self._current and not self._skip_depth:
+            self._buffer.append(data)
+
+    def _flush(self):
+        text = _WHITESPACE.sub(" ", "".join(self._buffer)).strip()
+        if self._current == "p" and text:
+            self.paragraphs.append(text)
+        elif self._current == "h1":
+            self.h1 = text
+        elif self._current == "title" and not self.page_title:
+            self.page_title = text
+        self._current = None
+        self._buffer = []
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+class ScrapeTierStats:
+    """Thread-safe per-tier counters and latencies for the scraping fetch tiers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tiers = {}
+
+    def record(self, tier: str, seconds: float, transfer_bytes: int | None = None):
+        """Records one page served by `tier` in `seconds`, with the bytes it transferred if known."""
+        with self._lock:
+            stats = self._tiers.setdefault(tier, {"count": 0, "total_seconds": 0.0})
+            stats["count"] += 1
+            stats["total_seconds"] += seconds
+            if transfer_bytes is not None:
+                stats["measured_pages"] = stats.get("measured_pages", 0) + 1
+                stats["transfer_bytes"] = stats.get("transfer_bytes", 0) + transfer_bytes
+
+    def summary(self) -> dict:
+        """
+        Returns the statistics per tier.
+
+        Returns:
+            A dictionary mapping tier names ('http', 'http_escalated', 'selenium', ...) to
+            {'count', 'total_seconds', 'avg_seconds'}, plus 'measured_pages' and 'transfer_bytes'
+            for the tiers reporting the bytes transferred.
+        """
+        with self._lock:
+            return {
+                tier: {**stats, "avg_seconds": stats["total_seconds"] / stats["count"]}
+                for tier, stats in self._tiers.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._tiers = {}
+
+
+tier_stats = ScrapeTierStats()
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _get_session() -> requests.Session:
+    """Returns the process-wide HTTP session, with a connection pool sized for the scrape workers."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=max_thread, pool_maxsize=max_thread, max_retries=1)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def _detect_encoding(content_type: str, first_chunk: bytes) -> str:
+    """Reads the charset from the Content-Type header, then from a <meta> tag, defaulting to UTF-8."""
+    for source in (content_type.encode("latin-1", errors="ignore"), first_chunk[:4096]):
+        match = _CHARSET.search(source)
+        if match:
+            encoding = match.group(1).decode("ascii", errors="ignore")
+            try:
+                codecs.lookup(encoding)
+                return encoding
+            except LookupError:
+                continue
+    return "utf-8"
+
+
+def looks_js_rendered(raw_html: str, paragraphs: list[str], script_count: int) -> bool:
+    """
+    Guesses whether a page needs a real browser to expose its text.
+
+    Args:
+        raw_html: The beginning of the downloaded HTML.
+        paragraphs: The paragraph texts extracted without JavaScript.
+        script_count: The number of <script> tags seen.
+
+    Returns:
+        True if the page should be escalated to Selenium.
+    """
+    text_length = sum(len(p) for p in paragraphs)
+    if text_length >= http_min_text_length:
+        return False
+    lowered = raw_html.lower()
+    if any(marker.lower() in lowered for marker in JS_RENDERED_MARKERS):
+        return True
+    return text_length == 0 or script_count > 10
+
+
+def fetch_url_static(url: str, timeout: float = http_fetch_timeout) -> dict | None:
+    """
+    Fetches a page over plain HTTP and extracts the same data as `scrape_url`.
+
+    The body is streamed into an incremental HTML parser, so huge pages are cut at
+    `http_fetch_max_bytes` without being fully downloaded.
+
+    Args:
+        url: The URL to fetch.
+        timeout: Connect/read timeout in seconds.
+
+    Returns:
+        A dictionary with 'title' and 'paragraphs', or None if the page must be
+        scraped with Selenium (non-HTML, HTTP error, empty or JS-rendered content).
+
+    Raises:
+        ThrottledError: If the site answers 429 or 503, so the caller can back off.
+    """
+    headers = dict(random.choice(HEADERS))
+    headers.pop("Host", None)
+    try:
+        with _get_session().get(url, headers=headers, timeout=timeout, stream=True) as resp:
+            if resp.status_code in THROTTLING_STATUSES:
+                raise ThrottledError(url, resp.status_code, _parse_retry_after(resp.headers.get("Retry-After")))
+            if resp.status_code >= 400:
+                return None
+            content_type = resp.headers.get("Content-Type", "")
+            if content_type and "html" not in content_type:
+                return None
+
+            parser = _TitleParagraphParser()
+            decoder = None
+            head = []
+            received = 0
+            for chunk in resp.iter_content(chunk_size=16384):
+                if decoder is None:
+                    encoding = _detect_encoding(content_type, chunk)
+                    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+                text = decoder.decode(chunk)
+                if received < 65536:
+                    head.append(text)
+                parser.feed(text)
+                received += len(chunk)
+                if received >= http_fetch_max_bytes:
+                    break
+            if decoder is not None:
+                parser.feed(decoder.decode(b"", final=True))
+            parser.close()
+    except ThrottledError:
+        raise
+    except Exception:
+        return None
+
+    if looks_js_rendered("".join(head), parser.paragraphs, parser.script_count):
+        return None
+    return {
+        "title": (parser.h1 or parser.page_title).strip(),
+        "paragraphs": "\n\n".join(parser.paragraphs),
+    }
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .config import llm_cache_enabled, llm_cache_path, llm_cache_max_entries, llm_cache_ttl
+
+
+def cache_key(model_name: str, messages: list[dict]) -> str:
+    """Hashes the model name and the exact messages of a chat request."""
+    payload = json.dumps({"model": model_name, "messages": messages}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    SQLite memoization of chat completions, keyed by model name plus a hash of the messages.
+
+    Entries expire after `ttl` seconds and the table is trimmed to `max_entries` by evicting
+    the least recently used rows.
+    """
+
+    def __init__(self, path: str = llm_cache_path, max_entries: int = llm_cache_max_entries,
+                 ttl: float = llm_cache_ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " response TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._conn.commit()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    def get(self, key: str) -> str | None:
+        """Returns the cached response for `key`, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self._stats["misses"] += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self._stats["hits"] += 1
+            return row[0]
+
+    def put(self, key: str, model_name: str, response: str):
+        """Stores a response and evicts the least recently used entries beyond `max_entries`."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, model_name, response, now, now)
+            )
+            self._stats["writes"] += 1
+            count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if count > self.max_entries:
+                excess = count - int(self.max_entries * 0.9)
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                    (excess,)
+                )
+                self._stats["evictions"] += excess
+            self._conn.commit()
+
+    def delete(self, key: str):
+        """Removes the response cached for `key`, if any."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """Returns the hit/miss/write/eviction counters."""
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMCache | None:
+    """Returns the process-wide LLM cache, or None if it is disabled in the configuration."""
+    global _cache
+    if not llm_cache_enabled:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
@@ -1,15 +1,22 @@
-import json
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 
 # Use relative imports for modules within the same package
 from .selenium_util import scrape_worker_threaded
-from .google_search import fetch_search_results_with_googlesearch
-from .config import max_thread, max_synth_retries, max_retry_document
+from .google_search import fetch_search_results_with_googlesearch, fetch_search_results_parallel
+from .config import (max_thread, max_synth_retries, max_retry_document, max_doc_analysis_workers, research_mode,
+                     batch_validation, replacement_overscrape, synthesis_repair, warm_start_similarity)
 
 # Corrected imports for other modules within the agent package
-from .mistral_client import request_mistral_model
-from .document_processing import validate_and_summarize_document
-from .validation_synthesis import validate_final_synthesis
+from .mistral_client import request_mistral_model, stream_mistral_model
+from .document_processing import validate_and_summarize_documents, pack_document_batches
+from .validation_synthesis import validate_final_synthesis, repair_synthesis
+from .relevance import prefilter_documents
+from .evidence_pack import build_evidence_pack, link_citations
+from .scheduler import interleave_by_host
+from .tracing import traced, current_span
+from .text_utils import closest_text
 
 # --- Global Configuration/State (mimicking parts of the class for clarity) ---
 ALL_STEPS = [
@@ -27,6 +34,7 @@ ALL_STEPS = [
 TOTAL_STEPS = len(ALL_STEPS)
 
 
+@traced("workflow.subqueries")
 def generate_subqueries_for_ui(query: str, k_pick: int, progress_callback) -> list[str]:
     """
     Generates subqueries and returns them to the UI.
@@ -57,14 +65,9 @@ def generate_subqueries_for_ui(query: str, k_pick: int, progress_callback) -> li
         )
     }
     messages = [system_msg, user_msg]
-    raw_text = request_mistral_model(messages)
-    subqueries = []
-    for line in raw_text.splitlines():
-        line = line.strip()
-        if line.startswith(tuple(f"{i}." for i in range(1, k_pick + 1))):
-            parts = line.split(".", 1)
-            if len(parts) > 1:
-                subqueries.append(parts[1].strip())
+    raw_text = request_mistral_model(messages,
+                                     cache_if=lambda response: len(_parse_subqueries(response, k_pick)) >= k_pick)
+    subqueries = _parse_subqueries(raw_text, k_pick)
     if len(subqueries) < k_pick:
         print(f"⚠️ Seulement {len(subqueries)} sous-questions extraites sur {k_pick} attendues.")
         print("Réponse brute :", raw_text)
@@ -79,6 +82,79 @@ def generate_subqueries_for_ui(query: str, k_pick: int, progress_callback) -> li
     return subqueries
 
 
+def _parse_subqueries(raw_text: str, k_pick: int) -> list[str]:
+    """Reads the sub-questions of a numbered list answered by the model."""
+    subqueries = []
+    for line in raw_text.splitlines():
+        line = line.strip()
+        if line.startswith(tuple(f"{i}." for i in range(1, k_pick + 1))):
+            parts = line.split(".", 1)
+            if len(parts) > 1:
+                subqueries.append(parts[1].strip())
+    return subqueries
+
+
+def _relevant_entry(doc: dict, summary: str) -> dict:
+    """Builds the validated-document record kept for the synthesis from a scraped document."""
+    return {
+        "url": doc.get("url"),
+        "subquestion": doc.get("subquestion"),
+        "title": doc.get("title"),
+        "summary": summary
+    }
+
+
+def _replacement_search_size(max_new_url_attempts: int = 5) -> int:
+    """Number of search results needed by the replacement-document search of a sub-question."""
+    return (max_retry_document or 10) + max_new_url_attempts * 2
+
+
+def _warm_start(subqueries: list[str], n_results: int, prior_result: dict | None) -> tuple[dict, set]:
+    """
+    Takes over the validated documents of a previous research result.
+
+    Args:
+        subqueries: The sub-questions of the new research.
+        n_results: The desired number of relevant results per subquery.
+        prior_result: A result dictionary of `perform_full_research`, or None.
+
+    Returns:
+        A tuple (prior_docs_by_subq, visited_urls): for each sub-question, the documents of the
+        previous sub-question it matches (same text once normalized, or at least
+        `warm_start_similarity` similar), each URL at most once and at most `n_results`; and
+        every URL the previous research kept.
+    """
+    prior_docs_by_subq = {sq: [] for sq in subqueries}
+    visited_urls = set()
+    if not prior_result:
+        return prior_docs_by_subq, visited_urls
+    previous_docs = {}
+    for doc in prior_result.get("documents", []):
+        url = doc.get("url")
+        if not url or url in visited_urls:
+            continue
+        visited_urls.add(url)
+        previous_docs.setdefault(doc.get("subquestion"), []).append(doc)
+    for group in prior_result.get("sources", []):
+        visited_urls.update(group.get("urls", []))
+
+    # Identical sub-questions are matched first, so a merely similar one cannot take their documents
+    for threshold in (float("inf"), warm_start_similarity):
+        for sq in subqueries:
+            if prior_docs_by_subq[sq]:
+                continue
+            match = closest_text(sq, [q for q in previous_docs if q], threshold)
+            if match is not None:
+                # Each previous sub-question feeds a single new one, under the new wording
+                prior_docs_by_subq[sq] = [{**doc, "subquestion": sq} for doc in previous_docs.pop(match)[:n_results]]
+    reused = sum(len(docs) for docs in prior_docs_by_subq.values())
+    if reused:
+        print(f"♻️ {reused} document(s) validé(s) réutilisé(s) depuis la recherche précédente.")
+    current_span().set(reused_documents=reused)
+    return prior_docs_by_subq, visited_urls
+
+
+@traced("workflow.search_scrape")
 def _fetch_and_scrape_urls(subqueries: list[str], n_results: int, visited_urls: set, progress_callback) -> dict:
     """
     Fetches search results and scrapes content from unique URLs for each subquery.
@@ -98,9 +174,12 @@ def _fetch_and_scrape_urls(subqueries: list[str], n_results: int, visited_urls:
     tasks = []
     documents_by_subq = {sq: [] for sq in subqueries}
 
+    # One over-fetched search per sub-question, shared with the replacement search through the cache.
+    results_to_fetch = max(n_results + 3, _replacement_search_size())
+    results_by_subq = fetch_search_results_parallel(subqueries, results_to_fetch)
+
     for i, subq in enumerate(subqueries, 1):
-        results_to_fetch = n_results + 3
-        all_results = fetch_search_results_with_googlesearch(subq, results_to_fetch)
+        all_results = results_by_subq.get(subq, [])
         urls_collected = 0
         print(f"URLs récupérées pour sous-question {i} :")
         for title, url in all_results:
@@ -122,8 +201,9 @@ def _fetch_and_scrape_urls(subqueries: list[str], n_results: int, visited_urls:
     max_workers = min(len(tasks), max_thread)
     progress_callback(40, ALL_STEPS[current_step_idx], current_step_idx)
 
+    # Round-robin across hosts, so the per-host politeness delays overlap instead of stalling workers
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [executor.submit(scrape_worker_threaded, task) for task in tasks]
+        futures = [executor.submit(scrape_worker_threaded, task) for task in interleave_by_host(tasks)]
         for future in futures:
             result = future.result()
             if result:
@@ -144,8 +224,157 @@ def _fetch_and_scrape_urls(subqueries: list[str], n_results: int, visited_urls:
     return documents_by_subq
 
 
+@traced("workflow.validate_documents")
+def _validate_documents(query: str, subq: str, docs: list[dict], relevant_docs_for_subq: list[dict], n_results: int,
+                        label: str = "Document") -> None:
+    """
+    Validates and summarizes documents in parallel, appending the relevant ones to `relevant_docs_for_subq`
+    until it holds `n_results` documents. With `batch_validation`, several documents share one model call.
+
+    Args:
+        query: The main research query.
+        subq: The sub-question the documents belong to.
+        docs: The scraped documents to analyze.
+        relevant_docs_for_subq: The relevant documents already kept for this sub-question (updated in place).
+        n_results: The target number of relevant documents per subquery.
+        label: How the documents are named in the console output.
+    """
+    docs = prefilter_documents(docs, subq, query)
+    if not docs:
+        return
+    contents = [doc.get('paragraphs') for doc in docs]
+    if batch_validation and len(docs) > 1:
+        groups = pack_document_batches(contents)
+    else:
+        groups = [[i] for i in range(len(docs))]
+
+    with ThreadPoolExecutor(max_workers=max_doc_analysis_workers) as executor:
+        future_to_group = {
+            executor.submit(validate_and_summarize_documents, query, subq, [contents[i] for i in group]): group
+            for group in groups
+        }
+        for future in as_completed(future_to_group):
+            if len(relevant_docs_for_subq) >= n_results:
+                for f in future_to_group:
+                    f.cancel()
+                break
+
+            group_docs = [docs[i] for i in future_to_group[future]]
+            try:
+                results = future.result()
+            except Exception as exc:
+                for doc in group_docs:
+                    print(f"❌ Erreur lors de l'analyse du document {doc.get('url')}: {exc}")
+                continue
+
+            for doc, response_data in zip(group_docs, results):
+                if len(relevant_docs_for_subq) >= n_results:
+                    break
+                if response_data.get("is_relevant", False):
+                    relevant_docs_for_subq.append(_relevant_entry(doc, response_data.get("summary")))
+                    print(f"✅ {label} pertinent trouvé : {doc.get('url')}")
+                else:
+                    print(f"⚠️ Document de {doc.get('url')} jugé non pertinent.")
+
+
+@traced("workflow.replacement_documents")
+def _find_replacement_documents(query: str, subq: str, search_results: list, relevant_docs_for_subq: list[dict],
+                                n_results: int, visited_urls: set, max_new_url_attempts: int) -> int:
+    """
+    Scrapes replacement URLs concurrently and streams each page into validation as soon as it arrives.
+
+    At most `missing documents + replacement_overscrape` URLs are scraped or validated at the same time
+    (speculative over-scraping), and everything still outstanding is cancelled as soon as the
+    sub-question reaches `n_results` relevant documents.
+
+    Args:
+        query: The main research query.
+        subq: The sub-question needing more documents.
+        search_results: The search results to take replacement URLs from, as (title, url) tuples.
+        relevant_docs_for_subq: The relevant documents already kept for this sub-question (updated in place).
+        n_results: The target number of relevant documents per subquery.
+        visited_urls: A set of URLs already visited to avoid duplicates.
+        max_new_url_attempts: The maximum number of new URLs to scrape.
+
+    Returns:
+        The number of replacement URLs that were scraped.
+    """
+    max_attempts = min(max_new_url_attempts, max_retry_document or max_new_url_attempts)
+    candidates = iter(task["url"] for task in interleave_by_host([{"url": url} for _, url in search_results]))
+    attempts = 0
+    scrape_futures = {}
+    validation_futures = {}
+    scrape_executor = ThreadPoolExecutor(max_workers=max_thread)
+    validation_executor = ThreadPoolExecutor(max_workers=max_doc_analysis_workers)
+
+    def submit_scrapes():
+        nonlocal attempts
+        while attempts < max_attempts:
+            missing = n_results - len(relevant_docs_for_subq)
+            if len(scrape_futures) + len(validation_futures) >= missing + replacement_overscrape:
+                return
+            new_url = next(candidates, None)
+            if new_url is None:
+                return
+            if new_url in visited_urls:
+                print(f"ℹ️ URL {new_url} déjà visitée ou en cours de traitement. Passons à la suivante.")
+                continue
+            print(f"✅ Nouvelle URL de remplacement potentielle : {new_url}")
+            visited_urls.add(new_url)
+            attempts += 1
+            future = scrape_executor.submit(scrape_worker_threaded, {"url": new_url, "subquestion": subq})
+            scrape_futures[future] = new_url
+
+    try:
+        submit_scrapes()
+        while (scrape_futures or validation_futures) and len(relevant_docs_for_subq) < n_results:
+            done, _ = wait(list(scrape_futures) + list(validation_futures), return_when=FIRST_COMPLETED)
+            for future in done:
+                if len(relevant_docs_for_subq) >= n_results:
+                    break
+                if future in scrape_futures:
+                    del scrape_futures[future]
+                    new_doc = future.result()
+                    if not new_doc:
+                        continue
+                    paragraphs = new_doc.get("paragraphs", "")
+                    if len(paragraphs) > 100:
+                        if not prefilter_documents([new_doc], subq, query):
+                            continue
+                        validation_future = validation_executor.submit(
+                            validate_and_summarize_documents, query, subq, [paragraphs]
+                        )
+                        validation_futures[validation_future] = new_doc
+                    elif paragraphs.strip():
+                        relevant_docs_for_subq.append(_relevant_entry(new_doc, paragraphs))
+                        print(f"✅ Document de remplacement court mais pertinent trouvé : {new_doc.get('url')}")
+                    else:
+                        print(f"⚠️ Document de {new_doc.get('url')} est vide ou trop court. Ignoré.")
+                else:
+                    doc = validation_futures.pop(future)
+                    try:
+                        response_data = future.result()[0]
+                    except Exception as exc:
+                        print(f"❌ Erreur lors de l'analyse du document de remplacement {doc.get('url')}: {exc}")
+                        continue
+                    if response_data.get("is_relevant", False):
+                        relevant_docs_for_subq.append(_relevant_entry(doc, response_data.get("summary")))
+                        print(f"✅ Document de remplacement pertinent trouvé : {doc.get('url')}")
+                    else:
+                        print(f"⚠️ Document de {doc.get('url')} jugé non pertinent.")
+            submit_scrapes()
+    finally:
+        for future in list(scrape_futures) + list(validation_futures):
+            future.cancel()
+        scrape_executor.shutdown(wait=False, cancel_futures=True)
+        validation_executor.shutdown(wait=False, cancel_futures=True)
+    return attempts
+
+
+@traced("workflow.process_documents")
 def _process_documents(query: str, subqueries: list[str], documents_by_subq: dict, n_results: int, visited_urls: set,
-                       progress_callback, max_new_url_attempts: int = 5) -> list[dict]:
+                       progress_callback, max_new_url_attempts: int = 5,
+                       prior_docs_by_subq: dict | None = None) -> list[dict]:
     """
     Processes scraped documents by validating their relevance and summarizing them using threads.
     Also handles replacement document search if initial documents are insufficient.
@@ -158,25 +387,28 @@ def _process_documents(query: str, subqueries: list[str], documents_by_subq: dic
         visited_urls: A set of URLs already visited to avoid duplicates.
         progress_callback: A function to update the UI's progress.
         max_new_url_attempts: The maximum number of *new, unvisited* URLs to attempt for each subquery
-                              if initial documents are insufficient.
-        max_retry_document: The absolute maximum number of search results to iterate through
-                              for replacement URLs (this acts as a limit on 'i').
+                              if initial documents are insufficient (also capped by `max_retry_document`).
+        prior_docs_by_subq: Optional documents already validated for each sub-question by a previous
+                            research; only the missing ones are searched for.
 
     Returns:
         A list of validated and summarized relevant documents.
     """
+    prior_docs_by_subq = prior_docs_by_subq or {}
     current_step_idx = 4
     progress_callback(60, ALL_STEPS[current_step_idx], current_step_idx)
     validated_summaries = []
 
-    MAX_DOC_ANALYSIS_WORKERS = 4
-
     for subq_idx, subq in enumerate(subqueries):
         progress_for_subq = 60 + int(20 * (subq_idx / len(subqueries)))
         progress_callback(progress_for_subq, f"{ALL_STEPS[current_step_idx]} : {subq}", current_step_idx)
 
         print(f"\n--- Traitement de la sous-question : {subq} ---")
-        relevant_docs_for_subq = []
+        relevant_docs_for_subq = list(prior_docs_by_subq.get(subq, []))
+        if len(relevant_docs_for_subq) >= n_results:
+            print(f"♻️ Documents de la recherche précédente réutilisés pour '{subq}'.")
+            validated_summaries.extend(relevant_docs_for_subq)
+            continue
 
         # --- Phase 1: Process Initial Documents ---
         docs_to_analyze_initial = []
@@ -192,42 +424,12 @@ def _process_documents(query: str, subqueries: list[str], documents_by_subq: dic
                 docs_to_analyze_initial.append(doc)
             else:
                 if doc.get("paragraphs", "").strip():
-                    relevant_docs_for_subq.append({
-                        "url": doc.get("url"),
-                        "subquestion": doc.get("subquestion"),
-                        "title": doc.get("title"),
-                        "summary": doc.get("paragraphs")
-                    })
+                    relevant_docs_for_subq.append(_relevant_entry(doc, doc.get("paragraphs")))
                     print(f"✅ Document court mais pertinent trouvé : {doc.get('url')}")
                 else:
                     print(f"⚠️ Document de {doc.get('url')} est vide. Ignoré.")
 
-        with ThreadPoolExecutor(max_workers=MAX_DOC_ANALYSIS_WORKERS) as executor:
-            future_to_doc = {
-                executor.submit(validate_and_summarize_document, query, subq, doc.get('paragraphs')): doc
-                for doc in docs_to_analyze_initial
-            }
-            for future in as_completed(future_to_doc):
-                if len(relevant_docs_for_subq) >= n_results:
-                    for f in future_to_doc:
-                        f.cancel()
-                    break
-
-                doc = future_to_doc[future]
-                try:
-                    response_data = future.result()
-                    if response_data.get("is_relevant", False):
-                        relevant_docs_for_subq.append({
-                            "url": doc.get("url"),
-                            "subquestion": doc.get("subquestion"),
-                            "title": doc.get("title"),
-                            "summary": response_data.get("summary")
-                        })
-                        print(f"✅ Document pertinent trouvé : {doc.get('url')}")
-                    else:
-                        print(f"⚠️ Document de {doc.get('url')} jugé non pertinent.")
-                except Exception as exc:
-                    print(f"❌ Erreur lors de l'analyse du document {doc.get('url')}: {exc}")
+        _validate_documents(query, subq, docs_to_analyze_initial, relevant_docs_for_subq, n_results)
 
         current_step_idx_retry = 6
         if len(relevant_docs_for_subq) < n_results:
@@ -236,79 +438,46 @@ def _process_documents(query: str, subqueries: list[str], documents_by_subq: dic
                               f"{ALL_STEPS[current_step_idx_retry]} : {subq} (recherche de remplacement)",
                               current_step_idx_retry)
 
-            new_results_to_check = fetch_search_results_with_googlesearch(subq, (max_retry_document or 10) + max_new_url_attempts * 2)
-            new_urls_attempted_count = 0
-            i = 0
-
-            docs_to_analyze_replacement = []
-            replacement_doc_futures_map = {}
-
-            for new_title, new_url in new_results_to_check:
-                if (len(relevant_docs_for_subq) >= n_results or
-                    new_urls_attempted_count >= max_new_url_attempts or
-                    i >= (max_retry_document or float('inf'))):
-                    break
-
-                if new_url not in visited_urls:
-                    print(f"✅ Nouvelle URL de remplacement potentielle : {new_url}")
-                    visited_urls.add(new_url)
-                    new_urls_attempted_count += 1
-
-                    new_doc = scrape_worker_threaded({"url": new_url, "subquestion": subq})
-
-                    if new_doc:
-                        if len(new_doc.get("paragraphs", "")) > 100:
-                            docs_to_analyze_replacement.append(new_doc)
-                        elif new_doc.get("paragraphs", "").strip():
-                            relevant_docs_for_subq.append({
-                                "url": new_doc.get("url"),
-                                "subquestion": new_doc.get("subquestion"),
-                                "title": new_doc.get("title"),
-                                "summary": new_doc.get("paragraphs")
-                            })
-                            print(f"✅ Document de remplacement court mais pertinent trouvé : {new_doc.get('url')}")
-                        else:
-                            print(f"⚠️ Document de {new_doc.get('url')} est vide ou trop court. Ignoré.")
-                    i += 1
-                else:
-                    print(f"ℹ️ URL {new_url} déjà visitée ou en cours de traitement. Passons à la suivante.")
-
-            with ThreadPoolExecutor(max_workers=MAX_DOC_ANALYSIS_WORKERS) as executor:
-                future_to_doc = {
-                    executor.submit(validate_and_summarize_document, query, subq, doc.get('paragraphs')): doc
-                    for doc in docs_to_analyze_replacement
-                }
-                for future in as_completed(future_to_doc):
-                    if len(relevant_docs_for_subq) >= n_results:
-                        for f in future_to_doc:
-                            f.cancel()
-                        break
-
-                    doc = future_to_doc[future]
-                    try:
-                        response_data = future.result()
-                        if response_data.get("is_relevant", False):
-                            relevant_docs_for_subq.append({
-                                "url": doc.get("url"),
-                                "subquestion": doc.get("subquestion"),
-                                "title": doc.get("title"),
-                                "summary": response_data.get("summary")
-                            })
-                            print(f"✅ Document de remplacement pertinent trouvé et ajouté.")
-                        else:
-                            print(f"⚠️ Document de {doc.get('url')} jugé non pertinent.")
-                    except Exception as exc:
-                        print(f"❌ Erreur lors de l'analyse du document de remplacement {doc.get('url')}: {exc}")
+            new_results_to_check = fetch_search_results_with_googlesearch(subq, _replacement_search_size(max_new_url_attempts))
+            attempts = _find_replacement_documents(query, subq, new_results_to_check, relevant_docs_for_subq, n_results,
+                                                   visited_urls, max_new_url_attempts)
 
             if len(relevant_docs_for_subq) < n_results:
-                print(f"❌ Impossible d'atteindre le nombre requis de documents pour '{subq}' après avoir essayé {i} nouvelles URLs et parcouru {i} résultats de recherche.")
+                print(f"❌ Impossible d'atteindre le nombre requis de documents pour '{subq}' après avoir essayé {attempts} nouvelles URLs.")
 
         validated_summaries.extend(relevant_docs_for_subq)
 
     return validated_summaries
 
 
-def _synthesize_final_answer(query: str, validated_summaries: list[dict], progress_callback) -> str:
+@traced("synthesis.generate")
+def _generate_synthesis(synth_msgs: list[dict], token_callback, attempt: int, metrics: dict) -> str:
+    """
+    Generates one synthesis draft, streaming it to `token_callback` when one is given.
+    Records the time to first token and the generation time of the attempt in `metrics`.
+    """
+    started = time.perf_counter()
+    if token_callback is None:
+        content = request_mistral_model(synth_msgs, use_cache=False)
+        metrics["synthesis_ttft"] = None
+    else:
+        fragments = []
+        metrics["synthesis_ttft"] = None
+        for delta in stream_mistral_model(synth_msgs):
+            if metrics["synthesis_ttft"] is None:
+                metrics["synthesis_ttft"] = round(time.perf_counter() - started, 3)
+            fragments.append(delta)
+            token_callback(delta, attempt)
+        content = "".join(fragments).strip()
+    metrics["synthesis_seconds"] = round(time.perf_counter() - started, 3)
+    metrics["synthesis_attempts"] = attempt
+    current_span().set(attempt=attempt, streamed=token_callback is not None, ttft=metrics["synthesis_ttft"])
+    return content
+
+
+@traced("workflow.synthesis")
+def _synthesize_final_answer(query: str, validated_summaries: list[dict], progress_callback,
+                             token_callback=None, metrics: dict | None = None) -> str:
     """
     Synthesizes the final answer from the validated document summaries.
 
@@ -316,10 +485,15 @@ def _synthesize_final_answer(query: str, validated_summaries: list[dict], progre
         query: The initial research query.
         validated_summaries: A list of relevant and summarized documents.
         progress_callback: A function to update the UI's progress.
+        token_callback: Optional function called with (text_fragment, attempt) as the synthesis
+                        is streamed. A new attempt number means the previous draft was rejected.
+        metrics: Optional dictionary filled with the synthesis timings.
 
     Returns:
         The final synthesized answer.
     """
+    if metrics is None:
+        metrics = {}
     current_step_idx = 7
     progress_callback(85, ALL_STEPS[current_step_idx], current_step_idx)
     final_synthesis = None
@@ -331,16 +505,23 @@ def _synthesize_final_answer(query: str, validated_summaries: list[dict], progre
         return "Je n'ai pas pu trouver d'informations pertinentes sur le web pour répondre à votre question. Veuillez essayer une autre formulation ou un sujet différent."
 
     # Boucle de synthèse normale si des documents sont présents
+    synth_content = None  # Synthèse réparée à revalider, sinon None pour en générer une nouvelle
+    metrics["synthesis_repairs"] = 0
+    # Le dossier de sources et le prompt ne changent pas d'une tentative à l'autre
+    evidence_pack, source_urls = build_evidence_pack(validated_summaries)
+    synth_msgs = [
+        {"role": "system",
+         "content": "Tu es un assistant de synthèse expert. Tu vas synthétiser les informations contenues dans les résumés pertinents fournis pour répondre à la question initiale. Cite les sources avec leur numéro entre crochets, par exemple [1] ou [2, 3]. Et ne met pas de partie de reference."},
+        {"role": "user",
+         "content": f"Sources :\n{evidence_pack}\n\nQuestion initiale : {query}"}
+    ]
     while final_synthesis is None and attempt < max_synth_retries:
         attempt += 1
-        print(f"Tentative de synthèse n°{attempt}/{max_synth_retries}...")
-        synth_msgs = [
-            {"role": "system",
-             "content": "Tu es un assistant de synthèse expert. Tu vas synthétiser les informations contenues dans les résumés pertinents fournis pour répondre à la question initiale. Utilise les URLs comme références. Et ne met pas de partie de reference."},
-            {"role": "user",
-             "content": json.dumps({"query": query, "data": validated_summaries}, ensure_ascii=False)}
-        ]
-        synth_content = request_mistral_model(synth_msgs)
+        if synth_content is None:
+            print(f"Tentative de synthèse n°{attempt}/{max_synth_retries}...")
+            synth_content = _generate_synthesis(synth_msgs, token_callback, attempt, metrics)
+            if metrics.get("synthesis_ttft") is not None:
+                print(f"\n⏱️ Premier token de la synthèse reçu en {metrics['synthesis_ttft']:.2f}s.")
 
         current_step_idx_validation = 8
         progress_callback(90, ALL_STEPS[current_step_idx_validation], current_step_idx_validation)
@@ -353,7 +534,16 @@ def _synthesize_final_answer(query: str, validated_summaries: list[dict], progre
         else:
             print(f"⚠️ La synthèse est jugée incohérente. Raison : {validation_result.get('reason')}")
             if attempt < max_synth_retries:
-                print("♻️ Nouvelle tentative de synthèse...")
+                repaired = None
+                if synthesis_repair and validation_result.get("issues"):
+                    print(f"🩹 Réparation ciblée de {len(validation_result['issues'])} passage(s) de la synthèse...")
+                    repaired = repair_synthesis(query, synth_content, validation_result["issues"], validated_summaries)
+                if repaired:
+                    metrics["synthesis_repairs"] += 1
+                    synth_content = repaired
+                else:
+                    print("♻️ Nouvelle tentative de synthèse...")
+                    synth_content = None
             else:
                 print("❌ Nombre maximal de tentatives de synthèse atteint. Renvoie de la derniere synthese.")
                 final_synthesis = synth_content  # Return the last attempt even if incoherent
@@ -363,14 +553,18 @@ def _synthesize_final_answer(query: str, validated_summaries: list[dict], progre
     if not final_synthesis:
         return "La synthèse n'a pas pu être générée de manière satisfaisante avec les documents trouvés."
 
-    return final_synthesis
+    return link_citations(final_synthesis, source_urls)
 
 
+@traced("workflow.research")
 def perform_full_research(
         query: str,
         subqueries: list[str],
         n_results: int,
-        progress_callback
+        progress_callback,
+        mode: str = research_mode,
+        token_callback=None,
+        prior_result: dict | None = None
 ) -> dict:
     """
     Performs the full research workflow: fetching, scraping, validation, and synthesis.
@@ -381,17 +575,57 @@ def perform_full_research(
         subqueries: A list of pre-generated sub-questions.
         n_results: The desired number of relevant results per subquery.
         progress_callback: A function to update the UI's progress.
+        mode: "sync" runs the staged workflow, "async" streams search, scraping and
+              validation through the asyncio pipeline of `async_workflow`.
+        token_callback: Optional function called with (text_fragment, attempt) while the
+                        final synthesis is streamed, from the calling thread.
+        prior_result: Optional result of a previous research (e.g. the one being refined) used as
+                      a warm start: sub-questions it already answered reuse its validated documents,
+                      its URLs are not scraped again, and only new or edited sub-questions are
+                      searched, scraped and validated.
 
     Returns:
-        A dictionary containing the final synthesis, subquestions, and sources.
+        A dictionary containing the final synthesis, subquestions, sources, validated documents and metrics.
     """
-    visited_urls = set()
+    if mode == "async":
+        from .async_workflow import perform_full_research_async
+        return asyncio.run(perform_full_research_async(query, subqueries, n_results, progress_callback,
+                                                       token_callback=token_callback, prior_result=prior_result))
+    if mode != "sync":
+        raise ValueError(f"Mode de recherche inconnu : {mode}")
+
+    prior_docs_by_subq, visited_urls = _warm_start(subqueries, n_results, prior_result)
+
+    # Sub-questions with some prior documents only need the replacement search to be completed
+    new_subqueries = [sq for sq in subqueries if not prior_docs_by_subq[sq]]
+    documents_by_subq = {}
+    if new_subqueries:
+        documents_by_subq = _fetch_and_scrape_urls(new_subqueries, n_results, visited_urls, progress_callback)
+
+    validated_summaries = _process_documents(query, subqueries, documents_by_subq, n_results, visited_urls,
+                                             progress_callback, prior_docs_by_subq=prior_docs_by_subq)
 
-    documents_by_subq = _fetch_and_scrape_urls(subqueries, n_results, visited_urls, progress_callback)
+    return _finalize_research(query, subqueries, validated_summaries, progress_callback, token_callback)
 
-    validated_summaries = _process_documents(query, subqueries, documents_by_subq, n_results, visited_urls, progress_callback)
 
-    final_synthesis = _synthesize_final_answer(query, validated_summaries, progress_callback)
+def _finalize_research(query: str, subqueries: list[str], validated_summaries: list[dict], progress_callback,
+                       token_callback=None) -> dict:
+    """
+    Synthesizes the final answer and builds the result dictionary shared by every research mode.
+
+    Args:
+        query: The main research query.
+        subqueries: The sub-questions that were researched.
+        validated_summaries: A list of relevant and summarized documents.
+        progress_callback: A function to update the UI's progress.
+        token_callback: Optional function receiving the streamed synthesis fragments.
+
+    Returns:
+        A dictionary containing the final synthesis, subquestions, sources, validated documents and metrics.
+    """
+    metrics = {}
+    final_synthesis = _synthesize_final_answer(query, validated_summaries, progress_callback,
+                                               token_callback=token_callback, metrics=metrics)
 
     current_step_idx = 9
     progress_callback(100, ALL_STEPS[current_step_idx], current_step_idx)
@@ -408,4 +642,6 @@ def perform_full_research(
         "synthèse": final_synthesis,
         "sous_questions": subqueries,
         "sources": sources_by_subquery,
+        "documents": validated_summaries,
+        "métriques": metrics,
     }
\ No newline at end of file
@@ -1,24 +1,308 @@
+import asyncio
 import os
+import random
+import threading
+import time
+import weakref
+
+import httpx
 from mistralai import Mistral
-from .config import model
+from .config import (model, embedding_model, mistral_rpm, mistral_tpm, mistral_max_connections, mistral_timeout,
+                     mistral_max_retries, mistral_backoff_base, mistral_backoff_max, mistral_expected_output_tokens)
+from .llm_cache import get_llm_cache, cache_key
+from .tracing import span, current_span
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def estimate_message_tokens(messages: list[dict]) -> int:
+    """Roughly estimates the prompt size in tokens (about 4 characters per token)."""
+    return sum(len(m.get("content") or "") for m in messages) // 4 + 4 * len(messages)
+
+
+class TokenBucketRateLimiter:
+    """
+    Rate limiter with two token buckets: requests per minute and tokens per minute.
+
+    Both buckets refill continuously; `acquire` blocks until one request and the given
+    number of tokens are available.
+    """
+
+    def __init__(self, rpm: float, tpm: float):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: int) -> float:
+        """Takes the budget if available and returns 0, otherwise returns the time to wait."""
+        tokens = min(tokens, self.tpm)
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._updated
+            self._updated = now
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+            if self._requests >= 1 and self._tokens >= tokens:
+                self._requests -= 1
+                self._tokens -= tokens
+                return 0.0
+            wait_requests = max(0.0, (1 - self._requests) * 60 / self.rpm)
+            wait_tokens = max(0.0, (tokens - self._tokens) * 60 / self.tpm)
+            return max(wait_requests, wait_tokens)
+
+    def acquire(self, tokens: int):
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int):
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+
+def _retry_delay(error: Exception, attempt: int) -> float | None:
+    """
+    Returns how long to wait before retrying after `error`, or None if it is not retryable.
+    Uses the Retry-After header when present, otherwise exponential backoff with full jitter.
+    """
+    status_code = getattr(error, "status_code", None)
+    if status_code not in RETRYABLE_STATUS_CODES and not isinstance(error, (httpx.TransportError, httpx.TimeoutException)):
+        return None
+    raw_response = getattr(error, "raw_response", None)
+    retry_after = raw_response.headers.get("retry-after") if raw_response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), mistral_backoff_max)
+        except ValueError:
+            pass
+    return random.uniform(0, min(mistral_backoff_max, mistral_backoff_base * 2 ** attempt))
+
 
-def request_mistral_model(messages: list[dict]) -> str:
+class MistralClientManager:
+    """
+    Process-wide Mistral client with pooled keep-alive connections, a shared rate limiter
+    and retries of 429/5xx responses with jittered backoff.
+    """
+
+    def __init__(self):
+        self.limiter = TokenBucketRateLimiter(mistral_rpm, mistral_tpm)
+        self._client = None
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _limits() -> httpx.Limits:
+        return httpx.Limits(max_connections=mistral_max_connections,
+                            max_keepalive_connections=mistral_max_connections)
+
+    def client(self) -> Mistral:
+        """Returns the shared synchronous client, created on first use."""
+        with self._lock:
+            if self._client is None:
+                self._client = Mistral(
+                    api_key=os.environ["MISTRAL_API_KEY"],
+                    client=httpx.Client(limits=self._limits(), timeout=mistral_timeout),
+                )
+            return self._client
+
+    def async_client(self) -> Mistral:
+        """Returns the asynchronous client of the running event loop (httpx async pools are loop-bound)."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = Mistral(
+                    api_key=os.environ["MISTRAL_API_KEY"],
+                    async_client=httpx.AsyncClient(limits=self._limits(), timeout=mistral_timeout),
+                )
+                self._async_clients[loop] = client
+            return client
+
+    def complete(self, model_name: str, messages: list[dict]):
+        """Calls chat.complete within the rate limits, retrying transient failures."""
+        tokens = estimate_message_tokens(messages) + mistral_expected_output_tokens
+        for attempt in range(mistral_max_retries + 1):
+            self.limiter.acquire(tokens)
+            try:
+                return self.client().chat.complete(model=model_name, messages=messages)
+            except Exception as e:
+                delay = _retry_delay(e, attempt)
+                if delay is None or attempt == mistral_max_retries:
+                    raise
+                current_span().incr("retries")
+                print(f"⚠️ Appel Mistral en échec ({e}). Nouvelle tentative {attempt + 1}/{mistral_max_retries} dans {delay:.1f}s...")
+                time.sleep(delay)
+
+    def stream(self, model_name: str, messages: list[dict]):
+        """
+        Calls chat.stream within the rate limits and yields the text deltas.
+        Transient failures are retried only until the first delta has been received.
+        """
+        tokens = estimate_message_tokens(messages) + mistral_expected_output_tokens
+        for attempt in range(mistral_max_retries + 1):
+            self.limiter.acquire(tokens)
+            started = False
+            try:
+                for event in self.client().chat.stream(model=model_name, messages=messages):
+                    if getattr(event.data, "usage", None):
+                        _record_usage(current_span(), messages, event.data)
+                    delta = event.data.choices[0].delta.content if event.data.choices else None
+                    if delta:
+                        started = True
+                        yield delta
+                return
+            except Exception as e:
+                delay = None if started else _retry_delay(e, attempt)
+                if delay is None or attempt == mistral_max_retries:
+                    raise
+                current_span().incr("retries")
+                print(f"⚠️ Appel Mistral en échec ({e}). Nouvelle tentative {attempt + 1}/{mistral_max_retries} dans {delay:.1f}s...")
+                time.sleep(delay)
+
+    def embed(self, model_name: str, texts: list[str]):
+        """Calls embeddings.create within the rate limits, retrying transient failures."""
+        tokens = sum(len(text) for text in texts) // 4
+        for attempt in range(mistral_max_retries + 1):
+            self.limiter.acquire(tokens)
+            try:
+                return self.client().embeddings.create(model=model_name, inputs=texts)
+            except Exception as e:
+                delay = _retry_delay(e, attempt)
+                if delay is None or attempt == mistral_max_retries:
+                    raise
+                current_span().incr("retries")
+                print(f"⚠️ Appel Mistral en échec ({e}). Nouvelle tentative {attempt + 1}/{mistral_max_retries} dans {delay:.1f}s...")
+                time.sleep(delay)
+
+    async def complete_async(self, model_name: str, messages: list[dict]):
+        """Async variant of `complete`."""
+        tokens = estimate_message_tokens(messages) + mistral_expected_output_tokens
+        for attempt in range(mistral_max_retries + 1):
+            await self.limiter.acquire_async(tokens)
+            try:
+                return await self.async_client().chat.complete_async(model=model_name, messages=messages)
+            except Exception as e:
+                delay = _retry_delay(e, attempt)
+                if delay is None or attempt == mistral_max_retries:
+                    raise
+                current_span().incr("retries")
+                print(f"⚠️ Appel Mistral en échec ({e}). Nouvelle tentative {attempt + 1}/{mistral_max_retries} dans {delay:.1f}s...")
+                await asyncio.sleep(delay)
+
+
+client_manager = MistralClientManager()
+
+
+def _record_usage(llm_span, messages: list[dict], resp):
+    usage = getattr(resp, "usage", None)
+    llm_span.set(tokens_in=getattr(usage, "prompt_tokens", None) or estimate_message_tokens(messages),
+                 tokens_out=getattr(usage, "completion_tokens", None) or 0)
+
+
+def _cached_response(llm_cache, key: str, cache_if) -> str | None:
+    """Returns the cached response for `key`, dropping it if `cache_if` rejects it."""
+    cached = llm_cache.get(key)
+    if cached is not None and cache_if is not None and not cache_if(cached):
+        llm_cache.delete(key)
+        return None
+    return cached
+
+
+def _store_response(llm_cache, key: str, model_name: str, raw_content: str, cache_if):
+    if cache_if is None or cache_if(raw_content):
+        llm_cache.put(key, model_name, raw_content)
+
+
+def request_mistral_model(messages: list[dict], use_cache: bool = True, cache_if=None) -> str:
     """
     Makes a request to the Mistral AI model.
 
+    Identical requests (same model and messages) are answered from the local LLM cache.
+
     Args:
         messages: A list of message dictionaries in the format
                   {"role": "system"/"user", "content": "message"}.
+        use_cache: Set to False to bypass the cache, e.g. when a fresh answer is wanted
+                   for a retried prompt.
+        cache_if: Optional callable receiving the response and returning True if the caller
+                  can parse it. Other responses are neither cached nor reused from the cache,
+                  so a malformed answer is asked again next time instead of being replayed.
 
     Returns:
         The content of the model's response.
     """
-    client = Mistral(api_key=os.environ["MISTRAL_API_KEY"])
-    resp = client.chat.complete(
-        model=os.environ.get("MODEL", model),
-        messages=messages,
-    )
+    model_name = os.environ.get("MODEL", model)
+    llm_cache = get_llm_cache() if use_cache else None
+    key = cache_key(model_name, messages) if llm_cache else None
+    with span("llm.request", model=model_name) as llm_span:
+        if llm_cache:
+            cached = _cached_response(llm_cache, key, cache_if)
+            if cached is not None:
+                llm_span.set(cache_hits=1)
+                return cached
+
+        resp = client_manager.complete(model_name, messages)
+        _record_usage(llm_span, messages, resp)
     raw_content = resp.choices[0].message.content.strip()
+    if llm_cache:
+        _store_response(llm_cache, key, model_name, raw_content, cache_if)
     return raw_content
 
-    
\ No newline at end of file
+
+def stream_mistral_model(messages: list[dict]):
+    """
+    Streams the response of the Mistral AI model. Streaming calls are never cached.
+
+    Args:
+        messages: A list of message dictionaries in the format
+                  {"role": "system"/"user", "content": "message"}.
+
+    Yields:
+        The successive text fragments of the model's response.
+    """
+    yield from client_manager.stream(os.environ.get("MODEL", model), messages)
+
+
+def embed_texts(texts: list[str]) -> list[list[float]]:
+    """
+    Computes the embeddings of `texts` with the Mistral embedding model.
+
+    Args:
+        texts: The texts to embed.
+
+    Returns:
+        One vector per text, in the same order.
+    """
+    with span("llm.embed", model=embedding_model, texts=len(texts)):
+        resp = client_manager.embed(embedding_model, texts)
+    return [item.embedding for item in resp.data]
+
+
+async def request_mistral_model_async(messages: list[dict], use_cache: bool = True, cache_if=None) -> str:
+    """
+    Async variant of `request_mistral_model`, sharing its cache, rate limits and retries.
+    """
+    model_name = os.environ.get("MODEL", model)
+    llm_cache = get_llm_cache() if use_cache else None
+    key = cache_key(model_name, messages) if llm_cache else None
+    with span("llm.request", model=model_name) as llm_span:
+        if llm_cache:
+            cached = _cached_response(llm_cache, key, cache_if)
+            if cached is not None:
+                llm_span.set(cache_hits=1)
+                return cached
+
+        resp = await client_manager.complete_async(model_name, messages)
+        _record_usage(llm_span, messages, resp)
+    raw_content = resp.choices[0].message.content.strip()
+    if llm_cache:
+        _store_response(llm_cache, key, model_name, raw_content, cache_if)
+    return raw_content
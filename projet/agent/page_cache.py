@@ -0,0 +1,212 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from .config import (page_cache_enabled, page_cache_dir, page_cache_ttl, page_cache_stale_ttl,
+                     page_cache_max_bytes)
+
+# Query parameters that never change the content of a page.
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid", "ref_src")
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalizes a URL so that equivalent addresses share a cache entry.
+
+    Lowercases the scheme and host, drops default ports, fragments, tracking parameters
+    and trailing slashes, and sorts the query parameters.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and not ((scheme == "http" and parts.port == 80) or (scheme == "https" and parts.port == 443)):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PARAMS)
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+class PageCache:
+    """
+    Persistent cache of scraped pages, keyed by the SHA-256 of the normalized URL.
+
+    Each entry is a zlib-compressed JSON file holding the `{title, paragraphs}` output of
+    `scrape_url`. Entries younger than `ttl` are fresh; entries younger than `stale_ttl`
+    are served stale while a background refresh runs. The directory is kept under
+    `max_bytes` by evicting the least recently used files (file mtime is the access time).
+    """
+
+    def __init__(self, directory: str = page_cache_dir, ttl: float = page_cache_ttl,
+                 stale_ttl: float = page_cache_stale_ttl, max_bytes: int = page_cache_max_bytes):
+        self.directory = directory
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._total_bytes = None
+        self._refreshing = set()
+        self._refresh_executor = ThreadPoolExecutor(max_workers=2)
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    def _path(self, url: str) -> str:
+        key = hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key[:2], f"{key}.json.z")
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, url: str) -> tuple[dict | None, bool]:
+        """
+        Looks up a page.
+
+        Args:
+            url: The page URL.
+
+        Returns:
+            A (data, is_stale) tuple. `data` is None on a miss; `is_stale` is True when the
+            entry is past its TTL but still within the stale-while-revalidate window.
+        """
+        path = self._path(url)
+        try:
+            with open(path, "rb") as f:
+                entry = json.loads(zlib.decompress(f.read()).decode("utf-8"))
+        except (OSError, ValueError, zlib.error):
+            self._count("misses")
+            return None, False
+
+        age = time.time() - entry.get("stored_at", 0)
+        if age > self.stale_ttl:
+            self._remove(path)
+            self._count("misses")
+            return None, False
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        is_stale = age > self.ttl
+        self._count("stale_hits" if is_stale else "hits")
+        return entry["data"], is_stale
+
+    def put(self, url: str, data: dict):
+        """
+        Stores the scraped `{title, paragraphs}` of a page. Errors and empty pages are not cached.
+        """
+        title = data.get("title") or ""
+        paragraphs = data.get("paragraphs") or ""
+        if not paragraphs.strip() or title.startswith("ERROR:"):
+            return
+
+        payload = zlib.compress(json.dumps(
+            {"url": url, "stored_at": time.time(), "data": {"title": title, "paragraphs": paragraphs}},
+            ensure_ascii=False
+        ).encode("utf-8"))
+        path = self._path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        previous_size = os.path.getsize(path) if os.path.exists(path) else 0
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._stats["writes"] += 1
+            if self._total_bytes is not None:
+                self._total_bytes += len(payload) - previous_size
+        self._enforce_size_cap()
+
+    def revalidate(self, url: str, fetch):
+        """
+        Refreshes a stale entry in the background.
+
+        Args:
+            url: The page URL.
+            fetch: Callable(url) returning the fresh `{title, paragraphs}` dict.
+        """
+        key = normalize_url(url)
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self.put(url, fetch(url))
+            except Exception as e:
+                print(f"⚠️ Rafraîchissement du cache impossible pour {url} : {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._refresh_executor.submit(refresh)
+
+    def _files(self) -> list[tuple[float, int, str]]:
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".json.z"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _remove(self, path: str):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes -= size
+
+    def _enforce_size_cap(self):
+        with self._lock:
+            total = self._total_bytes
+        if total is None:
+            total = sum(size for _, size, _ in self._files())
+            with self._lock:
+                self._total_bytes = total
+        if total <= self.max_bytes:
+            return
+
+        for _, size, path in sorted(self._files()):
+            self._remove(path)
+            self._count("evictions")
+            with self._lock:
+                if self._total_bytes <= self.max_bytes * 0.9:
+                    break
+
+    def stats(self) -> dict:
+        """Returns the hit/miss/write/eviction counters."""
+        with self._lock:
+            return dict(self._stats)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_page_cache() -> PageCache | None:
+    """Returns the process-wide page cache, or None if it is disabled in the configuration."""
+    global _cache
+    if not page_cache_enabled:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = PageCache()
+        return _cache
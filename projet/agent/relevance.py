@@ -0,0 +1,108 @@
+import math
+from collections import Counter
+
+from .text_utils import tokenize
+from .config import relevance_subquery_weight, relevance_prefilter, relevance_threshold
+
+
+class BM25Index:
+    """
+    In-memory Okapi BM25 index over a small corpus, CPU-only and without any model.
+
+    Args:
+        documents: The texts to index.
+        k1: Term frequency saturation.
+        b: Length normalization.
+    """
+
+    def __init__(self, documents: list[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_terms = [Counter(tokenize(doc)) for doc in documents]
+        self.doc_lengths = [sum(terms.values()) for terms in self.doc_terms]
+        self.avg_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if self.doc_lengths else 0.0
+        self.doc_freq = Counter(term for terms in self.doc_terms for term in terms)
+
+    def idf(self, term: str) -> float:
+        n = len(self.doc_terms)
+        df = self.doc_freq.get(term, 0)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def score(self, query: str, index: int) -> float:
+        """Returns the BM25 score of document `index` for `query`."""
+        terms = self.doc_terms[index]
+        length_norm = 1 - self.b + self.b * (self.doc_lengths[index] / self.avg_length if self.avg_length else 0)
+        total = 0.0
+        for term in set(tokenize(query)):
+            tf = terms.get(term, 0)
+            if tf:
+                total += self.idf(term) * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+        return total
+
+    def coverage(self, query: str, index: int) -> float:
+        """
+        Returns the share of the distinct query terms found in document `index`, between 0 and 1.
+        Unlike BM25 it does not depend on the corpus size, so it can be compared to a fixed threshold.
+        """
+        query_terms = set(tokenize(query))
+        if not query_terms:
+            return 1.0
+        return sum(1 for term in query_terms if term in self.doc_terms[index]) / len(query_terms)
+
+
+def rank_documents(docs: list[dict], subquery: str, query: str) -> list[tuple[dict, float]]:
+    """
+    Scores scraped documents against their sub-question and the main query.
+
+    The returned relevance is the term coverage of the sub-question and of the query
+    (weighted by `relevance_subquery_weight`), between 0 and 1. Documents are ordered
+    by BM25 score, best first.
+
+    Args:
+        docs: Scraped documents with a 'paragraphs' field.
+        subquery: The sub-question the documents belong to.
+        query: The main research query.
+
+    Returns:
+        A list of (document, relevance) tuples sorted by decreasing BM25 score.
+    """
+    if not docs:
+        return []
+    index = BM25Index([f"{doc.get('title') or ''}\n{doc.get('paragraphs') or ''}" for doc in docs])
+    scored = []
+    for i, doc in enumerate(docs):
+        relevance = (relevance_subquery_weight * index.coverage(subquery, i)
+                     + (1 - relevance_subquery_weight) * index.coverage(query, i))
+        bm25 = index.score(subquery, i) + index.score(query, i)
+        scored.append((doc, relevance, bm25))
+    scored.sort(key=lambda item: item[2], reverse=True)
+    return [(doc, relevance) for doc, relevance, _ in scored]
+
+
+def prefilter_documents(docs: list[dict], subquery: str, query: str, drop: bool = relevance_prefilter,
+                        threshold: float = relevance_threshold) -> list[dict]:
+    """
+    Orders scraped documents best first before any model call, and optionally drops the weakest.
+
+    Term coverage only matches the same words (case and accents are ignored), so a page written
+    in another language than the question scores close to 0 even when it is relevant. Dropping
+    is therefore opt-in (`relevance_prefilter`); by default every document is kept and only the
+    validation order changes.
+
+    Args:
+        docs: Scraped documents with a 'paragraphs' field.
+        subquery: The sub-question the documents belong to.
+        query: The main research query.
+        drop: Whether to drop the documents whose relevance is below `threshold`.
+        threshold: The minimum relevance (see `rank_documents`) of a kept document.
+
+    Returns:
+        The kept documents, sorted by decreasing BM25 score.
+    """
+    kept = []
+    for doc, relevance in rank_documents(docs, subquery, query):
+        if drop and relevance < threshold:
+            print(f"⏭️ Document de {doc.get('url')} écarté par le pré-filtre local (score {relevance:.2f}).")
+        else:
+            kept.append(doc)
+    return kept
@@ -0,0 +1,131 @@
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from .config import (host_scheduler_enabled, host_max_concurrency, host_min_interval, host_backoff_base,
+                     host_backoff_max)
+from .tracing import current_span
+
+
+def host_of(url: str) -> str:
+    host = (urlparse(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def interleave_by_host(tasks: list[dict]) -> list[dict]:
+    """
+    Reorders scrape tasks round-robin across their hosts, keeping the order within each host,
+    so that consecutive tasks (and therefore concurrent workers) hit different sites.
+    """
+    by_host = {}
+    for task in tasks:
+        by_host.setdefault(host_of(task["url"]), []).append(task)
+    queues = list(by_host.values())
+    ordered = []
+    for i in range(max((len(queue) for queue in queues), default=0)):
+        ordered.extend(queue[i] for queue in queues if i < len(queue))
+    return ordered
+
+
+class _HostState:
+    def __init__(self):
+        self.active = 0
+        self.next_start = 0.0
+        self.backoff = 0.0
+        self.failures = 0
+
+
+class _Outcome:
+    ok = True
+    retry_after = None  # Delay requested by the site (Retry-After), in seconds
+
+
+class HostScheduler:
+    """
+    Politeness rules applied to every page fetched from the network, per host.
+
+    At most `max_concurrency` pages of a host are fetched at the same time, and two fetches
+    of a host start at least `min_interval` seconds apart. Each failure doubles an extra
+    delay learned for the host (from `backoff_base`, up to `backoff_max`) and each success
+    halves it, so throttling sites are spaced out while the others run at full speed.
+    The state is shared by every research of the process.
+    """
+
+    def __init__(self, max_concurrency: int = host_max_concurrency, min_interval: float = host_min_interval,
+                 backoff_base: float = host_backoff_base, backoff_max: float = host_backoff_max):
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_interval = min_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._hosts = {}
+        self._cond = threading.Condition()
+
+    def _acquire(self, host: str) -> float:
+        """Waits until `host` may be fetched and takes one of its slots. Returns the time waited."""
+        start = time.monotonic()
+        with self._cond:
+            state = self._hosts.setdefault(host, _HostState())
+            while True:
+                now = time.monotonic()
+                if state.active < self.max_concurrency and now >= state.next_start:
+                    break
+                timeout = state.next_start - now if state.active < self.max_concurrency else None
+                self._cond.wait(timeout)
+            state.active += 1
+            state.next_start = now + self.min_interval + state.backoff
+        return time.monotonic() - start
+
+    def _release(self, host: str, ok: bool, retry_after: float | None = None):
+        with self._cond:
+            state = self._hosts[host]
+            state.active -= 1
+            if ok:
+                state.backoff = state.backoff / 2 if state.backoff > self.backoff_base / 4 else 0.0
+            else:
+                state.failures += 1
+                state.backoff = min(self.backoff_max, max(self.backoff_base, state.backoff * 2, retry_after or 0.0))
+                state.next_start = max(state.next_start, time.monotonic() + self.min_interval + state.backoff)
+                print(f"🐢 Échec sur {host} : délai entre deux pages porté à {self.min_interval + state.backoff:.1f}s.")
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, url: str):
+        """
+        Holds a fetch slot of the host of `url` during the enclosed block. The block reports a
+        failure by raising, or by setting `ok = False` on the yielded object, and can pass the
+        delay requested by the site in its `retry_after`.
+        """
+        host = host_of(url)
+        waited = self._acquire(host)
+        if waited > 0.01:
+            current_span().set(host_wait=round(waited, 3))
+        outcome = _Outcome()
+        try:
+            yield outcome
+        except BaseException:
+            outcome.ok = False
+            raise
+        finally:
+            self._release(host, outcome.ok, outcome.retry_after)
+
+    def stats(self) -> dict:
+        """Returns the learned delay and failure count of every host that failed at least once."""
+        with self._cond:
+            return {host: {"backoff": state.backoff, "failures": state.failures}
+                    for host, state in self._hosts.items() if state.failures}
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_host_scheduler() -> HostScheduler | None:
+    """Returns the process-wide host scheduler, or None if it is disabled."""
+    if not host_scheduler_enabled:
+        return None
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = HostScheduler()
+        return _scheduler
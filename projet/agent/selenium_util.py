@@ -1,22 +1,56 @@
 import os
-from .config import HEADERS, PROXIES, certify
-from selenium.webdriver.common.by import By
+import shutil
+import tempfile
+import threading
+import time
+from .config import (certify, http_fetch_enabled, page_load_deadline, lean_browser_profile, browser_profile_template,
+                     blocked_url_patterns)
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 import random
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 import logging
+from functools import lru_cache
+from contextlib import nullcontext
 from webdriver_manager.chrome import ChromeDriverManager
-from selenium.common.exceptions import StaleElementReferenceException
+from selenium.common.exceptions import TimeoutException
+from .driver_pool import get_driver_pool
+from .concurrency import get_concurrency_controller
+from .scheduler import get_host_scheduler
+from .http_fetch import fetch_url_static, tier_stats, ThrottledError
+from .page_cache import get_page_cache
+from .tracing import span, traced, current_span
 
 os.environ['REQUESTS_CA_BUNDLE'] = certify
 
-def initialize_driver(headers_list, proxy_list):
-    logging.getLogger('selenium').setLevel(logging.ERROR)
-    logging.getLogger('urllib3').setLevel(logging.ERROR)
 
+class ScrapeError(Exception):
+    """Raised by `fetch_page` when Chrome could not load or read a page."""
+
+
+@lru_cache(maxsize=1)
+def _chromedriver_path():
+    return ChromeDriverManager().install()
+
+# Chrome flags of the lean profile: no first-run setup nor background traffic unrelated to the page
+LEAN_PROFILE_ARGUMENTS = [
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-sync",
+    "--disable-default-apps",
+    "--mute-audio",
+]
+# Files Chrome locks in a profile it runs; they must not be copied to another instance
+_PROFILE_LOCK_FILES = ("SingletonLock", "SingletonSocket", "SingletonCookie", "lockfile")
+
+_profile_template_lock = threading.Lock()
+_profile_template_error = None
+
+def _browser_options():
+    """Chrome options shared by every driver and by the warm-up of the profile template."""
     options = Options()
     options.page_load_strategy = 'eager'
 
@@ -44,41 +78,171 @@ def initialize_driver(headers_list, proxy_list):
     options.add_argument("--disable-software-rasterizer")
     options.add_argument("--headless=new")
     options.add_argument("--window-size=1920,1080")
+    return options
+
+def _profile_template():
+    """
+    Returns the directory of the shared, pre-warmed Chrome profile, creating it on first use
+    by running Chrome once on it. Each driver starts from a copy, as a profile cannot be
+    opened by two Chrome instances at the same time.
+
+    The profile is warmed up in a temporary directory next to the template and renamed into
+    place, so an interrupted warm-up never leaves a partial template and concurrent processes
+    keep whichever template is renamed first.
+
+    Raises:
+        Exception: If Chrome could not warm up the profile; later calls fail the same way
+            without launching Chrome again.
+    """
+    global _profile_template_error
+    with _profile_template_lock:
+        if _profile_template_error is not None:
+            raise _profile_template_error
+        if os.path.isdir(browser_profile_template):
+            return browser_profile_template
+        print(f"🧰 Préparation du profil Chrome partagé dans {browser_profile_template}...")
+        parent_dir = os.path.dirname(os.path.abspath(browser_profile_template))
+        os.makedirs(parent_dir, exist_ok=True)
+        warming_dir = tempfile.mkdtemp(prefix=".chrome-profile-warming-", dir=parent_dir)
+        try:
+            options = _browser_options()
+            options.add_argument(f"--user-data-dir={warming_dir}")
+            for argument in LEAN_PROFILE_ARGUMENTS:
+                options.add_argument(argument)
+            service = Service(_chromedriver_path(), log_output=os.devnull if os.name == 'posix' else 'NUL')
+            driver = webdriver.Chrome(service=service, options=options)
+            try:
+                driver.get("about:blank")
+            finally:
+                driver.quit()
+            for lock_file in _PROFILE_LOCK_FILES:
+                lock_path = os.path.join(warming_dir, lock_file)
+                if os.path.lexists(lock_path):
+                    os.remove(lock_path)
+            try:
+                os.rename(warming_dir, browser_profile_template)
+            except OSError:
+                if not os.path.isdir(browser_profile_template):
+                    raise
+                # Another process created the template first
+        except Exception as e:
+            _profile_template_error = e
+            raise
+        finally:
+            shutil.rmtree(warming_dir, ignore_errors=True)
+        return browser_profile_template
+
+def _copy_profile_template():
+    template_dir = _profile_template()
+    profile_dir = tempfile.mkdtemp(prefix="chrome-profile-")
+    shutil.copytree(template_dir, profile_dir, dirs_exist_ok=True,
+                    ignore=shutil.ignore_patterns(*_PROFILE_LOCK_FILES))
+    return profile_dir
+
+@traced("selenium.launch")
+def initialize_driver(headers_list, proxy_list, user_agent=None, proxy=None):
+    logging.getLogger('selenium').setLevel(logging.ERROR)
+    logging.getLogger('urllib3').setLevel(logging.ERROR)
+
+    options = _browser_options()
 
-    user_agent = random.choice(headers_list)['User-Agent']
+    if user_agent is None:
+        user_agent = random.choice(headers_list)['User-Agent']
     options.add_argument(f"user-agent={user_agent}")
 
-    proxy = random.choice(proxy_list)
+    if proxy is None:
+        proxy = random.choice(proxy_list)
     if proxy:
         options.add_argument(f"--proxy-server={proxy}")
 
+    profile_dir = None
+    if lean_browser_profile:
+        try:
+            profile_dir = _copy_profile_template()
+            options.add_argument(f"--user-data-dir={profile_dir}")
+        except Exception as e:
+            print(f"⚠️ Profil Chrome partagé indisponible, démarrage avec un profil vierge : {e}")
+        for argument in LEAN_PROFILE_ARGUMENTS:
+            options.add_argument(argument)
+
     log_path = os.devnull if os.name == 'posix' else 'NUL'
-    service = Service(ChromeDriverManager().install(), log_output=log_path)
+    service = Service(_chromedriver_path(), log_output=log_path)
 
-    driver = webdriver.Chrome(service=service, options=options)
+    try:
+        driver = webdriver.Chrome(service=service, options=options)
+    except Exception:
+        if profile_dir:
+            shutil.rmtree(profile_dir, ignore_errors=True)
+        raise
+    driver.set_page_load_timeout(page_load_deadline)
+    if lean_browser_profile:
+        driver.lean_profile_dir = profile_dir
+        try:
+            # Fonts, media and trackers are refused before any byte is downloaded
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": blocked_url_patterns})
+        except Exception as e:
+            print(f"⚠️ Blocage des ressources indisponible pour ce driver : {e}")
     return driver
 
-def scrape_url(driver, url, timeout=10):
+# Extracts the page title (first h1, otherwise <title>) and the non-empty paragraph texts in one round-trip,
+# with the load time and the bytes transferred reported by the Performance API (cross-origin resources
+# without Timing-Allow-Origin count as 0 bytes)
+EXTRACT_SCRIPT = """
+const h1 = document.querySelector('h1');
+const title = (h1 && h1.innerText.trim()) || document.title.trim();
+const paragraphs = Array.from(document.querySelectorAll('p'), p => p.innerText.trim()).filter(text => text);
+const navigation = performance.getEntriesByType('navigation')[0];
+const resources = performance.getEntriesByType('resource');
+const transferred = resources.reduce((total, entry) => total + (entry.transferSize || 0),
+                                     navigation ? navigation.transferSize : 0);
+return {
+    title: title,
+    paragraphs: paragraphs,
+    load_ms: navigation ? Math.round(navigation.domContentLoadedEventEnd || navigation.responseEnd) : null,
+    transfer_bytes: transferred,
+    resources: resources.length
+};
+"""
+
+def scrape_url(driver, url, deadline=page_load_deadline, metrics=None):
+    """
+    Loads `url` and extracts its title and paragraphs with a single script call.
+
+    The extraction runs as soon as the document is interactive. A page still loading after
+    `deadline` seconds (the page-load timeout of the driver for this call) is stopped and
+    extracted as it is. The page load time ('load_ms'),
+    bytes transferred ('transfer_bytes') and resource count ('resources') are set on the
+    current span and, if given, in the `metrics` dictionary.
+    """
     extracted = {}
+    start = time.monotonic()
     try:
-        driver.get(url)
-        for attempt in range(3):
-            try:
-                try:
-                    h1 = WebDriverWait(driver, timeout).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, "h1"))
-                    )
-                    extracted["title"] = h1.text.strip()
-                except:
-                    extracted["title"] = driver.title.strip()
-
-                ps = driver.find_elements(By.CSS_SELECTOR, "p")
-                paragraph_texts = [p.text.strip() for p in ps if p.text.strip()]
-                extracted["paragraphs"] = "\n\n".join(paragraph_texts)
-                return extracted
-            except StaleElementReferenceException:
-                print(f"⚠️ Erreur de référence périmée. Nouvelle tentative {attempt + 1}/3...")
-                continue
+        if deadline != page_load_deadline:
+            driver.set_page_load_timeout(deadline)
+        try:
+            driver.get(url)
+        except TimeoutException:
+            print(f"⏱️ Chargement de {url} interrompu après {deadline}s, extraction du contenu déjà chargé.")
+            driver.execute_script("window.stop();")
+        finally:
+            if deadline != page_load_deadline:
+                # Pooled drivers keep the default timeout for the next page
+                driver.set_page_load_timeout(page_load_deadline)
+        remaining = max(0.5, deadline - (time.monotonic() - start))
+        try:
+            WebDriverWait(driver, remaining, poll_frequency=0.1).until(
+                lambda d: d.execute_script("return document.readyState") != "loading"
+            )
+        except TimeoutException:
+            pass
+        data = driver.execute_script(EXTRACT_SCRIPT) or {}
+        extracted["title"] = (data.get("title") or "").strip()
+        extracted["paragraphs"] = "\n\n".join(data.get("paragraphs") or [])
+        page_metrics = {key: data.get(key) for key in ("load_ms", "transfer_bytes", "resources")}
+        current_span().set(**page_metrics)
+        if metrics is not None:
+            metrics.update(page_metrics)
     except Exception as e:
         extracted["title"] = f"ERROR: {e}"
         extracted["paragraphs"] = f"ERROR: {e}"
@@ -90,17 +254,93 @@ def close_driver(driver):
             driver.quit()
         except Exception as e:
             print(f"❌ Erreur lors de la fermeture du driver : {e}")
+        profile_dir = getattr(driver, "lean_profile_dir", None)
+        if profile_dir:
+            shutil.rmtree(profile_dir, ignore_errors=True)
+
+def fetch_page(url):
+    """
+    Fetches a page through the HTTP tier, escalating to a pooled Selenium driver if needed.
+
+    Returns:
+        A dictionary with 'title' and 'paragraphs'.
+
+    Raises:
+        ThrottledError: If the site throttles the HTTP tier.
+        ScrapeError: If the page could not be loaded in Chrome.
+    """
+    if http_fetch_enabled:
+        start = time.monotonic()
+        with span("fetch.http", url=url) as http_span:
+            try:
+                data = fetch_url_static(url)
+            except ThrottledError as e:
+                http_span.set(throttled=e.status)
+                tier_stats.record("http_throttled", time.monotonic() - start)
+                raise
+            http_span.set(escalated=data is None)
+        tier_stats.record("http" if data else "http_escalated", time.monotonic() - start)
+        if data is not None:
+            return data
+
+    start = time.monotonic()
+    controller = get_concurrency_controller()
+    page_metrics = {}
+    try:
+        with span("fetch.selenium", url=url) as selenium_span:
+            with controller.track(url) if controller else nullcontext():
+                if controller:
+                    selenium_span.set(concurrency_limit=controller.limit)
+                with get_driver_pool().driver() as driver:
+                    with span("selenium.page_load", url=url):
+                        data = scrape_url(driver, url, metrics=page_metrics)
+                    # Raised inside the blocks so the controller counts a failure and the pool checks the driver
+                    if (data.get("title") or "").startswith("ERROR:"):
+                        raise ScrapeError(data["title"][len("ERROR:"):].strip())
+    except Exception:
+        tier_stats.record("selenium_error", time.monotonic() - start)
+        raise
+    tier_stats.record("selenium", time.monotonic() - start, transfer_bytes=page_metrics.get("transfer_bytes"))
+    return data
+
+def polite_fetch_page(url):
+    """
+    `fetch_page` within the per-host politeness rules. Throttling answers, scraping errors
+    (raised by `fetch_page`) and pages without text count as failures of the host.
+    """
+    scheduler = get_host_scheduler()
+    if scheduler is None:
+        return fetch_page(url)
+    with scheduler.slot(url) as outcome:
+        try:
+            data = fetch_page(url)
+        except ThrottledError as e:
+            outcome.retry_after = e.retry_after
+            raise
+        outcome.ok = bool((data.get("paragraphs") or "").strip())
+    return data
 
 def scrape_worker_threaded(task):
-    driver = None
     url = task["url"]
     subquestion = task["subquestion"]
     try:
         print(f"🔗 Scraping démarré pour {url} (Sous-question : {subquestion})")
 
-        driver = initialize_driver(HEADERS, PROXIES)
+        with span("scrape.page", url=url) as scrape_span:
+            page_cache = get_page_cache()
+            cached, is_stale = page_cache.get(url) if page_cache else (None, False)
+            if cached is not None:
+                print(f"💾 Page servie depuis le cache{' (périmée, rafraîchissement en cours)' if is_stale else ''} : {url}")
+                if is_stale:
+                    page_cache.revalidate(url, polite_fetch_page)
+                data = dict(cached)
+            else:
+                data = polite_fetch_page(url)
+                if page_cache:
+                    page_cache.put(url, data)
+            scrape_span.set(cache_hits=1 if cached is not None else 0,
+                            text_bytes=len((data.get("paragraphs") or "").encode("utf-8")))
 
-        data = scrape_url(driver, url)
         data["url"] = url
         data["subquestion"] = subquestion
 
@@ -108,7 +348,4 @@ def scrape_worker_threaded(task):
         return data
     except Exception as e:
         print(f"❌ Erreur lors du scraping de {url} : {e}")
-        return None
-    finally:
-        if driver:
-            close_driver(driver)
\ No newline at end of file
+        return None
\ No newline at end of file
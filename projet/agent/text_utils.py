@@ -0,0 +1,65 @@
+import re
+import unicodedata
+
+STOPWORDS = {
+    # Français
+    "les", "des", "une", "est", "que", "qui", "dans", "pour", "par", "sur", "avec", "son", "ses", "aux", "du",
+    "pas", "plus", "ont", "elle", "ils", "elles", "nous", "vous", "leur", "leurs", "cette", "ces", "mais",
+    "comme", "sont", "tout", "tous", "etre", "avoir", "fait", "faire", "peut", "ainsi", "entre", "sans", "sous",
+    "dont", "quel", "quelle", "quels", "quelles", "comment", "pourquoi", "quoi", "ete", "aussi", "donc", "car",
+    "lors", "alors", "meme", "tres", "bien", "encore", "apres", "avant", "depuis", "selon", "chez",
+    # English
+    "the", "and", "for", "are", "was", "were", "with", "that", "this", "from", "have", "has", "had", "not",
+    "but", "what", "which", "who", "how", "why", "when", "where", "their", "they", "them", "its", "his", "her",
+    "you", "your", "can", "will", "would", "should", "could", "about", "into", "than", "then", "there", "these",
+    "those", "been", "also", "more", "most", "some", "such", "only", "other",
+}
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def strip_accents(text: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercases, strips accents and splits `text` into words, dropping stopwords and words under 3 letters."""
+    words = _WORD.findall(strip_accents((text or "").lower()))
+    return [w for w in words if len(w) >= 3 and w not in STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimates the number of model tokens in `text` (about 4 characters per token)."""
+    return len(text or "") // 4
+
+
+def term_similarity(a: str, b: str) -> float:
+    """Jaccard similarity between the significant words of `a` and `b`, between 0 and 1."""
+    words_a, words_b = set(tokenize(a)), set(tokenize(b))
+    if not words_a or not words_b:
+        return 0.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+
+def closest_text(text: str, candidates, threshold: float) -> str | None:
+    """
+    Finds the candidate closest to `text`.
+
+    Args:
+        text: The text to match.
+        candidates: The texts to compare it with.
+        threshold: The minimum `term_similarity` of a match that is not identical once normalized.
+
+    Returns:
+        The candidate equal to `text` (ignoring case, accents and spacing), otherwise the most
+        similar one reaching `threshold`, or None.
+    """
+    normalized = " ".join(strip_accents((text or "").lower()).split())
+    best, best_score = None, threshold
+    for candidate in candidates:
+        if " ".join(strip_accents((candidate or "").lower()).split()) == normalized:
+            return candidate
+        score = term_similarity(text, candidate)
+        if score >= best_score:
+            best, best_score = candidate, score
+    return best
@@ -0,0 +1,194 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from .config import trace_enabled, trace_dir
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+# Numeric attributes summed per span name in the profile summary
+SUMMED_ATTRIBUTES = ("tokens_in", "tokens_out", "cache_hits", "retries", "text_bytes", "transfer_bytes")
+
+
+class Span:
+    """A timed operation of a trace, with free-form attributes."""
+
+    def __init__(self, span_id: int, name: str, parent_id: int | None, start: float, attributes: dict):
+        self.span_id = span_id
+        self.name = name
+        self.parent_id = parent_id
+        self.thread = threading.current_thread().name
+        self.start = start
+        self.duration = None
+        self.attributes = attributes
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def incr(self, key: str, amount: float = 1):
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.span_id,
+            "name": self.name,
+            "parent": self.parent_id,
+            "start": round(self.start, 6),
+            "duration": round(self.duration, 6) if self.duration is not None else None,
+            "thread": self.thread,
+            "attributes": dict(self.attributes),
+            "error": self.error,
+        }
+
+
+class _NullSpan:
+    """Span returned while no trace is running; every operation is a no-op."""
+
+    span_id = None
+
+    def set(self, **attributes):
+        pass
+
+    def incr(self, key: str, amount: float = 1):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """
+    Collects the spans of one research run across threads and asyncio tasks.
+
+    Spans nest through a context variable, so the parent of a span is the innermost span
+    open in the same thread or task. Spans opened in executor threads have no parent.
+    Nothing is recorded until `start` is called.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans = []
+        self._next_id = 0
+        self._origin = None
+        self.run_name = None
+        self.started_at = None
+
+    @property
+    def active(self) -> bool:
+        return self._origin is not None
+
+    def start(self, run_name: str):
+        """Starts a new trace, discarding any previous span."""
+        with self._lock:
+            self._spans = []
+            self._next_id = 0
+            self._origin = time.perf_counter()
+            self.run_name = run_name
+            self.started_at = datetime.now()
+
+    def stop(self):
+        with self._lock:
+            self._origin = None
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Records the duration of the enclosed block as a span named `name`."""
+        parent = _current_span.get()
+        with self._lock:
+            origin = self._origin
+            if origin is not None:
+                self._next_id += 1
+                span = Span(self._next_id, name, parent.span_id if parent else None,
+                            time.perf_counter() - origin, attributes)
+                self._spans.append(span)
+        if origin is None:
+            yield NULL_SPAN
+            return
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration = time.perf_counter() - origin - span.start
+            _current_span.reset(token)
+
+    def spans(self) -> list[dict]:
+        with self._lock:
+            return [span.to_dict() for span in self._spans]
+
+    def summary(self) -> dict:
+        """
+        Aggregates the spans by name.
+
+        Returns:
+            A dictionary mapping each span name to its count, total/average/max duration,
+            error count and the sums of the SUMMED_ATTRIBUTES it carries.
+        """
+        summary = {}
+        for span in self.spans():
+            entry = summary.setdefault(span["name"], {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0, "errors": 0})
+            duration = span["duration"] or 0.0
+            entry["count"] += 1
+            entry["total_seconds"] += duration
+            entry["max_seconds"] = max(entry["max_seconds"], duration)
+            entry["errors"] += 1 if span["error"] else 0
+            for key in SUMMED_ATTRIBUTES:
+                value = span["attributes"].get(key)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    entry[key] = entry.get(key, 0) + value
+        for entry in summary.values():
+            entry["avg_seconds"] = entry["total_seconds"] / entry["count"]
+        return summary
+
+    def save(self, directory: str = trace_dir) -> str:
+        """Writes the trace as JSON in `directory` and returns the file path."""
+        os.makedirs(directory, exist_ok=True)
+        started_at = self.started_at or datetime.now()
+        path = os.path.join(directory, f"trace-{started_at.strftime('%Y%m%d-%H%M%S')}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "run": self.run_name,
+                "started_at": started_at.isoformat(),
+                "spans": self.spans(),
+                "summary": self.summary(),
+            }, f, ensure_ascii=False, indent=2)
+        return path
+
+
+tracer = Tracer()
+
+
+def span(name: str, **attributes):
+    """Shortcut for `tracer.span`."""
+    return tracer.span(name, **attributes)
+
+
+def traced(name: str):
+    """Decorator recording each call of the decorated function as a span named `name`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_span():
+    """Returns the innermost open span, or a no-op span outside of any trace."""
+    return _current_span.get() or NULL_SPAN
+
+
+def start_trace(run_name: str) -> bool:
+    """Starts tracing a run if tracing is enabled in the configuration. Returns whether it started."""
+    if trace_enabled:
+        tracer.start(run_name)
+    return tracer.active
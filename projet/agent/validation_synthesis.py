@@ -1,6 +1,22 @@
 import json
 from .mistral_client import request_mistral_model
+from .config import synthesis_repair_max_issues
+from .evidence_pack import build_evidence_pack
+from .tracing import traced
 
+
+def _parse_json_response(response_json_str: str):
+    return json.loads(response_json_str.strip().strip('`').strip('json').strip())
+
+
+def _is_json_object(response_json_str: str) -> bool:
+    try:
+        return isinstance(_parse_json_response(response_json_str), dict)
+    except json.JSONDecodeError:
+        return False
+
+
+@traced("synthesis.validate")
 def validate_final_synthesis(query: str, synthesis: str, documents: list[dict]) -> dict:
     """
     Validates the coherence and relevance of the final synthesis against its source documents.
@@ -9,30 +25,94 @@ def validate_final_synthesis(query: str, synthesis: str, documents: list[dict])
         query: The initial research query.
         synthesis: The generated final synthesis text.
         documents: A list of dictionaries, where each dictionary represents a source document
-                   (e.g., with 'url', 'title', 'summary').
+                   (e.g., with 'url', 'title', 'summary'). They are sent as the numbered evidence
+                   pack also used by the synthesis prompt.
 
     Returns:
-        A dictionary with 'is_coherent' (bool) and 'reason' (str).
+        A dictionary with 'is_coherent' (bool), 'reason' (str) and 'issues', the list of
+        offending passages as {"passage": str, "problem": str} (empty when coherent or unknown).
     """
     system_prompt = """Tu es un assistant de validation d'information expert.
     Ta mission est d'évaluer la qualité d'une synthèse en la comparant aux documents sources qui ont servi à la générer.
+    Les sources sont numérotées et la synthèse les cite par leur numéro entre crochets.
     Réponds uniquement avec un objet JSON strict.
     La synthèse peut parler d'autre chose tant que c'est en rapport avec la question initiale et que la question initiale est répondue dans la synthese.
-    Si la synthèse est pertinente et ne contient pas d'informations qui ne sont pas dans les documents sources, retourne : {"is_coherent": true, "reason": "La synthèse est cohérente."}.
-    Si la synthèse est incohérente, qu'elle "hallucine" ou qu'elle ne répond pas à la question, retourne : {"is_coherent": false, "reason": "Explique pourquoi la synthèse n'est pas cohérente ou pertinente."}.
+    Si la synthèse est pertinente et ne contient pas d'informations qui ne sont pas dans les documents sources, retourne : {"is_coherent": true, "reason": "La synthèse est cohérente.", "issues": []}.
+    Si la synthèse est incohérente, qu'elle "hallucine" ou qu'elle ne répond pas à la question, retourne : {"is_coherent": false, "reason": "Explique pourquoi la synthèse n'est pas cohérente ou pertinente.", "issues": [{"passage": "extrait exact de la synthèse, copié mot pour mot", "problem": "ce qui ne va pas"}]}.
+    Liste dans "issues" chaque phrase fautive. Laisse "issues" vide si le problème concerne la synthèse entière (par exemple si elle ne répond pas à la question).
     """
     messages = [
         {"role": "system", "content": system_prompt},
         {"role": "user",
-         "content": f"""Question initiale : {query}\n\nSynthèse à valider : {synthesis}\n\nDocuments sources : {json.dumps(documents, ensure_ascii=False)}"""}
+         "content": f"""Documents sources :\n{build_evidence_pack(documents)[0]}\n\nQuestion initiale : {query}\n\nSynthèse à valider : {synthesis}"""}
     ]
+    response_json_str = None
     try:
-        response_json_str = request_mistral_model(messages)
-        response_json_str = response_json_str.strip().strip('`').strip('json').strip()
-        return json.loads(response_json_str)
+        response_json_str = request_mistral_model(messages, cache_if=_is_json_object)
+        result = _parse_json_response(response_json_str)
+        issues = result.get("issues") if isinstance(result.get("issues"), list) else []
+        result["issues"] = [issue for issue in issues
+                            if isinstance(issue, dict) and isinstance(issue.get("passage"), str) and issue["passage"].strip()]
+        return result
     except (json.JSONDecodeError, Exception) as e:
         print(f"❌ Erreur de format JSON ou de traitement lors de la validation finale : {e}")
         print("--- Réponse brute du modèle ---")
         print(response_json_str)
         print("------------------------------")
-        return {"is_coherent": False, "reason": "Erreur de format ou de traitement de la réponse de validation."}
\ No newline at end of file
+        return {"is_coherent": False, "reason": "Erreur de format ou de traitement de la réponse de validation.", "issues": []}
+
+
+@traced("synthesis.repair")
+def repair_synthesis(query: str, synthesis: str, issues: list[dict], documents: list[dict]) -> str | None:
+    """
+    Rewrites or removes only the offending passages of a synthesis, instead of regenerating it.
+
+    The model only returns a replacement for each passage, so a repair costs a small fraction
+    of the output tokens of a full synthesis.
+
+    Args:
+        query: The initial research query.
+        synthesis: The synthesis judged incoherent.
+        issues: The offending passages reported by `validate_final_synthesis`.
+        documents: The source documents of the synthesis.
+
+    Returns:
+        The repaired synthesis, or None if the issues cannot be repaired in place
+        (too many issues, passages not found in the synthesis, invalid response).
+    """
+    if not issues or len(issues) > synthesis_repair_max_issues:
+        return None
+    if any(issue["passage"] not in synthesis for issue in issues):
+        print("⚠️ Les passages signalés ne figurent pas tels quels dans la synthèse. Réparation impossible.")
+        return None
+
+    system_prompt = """Tu es un assistant de correction de synthèse.
+    On te donne des passages fautifs d'une synthèse, le problème de chacun et les documents sources numérotés.
+    Pour chaque passage, propose un remplacement fidèle aux documents sources, dans le même style et en citant les sources par leur numéro entre crochets.
+    Si aucune information des sources ne permet de corriger le passage, remplace-le par une chaîne vide.
+    Réponds uniquement avec un tableau JSON strict, dans le même ordre que les passages : [{"passage": "passage d'origine", "replacement": "nouveau texte"}].
+    """
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user",
+         "content": f"""Documents sources :\n{build_evidence_pack(documents)[0]}\n\nQuestion initiale : {query}\n\nPassages : {json.dumps(issues, ensure_ascii=False)}"""}
+    ]
+    response_json_str = None
+    try:
+        response_json_str = request_mistral_model(messages, use_cache=False)
+        replacements = _parse_json_response(response_json_str)
+        if not isinstance(replacements, list) or len(replacements) != len(issues):
+            raise ValueError("nombre de remplacements inattendu")
+        repaired = synthesis
+        for issue, item in zip(issues, replacements):
+            replacement = item.get("replacement") if isinstance(item, dict) else None
+            if not isinstance(replacement, str):
+                raise ValueError("remplacement manquant")
+            repaired = repaired.replace(issue["passage"], replacement.strip(), 1)
+        return repaired.strip()
+    except (json.JSONDecodeError, Exception) as e:
+        print(f"❌ Erreur lors de la réparation ciblée de la synthèse : {e}")
+        print("--- Réponse brute du modèle ---")
+        print(response_json_str)
+        print("------------------------------")
+        return None
@@ -0,0 +1,63 @@
+"""
+Compares the size of the synthesis/validation source block between the former
+json.dumps serialization and the numbered evidence pack, for several k and n.
+
+Usage (from the projet directory):
+    python benchmarks/bench_prompt_size.py --k 2 3 5 8 --n 1 2 3 5
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.evidence_pack import build_evidence_pack
+from agent.text_utils import estimate_tokens
+
+WORDS = ("énergie solaire rendement coût installation réseau stockage batterie production "
+         "consommation politique subvention marché europe croissance capacité prix").split()
+
+
+def _sentence(rng: random.Random, length: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(length)).capitalize() + "."
+
+
+def make_documents(k: int, n: int, summary_words: int, seed: int = 0) -> list[dict]:
+    """Builds k * n validated documents shaped like the output of the research workflow."""
+    rng = random.Random(seed)
+    documents = []
+    for i in range(k):
+        subquestion = f"Sous-question {i + 1} : {_sentence(rng, 12)}"
+        for j in range(n):
+            documents.append({
+                "url": f"https://www.exemple-{i}-{j}.fr/articles/{rng.randint(10000, 99999)}/{'-'.join(rng.sample(WORDS, 6))}",
+                "subquestion": subquestion,
+                "title": _sentence(rng, 8),
+                "summary": " ".join(_sentence(rng, 15) for _ in range(max(1, summary_words // 15))),
+            })
+    return documents
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Taille des prompts de synthèse et de validation selon k et n.")
+    parser.add_argument("--k", type=int, nargs="+", default=[2, 3, 5, 8], help="Nombres de sous-questions.")
+    parser.add_argument("--n", type=int, nargs="+", default=[1, 2, 3, 5], help="Nombres de documents par sous-question.")
+    parser.add_argument("--summary-words", type=int, default=90, help="Longueur des résumés, en mots.")
+    args = parser.parse_args()
+
+    query = "Quel est l'avenir de l'énergie solaire en Europe ?"
+    print(f"{'k':>3} {'n':>3} {'docs':>5} | {'json (tokens)':>13} {'pack (tokens)':>13} {'gain':>6}")
+    for k in args.k:
+        for n in args.n:
+            documents = make_documents(k, n, args.summary_words)
+            legacy = json.dumps({"query": query, "data": documents}, ensure_ascii=False)
+            pack, _ = build_evidence_pack(documents)
+            legacy_tokens, pack_tokens = estimate_tokens(legacy), estimate_tokens(pack)
+            print(f"{k:>3} {n:>3} {len(documents):>5} | {legacy_tokens:>13} {pack_tokens:>13} "
+                  f"{1 - pack_tokens / legacy_tokens:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Offline benchmark of perform_full_research: search, scraping and the Mistral model are
+replaced by in-process fakes with configurable latencies and failure rates, so the sync
+(staged, thread pools) and async (pipelined) modes can be compared without network access.
+
+Usage (from the projet directory):
+    python benchmarks/bench_workflow.py --modes sync async --max-thread 2 5 10 --k 3 --n 2 4
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent import main_workflow, async_workflow, document_processing, validation_synthesis, llm_cache, page_cache
+from agent.google_search import set_search_backend, googlesearch_backend
+
+FILLER = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed eiusmod tempor incididunt labore "
+          "dolore magna aliqua enim minim veniam quis nostrud exercitation ullamco laboris nisi aliquip").split()
+
+
+class Latency:
+    """Log-normal latency distribution given by its median (seconds) and spread (sigma)."""
+
+    def __init__(self, median: float, sigma: float = 0.5):
+        self.median = median
+        self.sigma = sigma
+
+    def sample(self, rng: random.Random) -> float:
+        return 0.0 if self.median <= 0 else rng.lognormvariate(0, self.sigma) * self.median
+
+
+class FakeBackends:
+    """
+    Fake search engine, scraper and Mistral model sharing a seeded random generator.
+
+    Args:
+        search_latency, scrape_latency, llm_latency: Latency distributions of each fake.
+        scrape_failure_rate: Share of pages whose scraping fails (the worker returns None).
+        llm_failure_rate: Share of model calls raising an exception.
+        relevance_rate: Share of pages about their sub-question and judged relevant by the model.
+        seed: Seed of the random generator, for reproducible runs.
+    """
+
+    def __init__(self, search_latency: Latency, scrape_latency: Latency, llm_latency: Latency,
+                 scrape_failure_rate: float = 0.1, llm_failure_rate: float = 0.0,
+                 relevance_rate: float = 0.6, seed: int = 0):
+        self.search_latency = search_latency
+        self.scrape_latency = scrape_latency
+        self.llm_latency = llm_latency
+        self.scrape_failure_rate = scrape_failure_rate
+        self.llm_failure_rate = llm_failure_rate
+        self.relevance_rate = relevance_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counters = {"search_calls": 0, "scrapes": 0, "scrape_failures": 0, "llm_calls": 0,
+                         "llm_failures": 0, "search_busy": 0.0, "scrape_busy": 0.0, "llm_busy": 0.0}
+
+    def _draw(self, latency: Latency, failure_rate: float, busy_key: str) -> tuple[float, bool]:
+        with self._lock:
+            delay = latency.sample(self._rng)
+            failed = self._rng.random() < failure_rate
+            self.counters[busy_key] += delay
+            return delay, failed
+
+    def _is_relevant(self, url: str) -> bool:
+        # Stable per URL, so the same page gets the same verdict in every mode
+        return random.Random(url).random() < self.relevance_rate
+
+    def search(self, query: str, n: int) -> list[str]:
+        delay, _ = self._draw(self.search_latency, 0.0, "search_busy")
+        with self._lock:
+            self.counters["search_calls"] += 1
+        time.sleep(delay)
+        slug = re.sub(r"\W+", "-", query.lower()).strip("-")
+        return [f"https://bench.example/{slug}/{i}" for i in range(n)]
+
+    def scrape(self, task: dict) -> dict | None:
+        delay, failed = self._draw(self.scrape_latency, self.scrape_failure_rate, "scrape_busy")
+        with self._lock:
+            self.counters["scrapes"] += 1
+            self.counters["scrape_failures"] += failed
+        time.sleep(delay)
+        if failed:
+            return None
+        topic = task["subquestion"] if self._is_relevant(task["url"]) else ""
+        words = random.Random(task["url"]).choices(FILLER, k=150)
+        return {"url": task["url"], "subquestion": task["subquestion"], "title": topic,
+                "paragraphs": f"{topic}\n{' '.join(words)}\n{topic}"}
+
+    @staticmethod
+    def _answer(messages: list[dict]) -> str:
+        # Relevant pages repeat their sub-question, irrelevant ones only contain filler
+        system, user = messages[0]["content"], messages[-1]["content"]
+        subquery = re.search(r"Sous-question : (.+)", user)
+        subquery = subquery.group(1).strip() if subquery else None
+        if "plusieurs textes numérotés" in system:
+            texts = re.split(r"=== Texte \d+ ===", user)[1:]
+            return json.dumps([{"summary": "Résumé.", "is_relevant": bool(subquery) and subquery in text}
+                               for text in texts])
+        if "validation d'information" in system:
+            return json.dumps({"is_coherent": True, "reason": "La synthèse est cohérente.", "issues": []})
+        if "correction de synthèse" in system:
+            return "[]"
+        if subquery:
+            text = user.split("Texte à analyser :", 1)[-1]
+            return json.dumps({"summary": "Résumé.", "is_relevant": subquery in text})
+        return "Synthèse de référence [1]."
+
+    def request_mistral_model(self, messages: list[dict], use_cache: bool = True, cache_if=None) -> str:
+        delay, failed = self._draw(self.llm_latency, self.llm_failure_rate, "llm_busy")
+        with self._lock:
+            self.counters["llm_calls"] += 1
+            self.counters["llm_failures"] += failed
+        time.sleep(delay)
+        if failed:
+            raise RuntimeError("Échec simulé du modèle")
+        return self._answer(messages)
+
+    async def request_mistral_model_async(self, messages: list[dict], use_cache: bool = True, cache_if=None) -> str:
+        delay, failed = self._draw(self.llm_latency, self.llm_failure_rate, "llm_busy")
+        with self._lock:
+            self.counters["llm_calls"] += 1
+            self.counters["llm_failures"] += failed
+        await asyncio.sleep(delay)
+        if failed:
+            raise RuntimeError("Échec simulé du modèle")
+        return self._answer(messages)
+
+
+# Messages printed by the workflow when a model call fails or its answer cannot be read
+LLM_ERROR_MARKERS = ("Erreur lors de l'appel au modèle", "Erreur de format JSON",
+                     "Erreur lors de l'analyse du document", "Erreur lors de la réparation ciblée")
+
+
+@contextlib.contextmanager
+def patched(fakes: FakeBackends, max_thread: int, cache_dir: str):
+    """
+    Points the workflow modules at the fakes, and the LLM and page caches at `cache_dir`,
+    then restores the original attributes afterwards.
+    """
+    replacements = [
+        (llm_cache, "_cache", llm_cache.LLMCache(os.path.join(cache_dir, "llm_cache.sqlite3"))),
+        (page_cache, "_cache", page_cache.PageCache(os.path.join(cache_dir, "pages"))),
+        (main_workflow, "scrape_worker_threaded", fakes.scrape),
+        (async_workflow, "scrape_worker_threaded", fakes.scrape),
+        (main_workflow, "request_mistral_model", fakes.request_mistral_model),
+        (document_processing, "request_mistral_model", fakes.request_mistral_model),
+        (document_processing, "request_mistral_model_async", fakes.request_mistral_model_async),
+        (validation_synthesis, "request_mistral_model", fakes.request_mistral_model),
+        (main_workflow, "max_thread", max_thread),
+        (async_workflow, "max_thread", max_thread),
+    ]
+    originals = [(module, name, getattr(module, name)) for module, name, _ in replacements]
+    for module, name, value in replacements:
+        setattr(module, name, value)
+    set_search_backend(fakes.search)
+    try:
+        yield
+    finally:
+        llm_cache._cache.close()
+        for module, name, value in originals:
+            setattr(module, name, value)
+        set_search_backend(googlesearch_backend)
+
+
+def run_once(mode: str, max_thread: int, k: int, n: int, args) -> dict:
+    fakes = FakeBackends(Latency(args.search_latency), Latency(args.scrape_latency, args.sigma),
+                         Latency(args.llm_latency, args.sigma), scrape_failure_rate=args.scrape_failure_rate,
+                         llm_failure_rate=args.llm_failure_rate, relevance_rate=args.relevance_rate, seed=args.seed)
+    subqueries = [f"sous-question {i + 1} sur {word} {word2}" for i, (word, word2) in
+                  enumerate(zip(["photovoltaïque", "éolien", "hydraulique", "nucléaire", "géothermie", "biomasse",
+                                 "hydrogène", "stockage"] * 4, ["rendement", "coût", "impact", "marché"] * 8))][:k]
+    log = io.StringIO()
+    with tempfile.TemporaryDirectory(prefix="bench-cache-") as cache_dir:
+        with patched(fakes, max_thread, cache_dir), contextlib.redirect_stdout(log):
+            start = time.perf_counter()
+            result = main_workflow.perform_full_research("question de référence", subqueries, n, lambda *a: None,
+                                                         mode=mode)
+            wall = time.perf_counter() - start
+    counters = fakes.counters
+    sources = sum(len(group["urls"]) for group in result["sources"])
+
+    # A broken fake or workflow still "finishes": refuse to report numbers that measure nothing
+    llm_errors = [line for line in log.getvalue().splitlines() if any(marker in line for marker in LLM_ERROR_MARKERS)]
+    unexpected_errors = [line for line in llm_errors if "Échec simulé du modèle" not in line]
+    if unexpected_errors or counters["llm_calls"] == 0 or sources == 0:
+        details = "\n".join(unexpected_errors[:5]) or f"{counters['llm_calls']} appel(s) au modèle, {sources} source(s)"
+        raise RuntimeError(f"Benchmark {mode} (max_thread={max_thread}, k={k}, n={n}) invalide :\n{details}")
+    return {
+        "mode": mode, "max_thread": max_thread, "k": k, "n": n, "wall": wall,
+        "llm_calls": counters["llm_calls"], "llm_failures": counters["llm_failures"],
+        "search_calls": counters["search_calls"], "scrapes": counters["scrapes"],
+        "scrape_utilization": counters["scrape_busy"] / (wall * max_thread) if wall else 0.0,
+        "llm_concurrency": counters["llm_busy"] / wall if wall else 0.0,
+        "sources": sources,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hors ligne de perform_full_research avec des services simulés.")
+    parser.add_argument("--modes", nargs="+", default=["sync", "async"], choices=["sync", "async"])
+    parser.add_argument("--max-thread", type=int, nargs="+", default=[4, 10], help="Tailles du pool de scraping.")
+    parser.add_argument("--k", type=int, nargs="+", default=[3], help="Nombres de sous-questions.")
+    parser.add_argument("--n", type=int, nargs="+", default=[2], help="Nombres de résultats pertinents par sous-question.")
+    parser.add_argument("--search-latency", type=float, default=0.3, help="Latence médiane d'une recherche (s).")
+    parser.add_argument("--scrape-latency", type=float, default=0.8, help="Latence médiane du scraping d'une page (s).")
+    parser.add_argument("--llm-latency", type=float, default=1.2, help="Latence médiane d'un appel au modèle (s).")
+    parser.add_argument("--sigma", type=float, default=0.5, help="Dispersion log-normale des latences.")
+    parser.add_argument("--scrape-failure-rate", type=float, default=0.1)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--relevance-rate", type=float, default=0.6, help="Part des pages pertinentes.")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplie toutes les latences (ex. 0.1 pour un essai rapide).")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    args.search_latency *= args.scale
+    args.scrape_latency *= args.scale
+    args.llm_latency *= args.scale
+
+    print(f"{'mode':<6} {'threads':>7} {'k':>3} {'n':>3} | {'wall (s)':>8} {'LLM':>5} {'échecs':>6} "
+          f"{'search':>6} {'scrapes':>7} {'util.':>6} {'LLM //':>6} {'sources':>7}")
+    for k in args.k:
+        for n in args.n:
+            for max_thread in args.max_thread:
+                for mode in args.modes:
+                    r = run_once(mode, max_thread, k, n, args)
+                    print(f"{r['mode']:<6} {r['max_thread']:>7} {r['k']:>3} {r['n']:>3} | {r['wall']:>8.2f} "
+                          f"{r['llm_calls']:>5} {r['llm_failures']:>6} {r['search_calls']:>6} {r['scrapes']:>7} "
+                          f"{r['scrape_utilization']:>6.0%} {r['llm_concurrency']:>6.1f} {r['sources']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+"""
+SQLite storage of the research history, replacing one JSON file per conversation.
+
+A conversation groups the successive syntheses of an initial query (first search, then
+refinements and regenerations). Appending an entry is a single INSERT and the sidebar
+reads one page of conversations without touching their entries.
+"""
+import glob
+import json
+import math
+import os
+import sqlite3
+import threading
+
+from agent.text_utils import tokenize
+from agent.relevance import BM25Index
+from agent.config import history_duplicate_threshold, history_semantic_threshold
+
+# Text indexed for an entry, extracted from its JSON record: query, synthesis, sub-questions and sources
+_INDEXED_COLUMNS = ("coalesce(json_extract({row}.data, '$.full_query'), '') || ' ' || "
+                    "coalesce(json_extract({row}.data, '$.display_query'), ''), "
+                    "coalesce(json_extract({row}.data, '$.result'), ''), "
+                    "coalesce(json_extract({row}.data, '$.subqueries'), ''), "
+                    "coalesce(json_extract({row}.data, '$.sources_by_subquery'), '')")
+# bm25() weights of the query, result, subqueries and sources columns
+_BM25_WEIGHTS = "4.0, 1.0, 2.0, 0.5"
+
+
+class HistoryStore:
+    """
+    Conversations and their entries in SQLite.
+
+    Conversation ids are the former history file names for migrated conversations, so
+    existing '?entry=' links keep working.
+
+    Entries are searchable through an SQLite FTS5 index ranked with BM25 (or an in-memory
+    BM25 index when FTS5 is unavailable), and optionally through embeddings stored locally.
+
+    Args:
+        path: Path of the SQLite database.
+        embed: Optional function mapping a list of texts to their embedding vectors, used
+               for semantic near-duplicate detection.
+    """
+
+    def __init__(self, path: str, embed=None):
+        self.embed = embed
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            " id TEXT PRIMARY KEY,"
+            " initial_query TEXT NOT NULL,"
+            " created_at TEXT NOT NULL,"
+            " updated_at TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS conversations_created ON conversations (created_at);"
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " conversation_id TEXT NOT NULL REFERENCES conversations (id) ON DELETE CASCADE,"
+            " timestamp TEXT NOT NULL,"
+            " data TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS entries_conversation ON entries (conversation_id, id);"
+            "CREATE TABLE IF NOT EXISTS migrations (name TEXT PRIMARY KEY);"
+            "CREATE TABLE IF NOT EXISTS entry_embeddings ("
+            " entry_id INTEGER PRIMARY KEY REFERENCES entries (id) ON DELETE CASCADE,"
+            " vector TEXT NOT NULL);"
+        )
+        self._conn.commit()
+        self.fts_enabled = self._create_fts_index()
+
+    def _create_fts_index(self) -> bool:
+        """Creates the FTS5 index, kept in sync by triggers, and indexes the entries it misses."""
+        try:
+            self._conn.executescript(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS entry_index USING fts5("
+                " query, result, subqueries, sources, tokenize = 'unicode61 remove_diacritics 2');"
+                "CREATE TRIGGER IF NOT EXISTS entries_index_insert AFTER INSERT ON entries BEGIN"
+                f" INSERT INTO entry_index (rowid, query, result, subqueries, sources) VALUES (new.id, {_INDEXED_COLUMNS.format(row='new')});"
+                " END;"
+                "CREATE TRIGGER IF NOT EXISTS entries_index_update AFTER UPDATE OF data ON entries BEGIN"
+                " DELETE FROM entry_index WHERE rowid = old.id;"
+                f" INSERT INTO entry_index (rowid, query, result, subqueries, sources) VALUES (new.id, {_INDEXED_COLUMNS.format(row='new')});"
+                " END;"
+                "CREATE TRIGGER IF NOT EXISTS entries_index_delete AFTER DELETE ON entries BEGIN"
+                " DELETE FROM entry_index WHERE rowid = old.id;"
+                " END;"
+            )
+            self._conn.execute(
+                "INSERT INTO entry_index (rowid, query, result, subqueries, sources)"
+                f" SELECT e.id, {_INDEXED_COLUMNS.format(row='e')} FROM entries e"
+                " WHERE e.id NOT IN (SELECT rowid FROM entry_index)"
+            )
+            self._conn.commit()
+            return True
+        except sqlite3.OperationalError as e:
+            print(f"⚠️ Index plein texte SQLite (FTS5) indisponible, recherche en mémoire : {e}")
+            self._conn.rollback()
+            return False
+
+    def create_conversation(self, conversation_id: str, initial_query: str, entry: dict) -> str:
+        """Creates a conversation holding its first entry and returns its id."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO conversations (id, initial_query, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                (conversation_id, initial_query, entry["timestamp"], entry["timestamp"])
+            )
+            self._insert_entry(conversation_id, entry)
+            self._conn.commit()
+        return conversation_id
+
+    def append_entry(self, conversation_id: str, entry: dict) -> bool:
+        """Appends an entry to a conversation. Returns False if the conversation does not exist."""
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE conversations SET updated_at = ? WHERE id = ?", (entry["timestamp"], conversation_id)
+            ).rowcount
+            if updated:
+                self._insert_entry(conversation_id, entry)
+            self._conn.commit()
+        return bool(updated)
+
+    def _insert_entry(self, conversation_id: str, entry: dict):
+        self._conn.execute(
+            "INSERT INTO entries (conversation_id, timestamp, data) VALUES (?, ?, ?)",
+            (conversation_id, entry["timestamp"], json.dumps(entry, ensure_ascii=False))
+        )
+
+    def replace_entry(self, entry_id: int, entry: dict) -> bool:
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE entries SET timestamp = ?, data = ? WHERE id = ?",
+                (entry["timestamp"], json.dumps(entry, ensure_ascii=False), entry_id)
+            ).rowcount
+            self._conn.commit()
+        return bool(updated)
+
+    def delete_entry(self, entry_id: int) -> bool:
+        """
+        Deletes one entry, and its conversation when it was the last one.
+
+        Returns:
+            True if the conversation still has entries afterwards.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT conversation_id FROM entries WHERE id = ?", (entry_id,)).fetchone()
+            if row is None:
+                return False
+            self._conn.execute("DELETE FROM entries WHERE id = ?", (entry_id,))
+            remaining = self._conn.execute(
+                "SELECT COUNT(*) FROM entries WHERE conversation_id = ?", (row["conversation_id"],)
+            ).fetchone()[0]
+            if not remaining:
+                self._conn.execute("DELETE FROM conversations WHERE id = ?", (row["conversation_id"],))
+            self._conn.commit()
+        return bool(remaining)
+
+    def delete_conversation(self, conversation_id: str) -> bool:
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,)).rowcount
+            self._conn.commit()
+        return bool(deleted)
+
+    def list_conversations(self, limit: int = 50, offset: int = 0) -> list[dict]:
+        """
+        Returns one page of conversations, most recent first.
+
+        Returns:
+            A list of {"filename", "display_name", "timestamp"} dictionaries, as the sidebar expects.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, initial_query, updated_at FROM conversations"
+                " ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?", (limit, offset)
+            ).fetchall()
+        return [{"filename": row["id"], "display_name": row["initial_query"], "timestamp": row["updated_at"]}
+                for row in rows]
+
+    def get_conversation(self, conversation_id: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, initial_query, updated_at FROM conversations WHERE id = ?", (conversation_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"filename": row["id"], "display_name": row["initial_query"], "timestamp": row["updated_at"]}
+
+    def count_conversations(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+    def get_entries(self, conversation_id: str) -> list[dict]:
+        """Returns the entries of a conversation in order, each with its 'entry_id'."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, data FROM entries WHERE conversation_id = ? ORDER BY id", (conversation_id,)
+            ).fetchall()
+        return [{**json.loads(row["data"]), "entry_id": row["id"]} for row in rows]
+
+    def search(self, query: str, limit: int = 10) -> list[dict]:
+        """
+        Full-text search over the queries, syntheses, sub-questions and sources of every entry.
+
+        Returns:
+            Up to `limit` matches, best first, as dictionaries with 'filename', 'display_name',
+            'entry_id', 'timestamp', 'full_query', 'snippet' and 'score' (higher is better).
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        if not self.fts_enabled:
+            return self._search_in_memory(query, limit)
+        match = " OR ".join(f'"{term}"' for term in terms)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT e.id AS entry_id, e.conversation_id, e.timestamp, c.initial_query,"
+                " json_extract(e.data, '$.full_query') AS full_query,"
+                f" bm25(entry_index, {_BM25_WEIGHTS}) AS rank,"
+                " snippet(entry_index, 1, '**', '**', '…', 16) AS snippet"
+                " FROM entry_index"
+                " JOIN entries e ON e.id = entry_index.rowid"
+                " JOIN conversations c ON c.id = e.conversation_id"
+                " WHERE entry_index MATCH ? ORDER BY rank LIMIT ?", (match, limit)
+            ).fetchall()
+        return [{"filename": row["conversation_id"], "display_name": row["initial_query"], "entry_id": row["entry_id"],
+                 "timestamp": row["timestamp"], "full_query": row["full_query"], "snippet": row["snippet"],
+                 "score": -row["rank"]} for row in rows]
+
+    def _search_in_memory(self, query: str, limit: int) -> list[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT e.id, e.conversation_id, e.timestamp, e.data, c.initial_query"
+                " FROM entries e JOIN conversations c ON c.id = e.conversation_id"
+            ).fetchall()
+        if not rows:
+            return []
+        entries = [json.loads(row["data"]) for row in rows]
+        index = BM25Index([
+            " ".join([entry.get("full_query") or ""] * 4 + [entry.get("result") or ""]
+                     + [json.dumps(entry.get("subqueries") or [], ensure_ascii=False)] * 2
+                     + [json.dumps(entry.get("sources_by_subquery") or [], ensure_ascii=False)])
+            for entry in entries
+        ])
+        scored = sorted(((index.score(query, i), i) for i in range(len(rows))), reverse=True)
+        return [{"filename": rows[i]["conversation_id"], "display_name": rows[i]["initial_query"],
+                 "entry_id": rows[i]["id"], "timestamp": rows[i]["timestamp"],
+                 "full_query": entries[i].get("full_query"), "snippet": (entries[i].get("result") or "")[:160] + "…",
+                 "score": score} for score, i in scored[:limit] if score > 0]
+
+    def find_near_duplicate(self, query: str) -> dict | None:
+        """
+        Looks for a past entry answering (almost) the same query.
+
+        A search match is a near-duplicate when its query shares at least
+        `history_duplicate_threshold` of the terms of `query` (Jaccard index), or, if an
+        embedding function is configured, when their cosine similarity reaches
+        `history_semantic_threshold`.
+
+        Returns:
+            The matching search result with an added 'similarity', or None.
+        """
+        query_terms = set(tokenize(query))
+        for match in self.search(query, limit=5):
+            match_terms = set(tokenize(match["full_query"] or ""))
+            if query_terms and match_terms:
+                similarity = len(query_terms & match_terms) / len(query_terms | match_terms)
+                if similarity >= history_duplicate_threshold:
+                    return {**match, "similarity": similarity}
+        if self.embed is not None:
+            return self._find_semantic_duplicate(query)
+        return None
+
+    def _find_semantic_duplicate(self, query: str) -> dict | None:
+        try:
+            self._index_missing_embeddings()
+            query_vector = self.embed([query])[0]
+        except Exception as e:
+            print(f"⚠️ Recherche sémantique dans l'historique indisponible : {e}")
+            return None
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT v.entry_id, v.vector, e.conversation_id, e.timestamp, c.initial_query,"
+                " json_extract(e.data, '$.full_query') AS full_query"
+                " FROM entry_embeddings v JOIN entries e ON e.id = v.entry_id"
+                " JOIN conversations c ON c.id = e.conversation_id"
+            ).fetchall()
+        best, best_similarity = None, history_semantic_threshold
+        for row in rows:
+            similarity = _cosine(query_vector, json.loads(row["vector"]))
+            if similarity >= best_similarity:
+                best, best_similarity = row, similarity
+        if best is None:
+            return None
+        return {"filename": best["conversation_id"], "display_name": best["initial_query"],
+                "entry_id": best["entry_id"], "timestamp": best["timestamp"], "full_query": best["full_query"],
+                "snippet": None, "score": best_similarity, "similarity": best_similarity}
+
+    def _index_missing_embeddings(self, batch_size: int = 32):
+        """Embeds the queries of the entries that have no vector yet."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, json_extract(data, '$.full_query') AS full_query FROM entries"
+                " WHERE id NOT IN (SELECT entry_id FROM entry_embeddings)"
+            ).fetchall()
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            vectors = self.embed([row["full_query"] or "" for row in batch])
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO entry_embeddings (entry_id, vector) VALUES (?, ?)",
+                    [(row["id"], json.dumps(vector)) for row, vector in zip(batch, vectors)]
+                )
+                self._conn.commit()
+
+    def migrate_json_directory(self, directory: str) -> int:
+        """
+        Imports the legacy JSON history files of `directory`, once. The files are left in place.
+
+        Returns:
+            The number of conversations imported (0 if the migration already ran).
+        """
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM migrations WHERE name = 'json_files'").fetchone():
+                return 0
+
+        imported = 0
+        for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except Exception:
+                # Skip corrupted or unreadable files
+                continue
+            entries = data["history"] if "history" in data else [data]
+            entries = [entry for entry in entries if isinstance(entry, dict) and entry.get("timestamp")]
+            if not entries:
+                continue
+            initial_query = (data.get("initial_query") or entries[0].get("display_query")
+                             or entries[0].get("full_query") or "Requête sans nom")
+            conversation_id = os.path.basename(path)
+            with self._lock:
+                if self._conn.execute("SELECT 1 FROM conversations WHERE id = ?", (conversation_id,)).fetchone():
+                    continue
+                self._conn.execute(
+                    "INSERT INTO conversations (id, initial_query, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                    (conversation_id, initial_query, conversation_id.split("_")[0] or entries[0]["timestamp"],
+                     entries[-1]["timestamp"])
+                )
+                for entry in entries:
+                    self._insert_entry(conversation_id, entry)
+                self._conn.commit()
+            imported += 1
+
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO migrations (name) VALUES ('json_files')")
+            self._conn.commit()
+        return imported
+
+
+def _cosine(a: list[float], b: list[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
@@ -0,0 +1,69 @@
+"""
+Client of research_server.py, exposing the same interface as the local workflow functions.
+"""
+import time
+
+import requests
+
+
+def fetch_remote_steps(base_url: str, timeout: float = 30) -> list[str]:
+    """Returns the names of the workflow steps (the server's ALL_STEPS)."""
+    response = requests.get(f"{base_url.rstrip('/')}/steps", timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+def generate_remote_subqueries(base_url: str, query: str, k_pick: int, progress_callback, timeout: float = 120) -> list[str]:
+    """Remote equivalent of `generate_subqueries_for_ui`."""
+    progress_callback(10, "Génération des sous-recherches par l'IA", 1)
+    response = requests.post(f"{base_url.rstrip('/')}/subqueries", json={"query": query, "k": k_pick}, timeout=timeout)
+    response.raise_for_status()
+    return response.json()["subqueries"]
+
+
+def perform_remote_research(base_url: str, query: str, subqueries: list[str], n_results: int, progress_callback,
+                            token_callback=None, mode: str | None = None, prior_result: dict | None = None,
+                            poll_interval: float = 1.0) -> dict:
+    """
+    Remote equivalent of `perform_full_research`: submits the job, then polls it and replays its
+    progress and partial synthesis through the callbacks, from the calling thread.
+
+    Returns:
+        The result dictionary of the research.
+
+    Raises:
+        RuntimeError: If the research failed on the server.
+    """
+    base_url = base_url.rstrip("/")
+    payload = {"query": query, "subqueries": subqueries, "n_results": n_results}
+    if mode:
+        payload["mode"] = mode
+    if prior_result:
+        payload["prior_result"] = prior_result
+    response = requests.post(f"{base_url}/jobs", json=payload, timeout=30)
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
+
+    last_progress = None
+    streamed = {"attempt": 0, "length": 0}
+    while True:
+        response = requests.get(f"{base_url}/jobs/{job_id}", timeout=30)
+        response.raise_for_status()
+        job = response.json()
+        if job["status"] == "done":
+            return job["result"]
+        if job["status"] == "error":
+            raise RuntimeError(job.get("error") or "La recherche a échoué sur le serveur.")
+
+        progress = (job["progress"], job["message"], job["step"])
+        if job["message"] and progress != last_progress:
+            last_progress = progress
+            progress_callback(*progress)
+        if token_callback and job.get("synthesis"):
+            if job["attempt"] != streamed["attempt"]:
+                streamed.update(attempt=job["attempt"], length=0)
+            fragment = job["synthesis"][streamed["length"]:]
+            if fragment:
+                streamed["length"] = len(job["synthesis"])
+                token_callback(fragment, job["attempt"])
+        time.sleep(poll_interval)
@@ -0,0 +1,311 @@
+"""
+Local research server: runs perform_full_research in a shared worker pool behind a small
+HTTP API, so the Streamlit sessions (or any client) do not each run the pipeline and their
+own Chromes.
+
+Lancement :
+    uvicorn research_server:app --port 8000
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from agent.main_workflow import generate_subqueries_for_ui, perform_full_research, ALL_STEPS
+from agent.driver_pool import shutdown_driver_pool
+from agent.config import research_mode, server_max_concurrent_jobs, server_max_queued_jobs, server_db_path
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class QueueFullError(Exception):
+    """Raised when the number of queued and running jobs reaches the configured cap."""
+
+
+class JobStore:
+    """
+    SQLite table of research jobs: parameters, status, progress and result.
+
+    Progress and the partial synthesis change many times per second, so they are kept in
+    memory while a job runs and only written to the table when the step changes.
+    """
+
+    def __init__(self, path: str = server_db_path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " dedupe_key TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " query TEXT NOT NULL,"
+            " subqueries TEXT NOT NULL,"
+            " n_results INTEGER NOT NULL,"
+            " mode TEXT NOT NULL,"
+            " progress INTEGER NOT NULL DEFAULT 0,"
+            " message TEXT,"
+            " step INTEGER NOT NULL DEFAULT 0,"
+            " result TEXT,"
+            " error TEXT,"
+            " created_at REAL NOT NULL,"
+            " started_at REAL,"
+            " finished_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_dedupe ON jobs (dedupe_key, status)")
+        self._conn.commit()
+        self._live = {}  # job_id -> {"progress", "message", "step", "synthesis", "attempt"}
+
+    def create(self, dedupe_key: str, query: str, subqueries: list[str], n_results: int, mode: str) -> tuple[str, bool]:
+        """
+        Creates a queued job, unless an identical one is already queued or running.
+
+        Returns:
+            A tuple (job_id, created). `created` is False when an in-flight job was reused.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE dedupe_key = ? AND status IN (?, ?)", (dedupe_key, *ACTIVE_STATUSES)
+            ).fetchone()
+            if row is not None:
+                return row["id"], False
+            job_id = uuid.uuid4().hex
+            self._conn.execute(
+                "INSERT INTO jobs (id, dedupe_key, status, query, subqueries, n_results, mode, created_at)"
+                " VALUES (?, ?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, dedupe_key, query, json.dumps(subqueries, ensure_ascii=False), n_results, mode, time.time())
+            )
+            self._conn.commit()
+            return job_id, True
+
+    def count_active(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", ACTIVE_STATUSES
+            ).fetchone()[0]
+
+    def active_jobs(self) -> list[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY created_at", ACTIVE_STATUSES
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def mark_running(self, job_id: str):
+        with self._lock:
+            self._live[job_id] = {"progress": 0, "message": None, "step": 0, "synthesis": "", "attempt": 0}
+            self._conn.execute("UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?", (time.time(), job_id))
+            self._conn.commit()
+
+    def update_progress(self, job_id: str, progress: int, message: str, step: int):
+        with self._lock:
+            live = self._live.setdefault(job_id, {"synthesis": "", "attempt": 0})
+            step_changed = live.get("step") != step
+            live.update(progress=progress, message=message, step=step)
+            if step_changed:
+                self._conn.execute("UPDATE jobs SET progress = ?, message = ?, step = ? WHERE id = ?",
+                                   (progress, message, step, job_id))
+                self._conn.commit()
+
+    def append_synthesis(self, job_id: str, fragment: str, attempt: int):
+        with self._lock:
+            live = self._live.setdefault(job_id, {"synthesis": "", "attempt": 0})
+            if attempt != live["attempt"]:
+                live.update(synthesis="", attempt=attempt)
+            live["synthesis"] += fragment
+
+    def finish(self, job_id: str, result: dict | None = None, error: str | None = None):
+        with self._lock:
+            self._live.pop(job_id, None)
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, progress = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                ("done" if error is None else "error", 100 if error is None else 0,
+                 json.dumps(result, ensure_ascii=False) if result is not None else None, error, time.time(), job_id)
+            )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            live = dict(self._live.get(job_id, {}))
+        if row is None:
+            return None
+        job = self._row_to_dict(row)
+        if live:
+            job.update(progress=live.get("progress", job["progress"]), message=live.get("message") or job["message"],
+                       step=live.get("step", job["step"]), synthesis=live["synthesis"], attempt=live["attempt"])
+        return job
+
+    @staticmethod
+    def _row_to_dict(row) -> dict:
+        job = dict(row)
+        job["subqueries"] = json.loads(job["subqueries"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job.pop("dedupe_key")
+        return job
+
+
+class ResearchService:
+    """
+    Runs research jobs on a bounded worker pool shared by every client.
+
+    At most `max_concurrent_jobs` researches run at once (each one also shares the process-wide
+    driver pool and Mistral rate limits), and submissions are refused beyond `max_queued_jobs`.
+    """
+
+    def __init__(self, store: JobStore, max_concurrent_jobs: int = server_max_concurrent_jobs,
+                 max_queued_jobs: int = server_max_queued_jobs):
+        self.store = store
+        self.max_queued_jobs = max_queued_jobs
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrent_jobs, thread_name_prefix="research")
+        self._submit_lock = threading.Lock()
+
+    @staticmethod
+    def dedupe_key(query: str, subqueries: list[str], n_results: int, mode: str) -> str:
+        payload = json.dumps([query.strip(), subqueries, n_results, mode], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def submit(self, query: str, subqueries: list[str], n_results: int, mode: str,
+               prior_result: dict | None = None) -> tuple[str, bool]:
+        """
+        Queues a research. Returns (job_id, deduplicated).
+
+        `prior_result` is the warm start of a refinement. It is not persisted: a job resumed
+        after a restart runs from scratch.
+        """
+        with self._submit_lock:
+            key = self.dedupe_key(query, subqueries, n_results, mode)
+            if self.store.count_active() >= self.max_queued_jobs:
+                raise QueueFullError("Trop de recherches en attente, réessayez plus tard.")
+            job_id, created = self.store.create(key, query, subqueries, n_results, mode)
+        if created:
+            self.executor.submit(self._run, job_id, query, subqueries, n_results, mode, prior_result)
+        return job_id, not created
+
+    def resume_pending(self):
+        """Requeues the jobs left queued or running by a previous server process."""
+        for job in self.store.active_jobs():
+            print(f"♻️ Reprise de la recherche {job['id']} : {job['query']}")
+            self.executor.submit(self._run, job["id"], job["query"], job["subqueries"], job["n_results"], job["mode"])
+
+    def _run(self, job_id: str, query: str, subqueries: list[str], n_results: int, mode: str,
+             prior_result: dict | None = None):
+        self.store.mark_running(job_id)
+        try:
+            result = perform_full_research(
+                query, subqueries, n_results,
+                lambda percentage, message, step: self.store.update_progress(job_id, percentage, message, step),
+                mode=mode,
+                token_callback=lambda fragment, attempt: self.store.append_synthesis(job_id, fragment, attempt),
+                prior_result=prior_result
+            )
+            self.store.finish(job_id, result=result)
+        except Exception as e:
+            print(f"❌ Échec de la recherche {job_id} : {e}")
+            self.store.finish(job_id, error=str(e))
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        shutdown_driver_pool()
+
+
+class ResearchRequest(BaseModel):
+    query: str
+    subqueries: list[str]
+    n_results: int = 2
+    mode: str = research_mode
+    prior_result: dict | None = None
+
+
+class SubqueriesRequest(BaseModel):
+    query: str
+    k: int = 3
+
+
+app = FastAPI(title="Research server")
+service = ResearchService(JobStore())
+
+
+@app.on_event("startup")
+def _startup():
+    service.resume_pending()
+
+
+@app.on_event("shutdown")
+def _shutdown():
+    service.shutdown()
+
+
+@app.get("/steps")
+def list_steps() -> list[str]:
+    """Names of the workflow steps, indexed by the 'step' field of the jobs."""
+    return ALL_STEPS
+
+
+@app.post("/subqueries")
+def create_subqueries(request: SubqueriesRequest) -> dict:
+    """Generates the sub-questions of a query (short call, answered synchronously)."""
+    return {"subqueries": generate_subqueries_for_ui(request.query, request.k, lambda *args: None)}
+
+
+@app.post("/jobs", status_code=202)
+def submit_job(request: ResearchRequest) -> dict:
+    if request.mode not in ("sync", "async"):
+        raise HTTPException(status_code=422, detail=f"Mode de recherche inconnu : {request.mode}")
+    if not request.subqueries:
+        raise HTTPException(status_code=422, detail="Aucune sous-question fournie.")
+    try:
+        job_id, deduplicated = service.submit(request.query, request.subqueries, request.n_results, request.mode,
+                                                 request.prior_result)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return {"job_id": job_id, "deduplicated": deduplicated}
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str) -> dict:
+    job = service.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Recherche inconnue.")
+    return job
+
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job(job_id: str, poll_interval: float = 0.5):
+    """Server-sent events: 'progress' on each change, then a final 'done' or 'error' event with the job."""
+    if service.store.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Recherche inconnue.")
+
+    async def events():
+        last = None
+        while True:
+            job = service.store.get(job_id)
+            if job["status"] not in ACTIVE_STATUSES:
+                yield f"event: {job['status']}\ndata: {json.dumps(job, ensure_ascii=False)}\n\n"
+                return
+            snapshot = {key: job.get(key) for key in ("status", "progress", "message", "step", "synthesis", "attempt")}
+            if snapshot != last:
+                last = snapshot
+                yield f"event: progress\ndata: {json.dumps(snapshot, ensure_ascii=False)}\n\n"
+            await asyncio.sleep(poll_interval)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host=os.environ.get("RESEARCH_SERVER_HOST", "127.0.0.1"),
+                port=int(os.environ.get("RESEARCH_SERVER_PORT", "8000")))
@@ -1,6 +1,20 @@
 import os
 import argparse
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from agent.main_workflow import generate_subqueries_for_ui, perform_full_research, ALL_STEPS
+from agent.driver_pool import get_driver_pool, shutdown_driver_pool
+from agent.http_fetch import tier_stats
+from agent.page_cache import get_page_cache
+from agent.llm_cache import get_llm_cache
+from agent.document_processing import token_savings
+from agent.evidence_pack import build_evidence_pack, link_citations
+from agent.config import research_mode, batch_max_concurrent_queries
+from agent.tracing import tracer, start_trace
 
 def progress_callback(percentage: int, message: str, step_index: int):
     """
@@ -9,23 +23,257 @@ def progress_callback(percentage: int, message: str, step_index: int):
     total_steps = len(ALL_STEPS)
     print(f"[{percentage}%] Étape {step_index + 1}/{total_steps}: {message}")
 
+def make_token_printer():
+    """
+    Crée une fonction de rappel qui affiche la synthèse au fil de sa génération.
+    Retourne la fonction et un dictionnaire contenant le dernier brouillon affiché.
+    """
+    streamed = {"attempt": 0, "text": ""}
+
+    def token_callback(fragment: str, attempt: int):
+        if attempt != streamed["attempt"]:
+            streamed["attempt"] = attempt
+            streamed["text"] = ""
+            print(f"\n## Synthèse (génération en direct, tentative {attempt})\n")
+        streamed["text"] += fragment
+        print(fragment, end="", flush=True)
+
+    return token_callback, streamed
+
+def print_synthesis_metrics(metrics: dict):
+    """
+    Affiche le temps jusqu'au premier token et la durée de génération de la synthèse.
+    """
+    if not metrics:
+        return
+    print("\n## Synthèse")
+    if metrics.get("synthesis_ttft") is not None:
+        print(f"- Premier token : {metrics['synthesis_ttft']:.2f}s")
+    print(f"- Génération : {metrics['synthesis_seconds']:.2f}s (tentatives : {metrics['synthesis_attempts']})")
+    print(f"- Réparations ciblées : {metrics.get('synthesis_repairs', 0)}")
+
+def print_profile(summary: dict):
+    """
+    Affiche le temps passé par étape (spans agrégés par nom), du plus coûteux au moins coûteux.
+    """
+    print("\n## Profil d'exécution")
+    print(f"{'étape':<28} {'appels':>6} {'total (s)':>10} {'moy. (s)':>9} {'max (s)':>8} {'tokens in/out':>15} {'cache':>6} {'retries':>7}")
+    for name, entry in sorted(summary.items(), key=lambda item: item[1]["total_seconds"], reverse=True):
+        tokens = f"{entry.get('tokens_in', 0)}/{entry.get('tokens_out', 0)}" if "tokens_in" in entry else "-"
+        print(f"{name:<28} {entry['count']:>6} {entry['total_seconds']:>10.2f} {entry['avg_seconds']:>9.2f} "
+              f"{entry['max_seconds']:>8.2f} {tokens:>15} {entry.get('cache_hits', 0):>6} {entry.get('retries', 0):>7}")
+
+def print_pool_metrics():
+    """
+    Affiche les métriques du pool de drivers Selenium.
+    """
+    metrics = get_driver_pool().metrics()
+    print("\n## Pool de drivers")
+    print(f"- Emprunts : {metrics['borrows']} (taux de réutilisation : {metrics['hit_rate']:.0%})")
+    print(f"- Lancements de Chrome : {metrics['launches']} (recyclés : {metrics['recycled']}, défaillants : {metrics['unhealthy']})")
+    print(f"- Attente moyenne d'un driver : {metrics['avg_borrow_wait']:.2f}s")
+
+def print_tier_stats():
+    """
+    Affiche le nombre de pages et la latence moyenne par niveau de récupération (HTTP / Selenium).
+    """
+    print("\n## Niveaux de récupération des pages")
+    summary = tier_stats.summary()
+    if not summary:
+        print("- Aucune page récupérée.")
+    for tier, stats in summary.items():
+        line = f"- {tier} : {stats['count']} page(s), {stats['avg_seconds']:.2f}s en moyenne"
+        if stats.get("measured_pages"):
+            line += f", {stats['transfer_bytes'] / stats['measured_pages'] / 1024:.0f} Ko transférés par page"
+        print(line)
+
+def print_page_cache_stats():
+    """
+    Affiche les compteurs du cache de pages.
+    """
+    page_cache = get_page_cache()
+    if page_cache is None:
+        return
+    stats = page_cache.stats()
+    lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+    hit_rate = (stats['hits'] + stats['stale_hits']) / lookups if lookups else 0.0
+    print("\n## Cache de pages")
+    print(f"- Succès : {stats['hits']} frais + {stats['stale_hits']} périmés, échecs : {stats['misses']} (taux : {hit_rate:.0%})")
+    print(f"- Écritures : {stats['writes']}, évictions : {stats['evictions']}")
+
+def print_llm_cache_stats():
+    """
+    Affiche les compteurs du cache de réponses du modèle.
+    """
+    llm_cache = get_llm_cache()
+    if llm_cache is None:
+        return
+    stats = llm_cache.stats()
+    print("\n## Cache des réponses du modèle")
+    print(f"- Succès : {stats['hits']}, échecs : {stats['misses']}, écritures : {stats['writes']}, évictions : {stats['evictions']}")
+
+def print_token_savings():
+    """
+    Affiche les tokens économisés par le nettoyage et le découpage des documents.
+    """
+    stats = token_savings.summary()
+    print("\n## Réduction des documents envoyés au modèle")
+    print(f"- Documents préparés : {stats['documents']} (dont découpés : {stats['chunked_documents']})")
+    print(f"- Tokens estimés : {stats['tokens_before']} -> {stats['tokens_after']} ({stats['tokens_saved']} économisés)")
+
+def finish_run(profile: bool):
+    """
+    Ferme le pool de drivers puis enregistre la trace de l'exécution (et l'affiche avec --profile).
+    """
+    shutdown_driver_pool()
+    if tracer.active:
+        tracer.stop()
+        if profile:
+            print_profile(tracer.summary())
+        print(f"\n🧭 Trace enregistrée dans {tracer.save()}")
+
+def batch_entry_id(entry: dict) -> str:
+    """
+    Identifiant stable d'une entrée du lot : son champ 'id' s'il existe, sinon une empreinte
+    de la question et des paramètres, pour pouvoir reprendre un lot interrompu.
+    """
+    if entry.get("id"):
+        return str(entry["id"])
+    payload = json.dumps([entry["query"], entry.get("k"), entry.get("n"), entry.get("subqueries")], ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+def load_batch(path: str) -> list[dict]:
+    """
+    Lit un fichier JSONL de recherches : une ligne par objet {"query", "id"?, "k"?, "n"?, "mode"?, "subqueries"?}.
+    """
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if not entry.get("query"):
+                raise ValueError(f"Ligne {line_number} de {path} : champ 'query' manquant.")
+            entries.append(entry)
+    return entries
+
+def load_completed_ids(output_path: str) -> set:
+    """
+    Renvoie les identifiants déjà terminés avec succès dans le fichier de résultats.
+    Une dernière ligne tronquée (arrêt brutal) est ignorée.
+    """
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("status") == "ok":
+                completed.add(record.get("id"))
+    return completed
+
+def run_batch(args):
+    """
+    Exécute toutes les recherches d'un fichier JSONL dans un seul processus.
+
+    Le pool de drivers, le client Mistral, ses limites de débit et les caches sont partagés,
+    et au plus `--batch-workers` recherches tournent en même temps. Chaque résultat est ajouté
+    au fichier de sortie dès qu'il est prêt ; relancer la même commande reprend le lot en
+    sautant les recherches déjà réussies.
+    """
+    entries = load_batch(args.batch)
+    output_path = args.output or f"{os.path.splitext(args.batch)[0]}.results.jsonl"
+    completed = load_completed_ids(output_path)
+    pending = [entry for entry in entries if batch_entry_id(entry) not in completed]
+    print(f"📦 Lot {args.batch} : {len(entries)} recherche(s), {len(entries) - len(pending)} déjà terminée(s), "
+          f"{len(pending)} à lancer avec {args.batch_workers} en parallèle. Résultats : {output_path}")
+    if not pending:
+        return
+
+    write_lock = threading.Lock()
+    counts = {"ok": 0, "error": 0}
+
+    def write_record(record: dict):
+        with write_lock:
+            with open(output_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            counts[record["status"]] += 1
+            print(f"📝 [{counts['ok'] + counts['error']}/{len(pending)}] {record['id']} : {record['status']} "
+                  f"({record['seconds']:.1f}s)")
+
+    def run_entry(entry: dict):
+        entry_id = batch_entry_id(entry)
+        k = entry.get("k", args.subqueries)
+        n = entry.get("n", args.results_per_subquery)
+
+        def entry_progress(percentage: int, message: str, step_index: int):
+            print(f"[{entry_id}] [{percentage}%] {message}")
+
+        start = time.monotonic()
+        record = {"id": entry_id, "query": entry["query"], "k": k, "n": n}
+        try:
+            subqs = entry.get("subqueries") or generate_subqueries_for_ui(entry["query"], k, entry_progress)
+            if not subqs:
+                raise ValueError("Aucune sous-question générée.")
+            result = perform_full_research(entry["query"], subqs, n, entry_progress, mode=entry.get("mode", args.mode))
+            record.update(status="ok", result=result)
+        except Exception as e:
+            record.update(status="error", error=str(e))
+        record.update(seconds=round(time.monotonic() - start, 3), finished_at=datetime.now().isoformat())
+        write_record(record)
+
+    with ThreadPoolExecutor(max_workers=args.batch_workers) as executor:
+        list(executor.map(run_entry, pending))
+    print(f"\n📦 Lot terminé : {counts['ok']} réussie(s), {counts['error']} en échec.")
+
 def main():
     parser = argparse.ArgumentParser(description="Effectue une recherche approfondie en utilisant l'IA.")
-    parser.add_argument("query", type=str, help="La question principale de la recherche.")
+    parser.add_argument("query", type=str, nargs="?", help="La question principale de la recherche.")
     parser.add_argument("-k", "--subqueries", type=int, default=3,
                         help="Nombre de sous-questions à générer (par défaut: 3).")
     parser.add_argument("-n", "--results_per_subquery", type=int, default=2,
                         help="Nombre de résultats pertinents à collecter par sous-question (par défaut: 2).")
+    parser.add_argument("--mode", choices=["sync", "async"], default=research_mode,
+                        help=f"Mode d'exécution du pipeline de recherche (par défaut: {research_mode}).")
+    parser.add_argument("--profile", action="store_true",
+                        help="Affiche le temps, les tokens, les succès de cache et les nouvelles tentatives par étape.")
+    parser.add_argument("--batch", metavar="FICHIER.jsonl",
+                        help="Lance toutes les recherches d'un fichier JSONL (une question par ligne) au lieu de 'query'.")
+    parser.add_argument("--output", metavar="FICHIER.jsonl",
+                        help="Fichier de résultats du lot (par défaut : <lot>.results.jsonl). Relancer reprend le lot.")
+    parser.add_argument("--batch-workers", type=int, default=batch_max_concurrent_queries,
+                        help=f"Nombre de recherches du lot menées en parallèle (par défaut: {batch_max_concurrent_queries}).")
     args = parser.parse_args()
+    if not args.query and not args.batch:
+        parser.error("indiquez une question ou --batch FICHIER.jsonl")
 
     if not os.environ.get("MISTRAL_API_KEY"):
         print("Erreur : La variable d'environnement MISTRAL_API_KEY n'est pas définie.")
         print("Veuillez la définir avant de lancer le script (e.g., export MISTRAL_API_KEY='votre_clé').")
         return
 
+    if args.batch:
+        start_trace(f"batch:{args.batch}")
+        try:
+            run_batch(args)
+            print_page_cache_stats()
+            print_llm_cache_stats()
+            print_tier_stats()
+            print_pool_metrics()
+        finally:
+            finish_run(args.profile)
+        return
+
     print(f"🚀 Démarrage de la recherche pour : '{args.query}'")
     print(f"⚙️ Paramètres : {args.subqueries} sous-questions, {args.results_per_subquery} résultats par sous-question.")
 
+    start_trace(args.query)
     try:
         print("\n--- Génération des sous-questions ---")
         subqs = generate_subqueries_for_ui(args.query, args.subqueries, progress_callback)
@@ -35,16 +283,23 @@ def main():
             return
 
         print("\n--- Lancement de la recherche complète ---")
+        token_callback, streamed = make_token_printer()
         final_output = perform_full_research(
             args.query,
             subqs,
             args.results_per_subquery,
-            progress_callback
+            progress_callback,
+            mode=args.mode,
+            token_callback=token_callback
         )
 
         print("\n--- 🎉 Recherche Terminée 🎉 ---")
-        print("\n## Synthèse Finale")
-        print(final_output['synthèse'])
+        # La synthèse a déjà été affichée pendant sa génération, sauf si elle diffère du dernier brouillon.
+        # Le brouillon reçoit les mêmes liens de citations que la synthèse finale avant la comparaison.
+        source_urls = build_evidence_pack(final_output.get('documents', []))[1]
+        if final_output['synthèse'] != link_citations(streamed["text"].strip(), source_urls):
+            print("\n## Synthèse Finale")
+            print(final_output['synthèse'])
 
         print("\n## Sous-questions explorées")
         for i, sq in enumerate(final_output['sous_questions']):
@@ -59,8 +314,17 @@ def main():
             else:
                 print("- Aucune URL pertinente trouvée pour cette sous-question.")
 
+        print_synthesis_metrics(final_output.get('métriques'))
+        print_token_savings()
+        print_page_cache_stats()
+        print_llm_cache_stats()
+        print_tier_stats()
+        print_pool_metrics()
+
     except Exception as e:
         print(f"\n❌ Une erreur inattendue est survenue : {e}")
+    finally:
+        finish_run(args.profile)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
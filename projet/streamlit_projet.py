@@ -1,33 +1,59 @@
 import os
 import streamlit as st
 import hashlib
-import json
 from datetime import datetime
 #from agent.deep_research import generate_subqueries_for_ui, perform_full_research, ALL_STEPS
 
 import sys
+import functools
 sys.path.append(os.path.dirname(__file__))
-from agent.main_workflow import generate_subqueries_for_ui, perform_full_research, ALL_STEPS
+
+# Si RESEARCH_SERVER_URL est défini, l'application est un client léger de research_server.py :
+# les recherches tournent dans le pool partagé du serveur au lieu du thread de la session.
+RESEARCH_SERVER_URL = os.environ.get("RESEARCH_SERVER_URL")
+if RESEARCH_SERVER_URL:
+    from research_client import fetch_remote_steps, generate_remote_subqueries, perform_remote_research
+    ALL_STEPS = fetch_remote_steps(RESEARCH_SERVER_URL)
+    generate_subqueries_for_ui = functools.partial(generate_remote_subqueries, RESEARCH_SERVER_URL)
+    perform_full_research = functools.partial(perform_remote_research, RESEARCH_SERVER_URL)
+else:
+    from agent.main_workflow import generate_subqueries_for_ui, perform_full_research, ALL_STEPS
+from history_store import HistoryStore
+from agent.config import history_embeddings_enabled, warm_start_similarity
+from agent.text_utils import closest_text
 import pyperclip
 from streamlit.components.v1 import html
 
 # --- Constants ---
 HISTORY_DIR = "historique"
+HISTORY_DB_PATH = os.path.join(HISTORY_DIR, "history.sqlite3")
+HISTORY_PAGE_SIZE = 50
 os.makedirs(HISTORY_DIR, exist_ok=True)
 
+
+@st.cache_resource
+def get_history_store():
+    """Opens the history database once per server process, importing the legacy JSON files on first use."""
+    embed = None
+    if history_embeddings_enabled and not RESEARCH_SERVER_URL:
+        from agent.mistral_client import embed_texts
+        embed = embed_texts
+    store = HistoryStore(HISTORY_DB_PATH, embed=embed)
+    imported = store.migrate_json_directory(HISTORY_DIR)
+    if imported:
+        print(f"📚 {imported} historique(s) JSON importé(s) dans {HISTORY_DB_PATH}")
+    return store
+
+
 # --- Utility Functions ---
 def hash_query(query, k, n, timestamp):
     """Generates an MD5 hash for a given query and parameters."""
     return hashlib.md5(f"{query}-{k}-{n}-{timestamp}".encode()).hexdigest()
 
 
-def save_history_entry(full_query, k, n, result, display_query, filename=None):
-    """
-    Saves a new history entry or updates an existing one.
-    If filename is provided, it updates the file. Otherwise, it creates a new file.
-    """
-    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-    history_entry = {
+def build_history_entry(full_query, k, n, result, display_query):
+    """Builds the history record of a research result."""
+    return {
         "full_query": full_query,
         "display_query": display_query,
         "k": k,
@@ -35,56 +61,64 @@ def save_history_entry(full_query, k, n, result, display_query, filename=None):
         "result": result["synthèse"],
         "subqueries": result["sous_questions"],
         "sources_by_subquery": result["sources"],
-        "timestamp": timestamp,
+        "documents": result.get("documents", []),
+        "timestamp": datetime.now().strftime("%Y%m%d-%H%M%S"),
     }
 
+
+def save_history_entry(full_query, k, n, result, display_query, filename=None):
+    """
+    Saves a new history entry or updates an existing one.
+    If filename (the conversation id) is provided, the entry is appended to that conversation.
+    Otherwise, a new conversation is created.
+    """
+    history_entry = build_history_entry(full_query, k, n, result, display_query)
+    store = get_history_store()
+
     if filename:
-        filepath = os.path.join(HISTORY_DIR, filename)
-        try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        except FileNotFoundError:
+        if not store.append_entry(filename, history_entry):
             st.session_state.error_message = "Fichier d'historique non trouvé pour la mise à jour."
             return None
+        return filename
 
-        if "history" not in data:
-            data = {"history": [data]}  # Convert old format to new list format
-        data["history"].append(history_entry)
+    key = hash_query(full_query, k, n, history_entry["timestamp"])
+    filename = f"{history_entry['timestamp']}_{key[:6]}"
+    return store.create_conversation(filename, display_query, history_entry)
 
-    else:
-        key = hash_query(full_query, k, n, timestamp)
-        filename = f"{timestamp}_{key[:6]}.json"
-        filepath = os.path.join(HISTORY_DIR, filename)
-        data = {"initial_query": display_query, "history": [history_entry]}
-
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    return filename
-
-
-def load_all_histories():
-    """Loads metadata for all saved history files."""
-    entries = []
-    for filename in sorted(os.listdir(HISTORY_DIR), reverse=True):
-        if filename.endswith(".json"):
-            path = os.path.join(HISTORY_DIR, filename)
-            try:
-                with open(path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    display_name = data.get("initial_query")
-                    if not display_name and "history" in data and len(data["history"]) > 0:
-                        display_name = data["history"][0].get('display_query', data["history"][0].get('full_query'))
-
-                    if display_name:
-                        entries.append({
-                            "filename": filename,
-                            "display_name": display_name,
-                            "timestamp": data.get("history", [{}])[-1].get("timestamp", "")
-                        })
-            except Exception:
-                # Skip corrupted or unreadable files
-                continue
-    return entries
+
+def build_prior_result(filename):
+    """
+    Gathers the validated documents and sources of a conversation, most recent entries first,
+    so a refinement can reuse them as a warm start instead of researching everything again.
+    """
+    entries = get_history_store().get_entries(filename)
+    documents, sources, seen_urls = [], [], set()
+    for entry in reversed(entries):
+        for doc in entry.get("documents", []):
+            if doc.get("url") not in seen_urls:
+                seen_urls.add(doc.get("url"))
+                documents.append(doc)
+        sources.extend(entry.get("sources_by_subquery", []))
+    return {"documents": documents, "sources": sources}
+
+
+def reuse_previous_subqueries(generated_subqueries, filename):
+    """
+    Replaces each generated sub-question close to one of the conversation with the previous
+    wording, so the refinement visibly reuses the documents already validated for it.
+    """
+    previous = [sq for entry in reversed(get_history_store().get_entries(filename))
+                for sq in entry.get("subqueries", [])]
+    subqueries = []
+    for sq in generated_subqueries:
+        match = closest_text(sq, [p for p in previous if p not in subqueries], warm_start_similarity)
+        subqueries.append(match or sq)
+    return subqueries
+
+
+def load_all_histories(page=0):
+    """Loads the metadata of one page of saved conversations, most recent first."""
+    return get_history_store().list_conversations(limit=HISTORY_PAGE_SIZE, offset=page * HISTORY_PAGE_SIZE)
 
 
 def load_full_history_by_filename(filename):
@@ -93,25 +127,16 @@ def load_full_history_by_filename(filename):
         st.session_state.error_message = "Nom de fichier d'historique manquant. Impossible de charger."
         return []
 
-    filepath = os.path.join(HISTORY_DIR, filename)
-    if os.path.exists(filepath):
-        try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                if "history" in data:
-                    return data["history"]
-                return [data]  # Handle older single-entry files
-        except Exception:
-            st.session_state.error_message = f"Erreur de lecture du fichier d'historique : {filename}. Il est peut-être corrompu."
-            return []
-    st.session_state.error_message = f"Fichier d'historique non trouvé : {filename}. Il a peut-être été supprimé."
-    return []
+    entries = get_history_store().get_entries(filename)
+    if not entries:
+        st.session_state.error_message = f"Fichier d'historique non trouvé : {filename}. Il a peut-être été supprimé."
+    return entries
 
 
 def delete_history_file(filename):
     """Deletes a history file."""
     try:
-        os.remove(os.path.join(HISTORY_DIR, filename))
+        get_history_store().delete_conversation(filename)
         st.success(f"🗑️ Historique supprimé : {filename}")
         # Reset session state for a clean start after deletion
         st.session_state.current_step = 0
@@ -126,30 +151,21 @@ def delete_history_file(filename):
 
 def delete_single_history_entry(filename, index_to_delete):
     """Deletes a specific entry from a history file."""
-    filepath = os.path.join(HISTORY_DIR, filename)
-    try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    except FileNotFoundError:
+    entries = get_history_store().get_entries(filename)
+    if not entries:
         st.session_state.error_message = "Fichier d'historique non trouvé pour la suppression."
         st.rerun()
         return
 
-    if "history" not in data:
-        data = {"history": [data]}
-
-    if not (0 <= index_to_delete < len(data["history"])):
+    if not (0 <= index_to_delete < len(entries)):
         st.session_state.error_message = "Index de synthèse invalide pour la suppression."
         st.rerun()
         return
 
-    del data["history"][index_to_delete]
-
-    if not data["history"]:  # If no entries left, delete the file
+    if len(entries) == 1:  # If no entries left, delete the file
         delete_history_file(filename)
     else:
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        get_history_store().delete_entry(entries[index_to_delete]["entry_id"])
         st.success("🗑️ Synthèse supprimée !")
         st.session_state.error_message = None # Clear any error
         st.query_params["entry"] = filename
@@ -157,20 +173,14 @@ def delete_single_history_entry(filename, index_to_delete):
 
 def regenerate_and_replace_history(filename, index_to_replace, original_query, original_k, original_n,
                                    original_display_query, original_subqueries):
-    filepath = os.path.join(HISTORY_DIR, filename)
-    try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    except FileNotFoundError:
+    entries = get_history_store().get_entries(filename)
+    if not entries:
         st.session_state.error_message = "Fichier d'historique non trouvé pour la régénération."
         st.session_state.current_step = 3 # Stay on history page
         st.rerun()
         return
 
-    if "history" not in data:
-        data = {"history": [data]}
-
-    if not (0 <= index_to_replace < len(data["history"])):
+    if not (0 <= index_to_replace < len(entries)):
         st.session_state.error_message = "Index de synthèse invalide pour la régénération."
         st.session_state.current_step = 3 # Stay on history page
         st.rerun()
@@ -181,6 +191,7 @@ def regenerate_and_replace_history(filename, index_to_replace, original_query, o
     progress_bar = progress_container.progress(0)
     progress_status_text = progress_container.empty()
     steps_display_container = progress_container.empty()
+    synthesis_stream_container = progress_container.empty()
 
     # Pass ALL_STEPS to the callback as it's no longer an instance variable
     def update_progress_for_regeneration(percentage, status_message, current_step_idx):
@@ -203,7 +214,8 @@ def regenerate_and_replace_history(filename, index_to_replace, original_query, o
             query=original_query,
             subqueries=original_subqueries, # Use the stored subqueries directly
             n_results=original_n,
-            progress_callback=update_progress_for_regeneration
+            progress_callback=update_progress_for_regeneration,
+            token_callback=make_synthesis_stream_ui(synthesis_stream_container)
         )
 
         if result is None or not result["synthèse"]: # Check if synthesis is empty
@@ -212,19 +224,10 @@ def regenerate_and_replace_history(filename, index_to_replace, original_query, o
             st.rerun()
             return
 
-        data["history"][index_to_replace] = {
-            "full_query": original_query,
-            "display_query": original_display_query,
-            "k": len(original_subqueries), # K is now based on actual subqueries
-            "n": original_n,
-            "result": result["synthèse"],
-            "subqueries": result["sous_questions"],
-            "sources_by_subquery": result["sources"],
-            "timestamp": datetime.now().strftime("%Y%m%d-%H%M%S")
-        }
-
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        # K is now based on actual subqueries
+        regenerated_entry = build_history_entry(original_query, len(original_subqueries), original_n, result,
+                                                original_display_query)
+        get_history_store().replace_entry(entries[index_to_replace]["entry_id"], regenerated_entry)
 
         st.success("✅ Synthèse régénérée avec succès !")
         st.session_state.error_message = None # Clear any error
@@ -256,6 +259,20 @@ def update_progress_ui(progress_bar, status_text_holder, steps_display_holder, p
     steps_display_holder.markdown(steps_markdown)
 
 
+def make_synthesis_stream_ui(synthesis_holder):
+    """Returns a token callback rendering the synthesis in `synthesis_holder` as it is generated."""
+    streamed = {"attempt": 0, "text": ""}
+
+    def token_callback(fragment, attempt):
+        if attempt != streamed["attempt"]:
+            streamed["attempt"] = attempt
+            streamed["text"] = ""
+        streamed["text"] += fragment
+        synthesis_holder.markdown(f"#### ✍️ Synthèse en cours (tentative {attempt})\n\n{streamed['text']}▌")
+
+    return token_callback
+
+
 # --- Streamlit UI Components and Logic ---
 def setup_page_config():
     """Sets up the Streamlit page configuration."""
@@ -285,12 +302,25 @@ def initialize_session_state():
         st.session_state.refinement_triggered = False
     if 'error_message' not in st.session_state: # New: for persistent error messages
         st.session_state.error_message = None
+    if 'history_page' not in st.session_state:
+        st.session_state.history_page = 0
+    if 'duplicate_match' not in st.session_state: # Past synthesis close to the query being submitted
+        st.session_state.duplicate_match = None
 
 
 def render_sidebar():
     """Renders the sidebar with history navigation."""
     st.sidebar.title("🧠 Recherche Profonde")
-    histories = load_all_histories()
+    page_count = max(1, -(-get_history_store().count_conversations() // HISTORY_PAGE_SIZE))
+    st.session_state.history_page = min(st.session_state.history_page, page_count - 1)
+    histories = load_all_histories(st.session_state.history_page)
+
+    # Keep the conversation opened from the URL selectable even if it is not on the current page
+    selected_from_url = st.query_params.get("entry")
+    if selected_from_url and not any(h['filename'] == selected_from_url for h in histories):
+        selected_entry = get_history_store().get_conversation(selected_from_url)
+        if selected_entry:
+            histories = [selected_entry] + histories
     menu_choices = ["➕ Nouvelle requête"] + [
         f"{h.get('display_name', 'Requête sans nom')} ({h.get('timestamp', 'Inconnu')})" for h in histories
     ]
@@ -317,6 +347,21 @@ def render_sidebar():
     # The radio button will return the string, we need to map it back to filename
     menu_choice = st.sidebar.radio("Menu", menu_choices, index=selected_index, key="sidebar_menu")
 
+    if page_count > 1:
+        col_prev, col_page, col_next = st.sidebar.columns([1, 2, 1])
+        with col_prev:
+            if st.button("◀", disabled=st.session_state.history_page == 0, key="history_prev_page"):
+                st.session_state.history_page -= 1
+                st.rerun()
+        with col_page:
+            st.caption(f"Page {st.session_state.history_page + 1}/{page_count}")
+        with col_next:
+            if st.button("▶", disabled=st.session_state.history_page >= page_count - 1, key="history_next_page"):
+                st.session_state.history_page += 1
+                st.rerun()
+
+    render_history_search()
+
     if menu_choice == "➕ Nouvelle requête":
         if "entry" in st.query_params:
             del st.query_params["entry"]
@@ -348,6 +393,69 @@ def render_sidebar():
     return current_selected_filename
 
 
+def open_history_entry(filename):
+    """Opens a conversation of the history, as if it had been picked in the sidebar."""
+    st.query_params["entry"] = filename
+    st.session_state.current_step = 3
+    st.session_state.current_history_filename = filename
+    st.session_state.duplicate_match = None
+    st.session_state.error_message = None
+    st.rerun()
+
+
+def render_history_search():
+    """Renders the full-text search over the past syntheses in the sidebar."""
+    search_query = st.sidebar.text_input("🔎 Rechercher dans l'historique", key="history_search_input")
+    if not search_query.strip():
+        return
+    matches = get_history_store().search(search_query)
+    if not matches:
+        st.sidebar.caption("Aucun résultat.")
+        return
+    for match in matches:
+        if st.sidebar.button(f"{match['display_name']} ({match['timestamp']})", key=f"history_search_{match['entry_id']}"):
+            open_history_entry(match['filename'])
+        if match['snippet']:
+            st.sidebar.caption(match['snippet'])
+
+
+def start_initial_research(query, k_pick, n_results):
+    """Stores the parameters of a new query and moves on to the sub-question generation."""
+    st.session_state.main_query_input = query
+    st.session_state.k_pick_config = k_pick
+    st.session_state.n_results_config = n_results
+
+    st.session_state.active_query_for_research = st.session_state.main_query_input
+    st.session_state.display_query_for_history = st.session_state.main_query_input
+    st.session_state.current_step = 1
+    st.session_state.subqueries_editable = []
+    st.session_state.refinement_triggered = False
+    st.session_state.duplicate_match = None
+    st.session_state.error_message = None # Clear error on new search
+    st.rerun()
+
+
+def render_duplicate_match():
+    """Shows the past synthesis found for the submitted query and lets the user open it or search anyway."""
+    match = st.session_state.duplicate_match
+    entries = get_history_store().get_entries(match['filename'])
+    entry = next((e for e in entries if e['entry_id'] == match['entry_id']), None)
+    if entry is None:
+        st.session_state.duplicate_match = None
+        return
+    st.info(f"💡 Une recherche proche a déjà été faite le {entry.get('timestamp', 'Inconnu')} : "
+            f"« {entry.get('display_query') or entry.get('full_query')} »")
+    with st.expander("Voir la synthèse existante", expanded=True):
+        st.markdown(entry.get('result', ''))
+    col_open, col_run = st.columns(2)
+    with col_open:
+        if st.button("📄 Ouvrir cette synthèse", key="open_duplicate"):
+            open_history_entry(match['filename'])
+    with col_run:
+        if st.button("🚀 Lancer quand même", key="run_despite_duplicate"):
+            start_initial_research(match['query'], match['k'], match['n'])
+
+
 def step_0_new_query():
     """Renders the UI for starting a new query."""
     st.title("🔎 Nouvelle recherche profonde")
@@ -377,21 +485,19 @@ def step_0_new_query():
 
     if st.button("Lancer la recherche initiale"):
         if main_query_input_value: # Use the value directly from the widget
-            # Update session state with the current widget values
-            st.session_state.main_query_input = main_query_input_value
-            st.session_state.k_pick_config = k_pick_config_value
-            st.session_state.n_results_config = n_results_config_value
-
-            st.session_state.active_query_for_research = st.session_state.main_query_input
-            st.session_state.display_query_for_history = st.session_state.main_query_input
-            st.session_state.current_step = 1
-            st.session_state.subqueries_editable = []
-            st.session_state.refinement_triggered = False
-            st.session_state.error_message = None # Clear error on new search
-            st.rerun()
+            # Offer the past synthesis of a (nearly) identical query before running a new research
+            match = get_history_store().find_near_duplicate(main_query_input_value)
+            if match:
+                st.session_state.duplicate_match = {**match, "query": main_query_input_value,
+                                                    "k": k_pick_config_value, "n": n_results_config_value}
+            else:
+                start_initial_research(main_query_input_value, k_pick_config_value, n_results_config_value)
         else:
             st.warning("Veuillez entrer une question pour démarrer la recherche.")
 
+    if st.session_state.duplicate_match:
+        render_duplicate_match()
+
 
 def step_1_generate_subqueries():
     """Renders the UI for generating and reviewing sub-queries."""
@@ -416,6 +522,9 @@ def step_1_generate_subqueries():
                     st.session_state.k_pick_config,
                     progress_callback_wrapper
                 )
+                if st.session_state.refinement_triggered and st.session_state.current_history_filename:
+                    generated_subqueries = reuse_previous_subqueries(generated_subqueries,
+                                                                     st.session_state.current_history_filename)
                 st.session_state.subqueries_editable = generated_subqueries[:]
                 progress_container.empty()  # Clear progress indicators after completion
                 st.session_state.error_message = None # Clear error on successful generation
@@ -466,17 +575,24 @@ def step_2_perform_research():
     progress_bar = progress_container.progress(0)
     progress_status_text = progress_container.empty()
     steps_display_container = progress_container.empty()
+    synthesis_stream_container = progress_container.empty()
 
     def progress_callback_wrapper(percentage, status_message, current_step_idx):
         update_progress_ui(progress_bar, progress_status_text, steps_display_container,
                            percentage, status_message, current_step_idx)
 
+    prior_result = None
+    if st.session_state.refinement_triggered and st.session_state.current_history_filename:
+        prior_result = build_prior_result(st.session_state.current_history_filename)
+
     try:
         final_result = perform_full_research(
             query=st.session_state.active_query_for_research,
             subqueries=st.session_state.subqueries_editable,
             n_results=st.session_state.n_results_config,
-            progress_callback=progress_callback_wrapper
+            progress_callback=progress_callback_wrapper,
+            token_callback=make_synthesis_stream_ui(synthesis_stream_container),
+            prior_result=prior_result
         )
 
         if final_result and final_result["synthèse"]: # Check if synthesis is not empty
@@ -687,7 +803,8 @@ def step_3_display_history(selected_filename):
                         st.session_state.k_pick_config,
                         temp_update_progress_for_subquery_gen
                     )
-                    st.session_state.subqueries_editable = generated_subqueries[:]
+                    st.session_state.subqueries_editable = reuse_previous_subqueries(generated_subqueries,
+                                                                                     selected_filename)
                 temp_progress_container.empty()
                 st.success("✅ Sous-questions générées !")
                 st.session_state.error_message = None # Clear error on successful generation
@@ -0,0 +1,91 @@
+import contextlib
+import unittest
+
+from agent.concurrency import AdaptiveConcurrency
+from agent.config import concurrency_max_rss_mb
+
+URL = "https://example.com/page"
+
+
+class FakeMonitor:
+    def __init__(self, memory_used=0.3, cpu_load=0.2, rss_mb=100.0):
+        self.resources = {"memory_used": memory_used, "cpu_load": cpu_load, "rss_mb": rss_mb}
+
+    def sample(self):
+        return dict(self.resources)
+
+
+class TestAdaptiveConcurrency(unittest.TestCase):
+    def make_controller(self, monitor=None, initial_limit=4, min_limit=2, max_limit=8):
+        self.trimmed = []
+        return AdaptiveConcurrency(min_limit=min_limit, max_limit=max_limit, initial_limit=initial_limit,
+                                   adjust_interval=0, monitor=monitor or FakeMonitor(),
+                                   on_change=self.trimmed.append)
+
+    def saturate(self, controller):
+        """Loads as many pages at once as the limit allows, one per domain."""
+        with contextlib.ExitStack() as stack:
+            for i in range(controller.limit):
+                stack.enter_context(controller.track(f"https://site{i}.example.com/"))
+
+    def test_limit_grows_by_one_when_saturated(self):
+        controller = self.make_controller()
+        self.saturate(controller)
+        self.assertEqual(controller.limit, 5)
+        self.assertEqual(self.trimmed, [])
+
+    def test_limit_does_not_grow_when_unsaturated(self):
+        controller = self.make_controller()
+        with controller.track(URL):
+            pass
+        self.assertEqual(controller.limit, 4)
+
+    def test_limit_never_exceeds_its_maximum(self):
+        controller = self.make_controller(initial_limit=8)
+        self.saturate(controller)
+        self.assertEqual(controller.limit, 8)
+
+    def test_limit_is_halved_under_memory_pressure(self):
+        controller = self.make_controller(FakeMonitor(memory_used=0.95), initial_limit=8)
+        with controller.track(URL):
+            pass
+        self.assertEqual(controller.limit, 4)
+        self.assertEqual(self.trimmed, [4])
+
+    def test_limit_is_halved_when_chrome_uses_too_much_memory(self):
+        controller = self.make_controller(FakeMonitor(rss_mb=concurrency_max_rss_mb), initial_limit=8)
+        with controller.track(URL):
+            pass
+        self.assertEqual(controller.limit, 4)
+
+    def test_limit_does_not_grow_close_to_the_memory_cap(self):
+        controller = self.make_controller(FakeMonitor(rss_mb=0.9 * concurrency_max_rss_mb))
+        self.saturate(controller)
+        self.assertEqual(controller.limit, 4)
+
+    def test_limit_is_halved_when_pages_fail(self):
+        controller = self.make_controller(initial_limit=8)
+        with self.assertRaises(RuntimeError), controller.track(URL):
+            raise RuntimeError("page en erreur")
+        self.assertEqual(controller.limit, 4)
+
+    def test_limit_is_halved_when_a_domain_slows_down(self):
+        controller = self.make_controller(initial_limit=8)
+        controller.record(URL, 1.0, True)
+        controller.record(URL, 5.0, True)
+        self.assertEqual(controller.limit, 4)
+
+    def test_limit_never_drops_below_its_minimum(self):
+        controller = self.make_controller(FakeMonitor(memory_used=0.95), initial_limit=3)
+        for _ in range(3):
+            controller.record(URL, 1.0, True)
+        self.assertEqual(controller.limit, 2)
+
+    def test_missing_measurements_are_ignored(self):
+        controller = self.make_controller(FakeMonitor(memory_used=None, cpu_load=None, rss_mb=None))
+        self.saturate(controller)
+        self.assertEqual(controller.limit, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
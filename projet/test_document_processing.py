@@ -0,0 +1,71 @@
+import json
+import unittest
+from unittest import mock
+
+from agent import document_processing
+from agent.document_processing import (_parse_batch_validation_response, _parse_validation_response,
+                                       validate_and_summarize_document, validate_and_summarize_documents)
+
+NOT_RELEVANT = {"summary": None, "is_relevant": False}
+
+
+class TestValidationParsing(unittest.TestCase):
+    def test_json_object_is_returned(self):
+        response = '```json\n{"is_relevant": true, "summary": "Résumé"}\n```'
+        self.assertEqual(_parse_validation_response(response), {"is_relevant": True, "summary": "Résumé"})
+
+    def test_invalid_json_is_not_relevant(self):
+        self.assertEqual(_parse_validation_response("pas du JSON"), NOT_RELEVANT)
+
+    def test_json_that_is_not_an_object_is_not_relevant(self):
+        for response in ("[]", "null", '"x"'):
+            with self.subTest(response=response):
+                self.assertEqual(_parse_validation_response(response), NOT_RELEVANT)
+
+    def test_model_answers_that_are_not_objects_do_not_raise(self):
+        for response in ("[]", "null", '"x"'):
+            with self.subTest(response=response), \
+                    mock.patch.object(document_processing, "request_mistral_model", return_value=response):
+                result = validate_and_summarize_document("question", "sous-question", "texte")
+            self.assertEqual(result, NOT_RELEVANT)
+
+
+class TestBatchValidationParsing(unittest.TestCase):
+    def test_array_of_the_expected_length_is_returned(self):
+        results = [{"is_relevant": True, "summary": "a"}, {"is_relevant": False, "summary": None}]
+        response = "```json\n" + json.dumps(results) + "\n```"
+        self.assertEqual(_parse_batch_validation_response(response, 2), results)
+
+    def test_malformed_answers_are_rejected(self):
+        for response in ("pas du JSON", '{"is_relevant": true}', '[{"is_relevant": true}]',
+                         '[{"is_relevant": true}, {"summary": "sans verdict"}]', '[{"is_relevant": true}, 3]'):
+            with self.subTest(response=response):
+                self.assertIsNone(_parse_batch_validation_response(response, 2))
+
+
+class TestBatchValidationFallback(unittest.TestCase):
+    def test_batch_answer_is_used_when_valid(self):
+        results = [{"is_relevant": True, "summary": "a"}, {"is_relevant": False, "summary": None}]
+        with mock.patch.object(document_processing, "request_mistral_model",
+                               return_value=json.dumps(results)) as model:
+            self.assertEqual(validate_and_summarize_documents("question", "sous-question", ["texte 1", "texte 2"]),
+                             results)
+        self.assertEqual(model.call_count, 1)
+
+    def test_malformed_batch_answer_falls_back_to_one_call_per_document(self):
+        answers = ['[{"is_relevant": true}]', '{"is_relevant": true, "summary": "a"}', "null"]
+        with mock.patch.object(document_processing, "request_mistral_model", side_effect=answers) as model:
+            results = validate_and_summarize_documents("question", "sous-question", ["texte 1", "texte 2"])
+        self.assertEqual(model.call_count, 3)
+        self.assertEqual(results, [{"is_relevant": True, "summary": "a"}, NOT_RELEVANT])
+
+    def test_failed_batch_call_falls_back_to_one_call_per_document(self):
+        answers = [RuntimeError("API indisponible"), '{"is_relevant": false, "summary": null}',
+                   '{"is_relevant": true, "summary": "b"}']
+        with mock.patch.object(document_processing, "request_mistral_model", side_effect=answers):
+            results = validate_and_summarize_documents("question", "sous-question", ["texte 1", "texte 2"])
+        self.assertEqual(results, [NOT_RELEVANT, {"is_relevant": True, "summary": "b"}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import threading
+import time
+import unittest
+
+from agent.driver_pool import DriverPool
+
+HEADERS = [{"User-Agent": f"agent-{i}"} for i in range(5)]
+
+
+class FakeDriver:
+    current_url = "about:blank"
+
+    def __init__(self, user_agent, proxy):
+        self.user_agent = user_agent
+        self.proxy = proxy
+        self.closed = False
+
+
+class TestDriverPool(unittest.TestCase):
+    def make_pool(self, max_size, max_pages=1000):
+        self.launched = []
+
+        def launch(user_agent, proxy):
+            driver = FakeDriver(user_agent, proxy)
+            self.launched.append(driver)
+            return driver
+
+        def close(driver):
+            driver.closed = True
+
+        return DriverPool(launch, close, HEADERS, [False], max_size=max_size, max_pages=max_pages, borrow_timeout=5)
+
+    def run_workers(self, pool, workers, pages_per_worker):
+        def worker():
+            for _ in range(pages_per_worker):
+                with pool.driver():
+                    time.sleep(0.001)
+
+        threads = [threading.Thread(target=worker) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_drivers_are_reused_across_pages_and_workers(self):
+        pool = self.make_pool(max_size=10)
+        self.run_workers(pool, workers=10, pages_per_worker=30)
+        metrics = pool.metrics()
+        self.assertEqual(metrics["borrows"], 300)
+        self.assertLessEqual(metrics["launches"], 10)
+        self.assertGreaterEqual(metrics["hit_rate"], 0.95)
+
+    def test_small_pool_never_exceeds_its_size(self):
+        pool = self.make_pool(max_size=4)
+        self.run_workers(pool, workers=10, pages_per_worker=30)
+        self.assertLessEqual(pool.metrics()["launches"], 4)
+        self.assertLessEqual(pool.metrics()["live"], 4)
+
+    def test_drivers_are_recycled_after_max_pages(self):
+        pool = self.make_pool(max_size=1, max_pages=5)
+        self.run_workers(pool, workers=1, pages_per_worker=12)
+        self.assertEqual(pool.metrics()["launches"], 3)
+        self.assertTrue(all(driver.closed for driver in self.launched[:2]))
+
+    def test_requested_key_gets_a_matching_driver(self):
+        pool = self.make_pool(max_size=2)
+        with pool.driver():
+            pass
+        key = ("agent-custom", False)
+        pooled = pool.borrow(key)
+        self.assertEqual(pooled.key, key)
+        self.assertEqual(pooled.driver.user_agent, "agent-custom")
+        pool.release(pooled)
+
+
+if __name__ == '__main__':
+    unittest.main()
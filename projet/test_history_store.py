@@ -0,0 +1,135 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from history_store import HistoryStore
+
+
+def make_entry(full_query, result="", timestamp="20240101-120000", subqueries=()):
+    return {"full_query": full_query, "display_query": full_query, "k": 2, "n": 2, "result": result,
+            "subqueries": list(subqueries), "sources_by_subquery": [], "documents": [], "timestamp": timestamp}
+
+
+class HistoryStoreTests:
+    """Tests run against both search backends (FTS5 and the in-memory BM25 fallback)."""
+    use_fts = True
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.store = self.make_store()
+
+    def make_store(self, embed=None):
+        path = os.path.join(self._tmp.name, "history.sqlite3")
+        if self.use_fts:
+            store = HistoryStore(path, embed=embed)
+        else:
+            with mock.patch.object(HistoryStore, "_create_fts_index", return_value=False):
+                store = HistoryStore(path, embed=embed)
+        self.addCleanup(store._conn.close)
+        self.assertEqual(store.fts_enabled, self.use_fts)
+        return store
+
+    def add_conversations(self):
+        self.store.create_conversation("energie", "Énergie solaire",
+                                       make_entry("Rendement des panneaux solaires photovoltaïques",
+                                                  "Le rendement dépend de l'ensoleillement et de la température.",
+                                                  "20240101-100000", ["Rendement des cellules"]))
+        self.store.append_entry("energie", make_entry("Coût des panneaux solaires photovoltaïques",
+                                                      "Les prix ont baissé.", "20240102-100000"))
+        self.store.create_conversation("cuisine", "Recettes", make_entry("Recette de la tarte aux pommes",
+                                                                         "Cuire quarante minutes.", "20240103-100000"))
+
+    def test_conversations_are_listed_most_recent_first(self):
+        self.add_conversations()
+        self.assertEqual([c["filename"] for c in self.store.list_conversations()], ["cuisine", "energie"])
+        self.assertEqual([c["filename"] for c in self.store.list_conversations(limit=1, offset=1)], ["energie"])
+        self.assertEqual(self.store.count_conversations(), 2)
+        self.assertEqual([e["timestamp"] for e in self.store.get_entries("energie")],
+                         ["20240101-100000", "20240102-100000"])
+
+    def test_search_ignores_accents_and_ranks_best_first(self):
+        self.add_conversations()
+        results = self.store.search("rendement photovoltaique")
+        self.assertEqual(results[0]["full_query"], "Rendement des panneaux solaires photovoltaïques")
+        self.assertTrue(all(r["filename"] == "energie" for r in results))
+        self.assertEqual(self.store.search("tarte")[0]["filename"], "cuisine")
+
+    def test_search_without_terms_returns_nothing(self):
+        self.add_conversations()
+        self.assertEqual(self.store.search("les des une"), [])
+        self.assertEqual(self.store.search("inexistant"), [])
+
+    def test_deleted_entries_are_no_longer_found(self):
+        self.add_conversations()
+        entry_id = self.store.get_entries("cuisine")[0]["entry_id"]
+        self.assertFalse(self.store.delete_entry(entry_id))
+        self.assertIsNone(self.store.get_conversation("cuisine"))
+        self.assertEqual(self.store.search("tarte"), [])
+
+    def test_near_duplicate_query_is_found(self):
+        self.add_conversations()
+        duplicate = self.store.find_near_duplicate("rendement des panneaux solaires photovoltaiques ?")
+        self.assertIsNotNone(duplicate)
+        self.assertEqual(duplicate["filename"], "energie")
+        self.assertEqual(duplicate["similarity"], 1.0)
+
+    def test_different_query_is_not_a_duplicate(self):
+        self.add_conversations()
+        self.assertIsNone(self.store.find_near_duplicate("Rendement des éoliennes en mer"))
+
+    def test_semantic_duplicate_uses_the_embeddings(self):
+        vectors = {"Recette de la tarte aux pommes": [1.0, 0.0], "Comment cuisiner une tarte normande": [0.99, 0.05]}
+        self.store = self.make_store(embed=lambda texts: [vectors.get(text, [0.0, 1.0]) for text in texts])
+        self.add_conversations()
+        duplicate = self.store.find_near_duplicate("Comment cuisiner une tarte normande")
+        self.assertEqual(duplicate["filename"], "cuisine")
+        self.assertGreater(duplicate["similarity"], 0.99)
+
+
+class TestHistoryStoreFTS5(HistoryStoreTests, unittest.TestCase):
+    use_fts = True
+
+
+class TestHistoryStoreInMemorySearch(HistoryStoreTests, unittest.TestCase):
+    use_fts = False
+
+
+class TestJsonMigration(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.json_dir = os.path.join(self._tmp.name, "history")
+        os.makedirs(self.json_dir)
+        self.store = HistoryStore(os.path.join(self._tmp.name, "history.sqlite3"))
+        self.addCleanup(self.store._conn.close)
+
+    def write(self, name, content):
+        with open(os.path.join(self.json_dir, name), "w", encoding="utf-8") as f:
+            f.write(content if isinstance(content, str) else json.dumps(content))
+
+    def test_json_files_are_imported_once(self):
+        self.write("20240101-100000_abc123.json", {
+            "initial_query": "Énergie solaire",
+            "history": [make_entry("Rendement solaire", timestamp="20240101-100000"),
+                        make_entry("Coût solaire", timestamp="20240102-100000")],
+        })
+        self.write("20240103-100000_def456.json", make_entry("Recette de tarte", timestamp="20240103-100000"))
+        self.write("20240104-100000_bad.json", "{ pas du JSON")
+
+        self.assertEqual(self.store.migrate_json_directory(self.json_dir), 2)
+        self.assertEqual(self.store.migrate_json_directory(self.json_dir), 0)
+
+        conversation = self.store.get_conversation("20240101-100000_abc123.json")
+        self.assertEqual(conversation["display_name"], "Énergie solaire")
+        self.assertEqual(conversation["timestamp"], "20240102-100000")
+        self.assertEqual(len(self.store.get_entries("20240101-100000_abc123.json")), 2)
+        self.assertEqual(self.store.get_conversation("20240103-100000_def456.json")["display_name"],
+                         "Recette de tarte")
+        self.assertEqual(self.store.search("tarte")[0]["filename"], "20240103-100000_def456.json")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from agent import page_cache
+from agent.page_cache import PageCache, normalize_url
+
+PAGE = {"title": "Titre", "paragraphs": "Un paragraphe de contenu."}
+
+
+class TestNormalizeUrl(unittest.TestCase):
+    def test_equivalent_urls_share_a_key(self):
+        self.assertEqual(normalize_url("HTTPS://Example.com:443/a/?utm_source=x&b=2&a=1#top"),
+                         normalize_url("https://example.com/a?a=1&b=2"))
+
+
+class TestPageCache(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.directory = self._tmp.name
+
+    def make_cache(self, **kwargs):
+        cache = PageCache(self.directory, **{"ttl": 60, "stale_ttl": 600, **kwargs})
+        self.addCleanup(cache._refresh_executor.shutdown)
+        return cache
+
+    def at(self, seconds_from_now):
+        return mock.patch.object(page_cache.time, "time", return_value=time.time() + seconds_from_now)
+
+    def test_fresh_entry_is_returned(self):
+        cache = self.make_cache()
+        cache.put("https://example.com/a", PAGE)
+        self.assertEqual(cache.get("https://example.com/a?utm_medium=mail"), (PAGE, False))
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_errors_and_empty_pages_are_not_cached(self):
+        cache = self.make_cache()
+        cache.put("https://example.com/error", {"title": "ERROR: timeout", "paragraphs": "ERROR: timeout"})
+        cache.put("https://example.com/empty", {"title": "Vide", "paragraphs": "  "})
+        self.assertEqual(cache.get("https://example.com/error"), (None, False))
+        self.assertEqual(cache.get("https://example.com/empty"), (None, False))
+        self.assertEqual(cache.stats()["writes"], 0)
+
+    def test_entry_past_its_ttl_is_served_stale(self):
+        cache = self.make_cache()
+        cache.put("https://example.com/a", PAGE)
+        with self.at(120):
+            self.assertEqual(cache.get("https://example.com/a"), (PAGE, True))
+        self.assertEqual(cache.stats()["stale_hits"], 1)
+
+    def test_entry_past_the_stale_window_is_removed(self):
+        cache = self.make_cache()
+        cache.put("https://example.com/a", PAGE)
+        with self.at(1200):
+            self.assertEqual(cache.get("https://example.com/a"), (None, False))
+        self.assertFalse(os.path.exists(cache._path("https://example.com/a")))
+
+    def test_revalidation_refreshes_the_entry_once(self):
+        cache = self.make_cache()
+        cache.put("https://example.com/a", PAGE)
+        release = threading.Event()
+        calls = []
+
+        def fetch(url):
+            calls.append(url)
+            release.wait(5)
+            return {"title": "Nouveau titre", "paragraphs": "Contenu à jour."}
+
+        cache.revalidate("https://example.com/a", fetch)
+        cache.revalidate("https://example.com/a", fetch)
+        release.set()
+        cache._refresh_executor.shutdown(wait=True)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.get("https://example.com/a")[0]["title"], "Nouveau titre")
+
+    def test_least_recently_used_entries_are_evicted(self):
+        urls = [f"https://example.com/{i}" for i in range(4)]
+        probe = self.make_cache()
+        probe.put(urls[0], PAGE)
+        entry_size = os.path.getsize(probe._path(urls[0]))
+
+        cache = self.make_cache(max_bytes=int(entry_size * 3.5))
+        now = time.time()
+        for i, url in enumerate(urls[:3]):
+            cache.put(url, PAGE)
+            os.utime(cache._path(url), (now - 100 + i, now - 100 + i))
+        cache.get(urls[0])  # The oldest entry becomes the most recently used
+
+        cache.put(urls[3], PAGE)
+        self.assertIsNotNone(cache.get(urls[0])[0])
+        self.assertIsNone(cache.get(urls[1])[0])
+        self.assertIsNotNone(cache.get(urls[3])[0])
+        self.assertGreaterEqual(cache.stats()["evictions"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+
+from agent.relevance import BM25Index, prefilter_documents, rank_documents
+
+QUERY = "Quels sont les effets du télétravail sur la productivité ?"
+SUBQUERY = "Études sur la productivité des salariés en télétravail"
+FRENCH_PAGE = {"url": "https://exemple.fr/teletravail", "title": "TÉLÉTRAVAIL ET PRODUCTIVITÉ",
+               "paragraphs": "Les études sur la productivité des salariés en teletravail montrent des effets contrastés."}
+ENGLISH_PAGE = {"url": "https://example.com/remote-work", "title": "Remote work and productivity",
+                "paragraphs": "Studies of remote workers find that working from home raises output per hour."}
+OFF_TOPIC_PAGE = {"url": "https://exemple.fr/recettes", "title": "Recettes de cuisine",
+                  "paragraphs": "Une tarte aux pommes se prépare en quarante minutes."}
+
+
+class TestBM25Index(unittest.TestCase):
+    def test_coverage_ignores_case_and_accents(self):
+        index = BM25Index(["ENERGIE eolienne et electricite"])
+        self.assertEqual(index.coverage("Énergie éolienne, électricité", 0), 1.0)
+
+    def test_matching_document_scores_higher(self):
+        index = BM25Index([FRENCH_PAGE["paragraphs"], OFF_TOPIC_PAGE["paragraphs"]])
+        self.assertGreater(index.score(SUBQUERY, 0), index.score(SUBQUERY, 1))
+
+
+class TestPrefilterDocuments(unittest.TestCase):
+    def test_documents_are_ranked_best_first(self):
+        ranked = rank_documents([OFF_TOPIC_PAGE, FRENCH_PAGE], SUBQUERY, QUERY)
+        self.assertEqual([doc["url"] for doc, _ in ranked], [FRENCH_PAGE["url"], OFF_TOPIC_PAGE["url"]])
+
+    def test_english_page_for_a_french_query_is_kept_by_default(self):
+        kept = prefilter_documents([OFF_TOPIC_PAGE, ENGLISH_PAGE, FRENCH_PAGE], SUBQUERY, QUERY)
+        self.assertEqual(len(kept), 3)
+        self.assertEqual(kept[0]["url"], FRENCH_PAGE["url"])
+
+    def test_english_page_for_a_french_query_is_dropped_when_filtering(self):
+        # Term coverage cannot match across languages: why dropping is opt-in
+        kept = prefilter_documents([ENGLISH_PAGE, FRENCH_PAGE], SUBQUERY, QUERY, drop=True, threshold=0.2)
+        self.assertEqual([doc["url"] for doc in kept], [FRENCH_PAGE["url"]])
+
+
+if __name__ == '__main__':
+    unittest.main()
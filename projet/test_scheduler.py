@@ -0,0 +1,99 @@
+import threading
+import time
+import unittest
+
+from agent.scheduler import HostScheduler, host_of, interleave_by_host
+
+
+class TestInterleaveByHost(unittest.TestCase):
+    def test_hosts_alternate_and_keep_their_order(self):
+        tasks = [{"url": url} for url in ("https://a.com/1", "https://a.com/2", "https://www.a.com/3",
+                                          "https://b.com/1", "https://c.com/1", "https://c.com/2")]
+        self.assertEqual([task["url"] for task in interleave_by_host(tasks)],
+                         ["https://a.com/1", "https://b.com/1", "https://c.com/1",
+                          "https://a.com/2", "https://c.com/2", "https://www.a.com/3"])
+
+    def test_www_prefix_and_case_are_ignored(self):
+        self.assertEqual(host_of("https://WWW.Example.com/page"), "example.com")
+
+
+class TestHostScheduler(unittest.TestCase):
+    def make_scheduler(self, **kwargs):
+        return HostScheduler(**{"max_concurrency": 2, "min_interval": 0.0, "backoff_base": 0.05,
+                                "backoff_max": 0.5, **kwargs})
+
+    def run_fetches(self, scheduler, urls, duration=0.05):
+        """Fetches `urls` in parallel and returns the peak number of simultaneous fetches per host."""
+        lock = threading.Lock()
+        active, peak = {}, {}
+
+        def fetch(url):
+            host = host_of(url)
+            with scheduler.slot(url):
+                with lock:
+                    active[host] = active.get(host, 0) + 1
+                    peak[host] = max(peak.get(host, 0), active[host])
+                time.sleep(duration)
+                with lock:
+                    active[host] -= 1
+
+        threads = [threading.Thread(target=fetch, args=(url,)) for url in urls]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return peak
+
+    def test_concurrency_is_limited_per_host(self):
+        scheduler = self.make_scheduler()
+        urls = [f"https://{host}.com/{i}" for host in ("a", "b", "c") for i in range(6)]
+        self.assertEqual(self.run_fetches(scheduler, urls), {"a.com": 2, "b.com": 2, "c.com": 2})
+
+    def test_fetches_of_a_host_are_spaced(self):
+        scheduler = self.make_scheduler(min_interval=0.1)
+        starts = []
+        for i in range(3):
+            with scheduler.slot(f"https://a.com/{i}"):
+                starts.append(time.monotonic())
+        self.assertGreaterEqual(starts[1] - starts[0], 0.09)
+        self.assertGreaterEqual(starts[2] - starts[1], 0.09)
+        with scheduler.slot("https://b.com/"):
+            self.assertLess(time.monotonic() - starts[2], 0.09)
+
+    def test_failures_double_the_delay_and_successes_halve_it(self):
+        scheduler = self.make_scheduler()
+        for _ in range(2):
+            with self.assertRaises(RuntimeError), scheduler.slot("https://a.com/"):
+                raise RuntimeError("page en erreur")
+        self.assertEqual(scheduler.stats(), {"a.com": {"backoff": 0.1, "failures": 2}})
+        with scheduler.slot("https://a.com/") as outcome:
+            outcome.ok = False
+        self.assertEqual(scheduler.stats()["a.com"]["backoff"], 0.2)
+        with scheduler.slot("https://a.com/"):
+            pass
+        self.assertEqual(scheduler.stats()["a.com"]["backoff"], 0.1)
+
+    def test_retry_after_sets_the_delay_within_the_maximum(self):
+        scheduler = self.make_scheduler()
+        with scheduler.slot("https://a.com/") as outcome:
+            outcome.ok, outcome.retry_after = False, 0.3
+        self.assertEqual(scheduler.stats()["a.com"]["backoff"], 0.3)
+
+        start = time.monotonic()
+        with scheduler.slot("https://a.com/") as outcome:
+            self.assertGreaterEqual(time.monotonic() - start, 0.25)
+            outcome.ok, outcome.retry_after = False, 3600
+        self.assertEqual(scheduler.stats()["a.com"]["backoff"], 0.5)
+
+    def test_other_hosts_are_not_slowed_down(self):
+        scheduler = self.make_scheduler()
+        with scheduler.slot("https://a.com/") as outcome:
+            outcome.ok, outcome.retry_after = False, 0.5
+        start = time.monotonic()
+        with scheduler.slot("https://b.com/"):
+            self.assertLess(time.monotonic() - start, 0.1)
+        self.assertNotIn("b.com", scheduler.stats())
+
+
+if __name__ == '__main__':
+    unittest.main()